@@ -1,11 +1,39 @@
 import asyncio
-import aiomysql
 from dataclasses import dataclass
 from typing import Optional
 import hashlib
 import binascii
+import secrets
+import struct
 import time
 
+# Протокол authserver (logon challenge/proof), клиент 3.3.5a
+CMD_AUTH_LOGON_CHALLENGE = 0x00
+CMD_AUTH_LOGON_PROOF = 0x01
+AUTH_PROTOCOL_VERSION = 8
+CLIENT_BUILD = 12340
+# cmd, error, size, game, version x3, build, platform, os, locale, timezone, ip, длина имени
+LOGON_CHALLENGE = struct.Struct('<BBH4sBBBH4s4s4sIIB')
+# cmd, A, M1, crc, число ключей, флаги безопасности
+LOGON_PROOF = struct.Struct('<B32s20s20sBB')
+# M2, флаги аккаунта, survey id, флаги входа
+LOGON_PROOF_OK = struct.Struct('<20sIIH')
+SRP6_K = 3
+
+# Коды ответа authserver
+WOW_SUCCESS = 0x00
+AUTH_ERRORS = {
+    0x03: "Аккаунт заблокирован",
+    0x04: "Неверное имя пользователя или пароль",
+    0x05: "Неверное имя пользователя или пароль",
+    0x06: "Аккаунт уже в игре",
+    0x07: "Закончилось игровое время",
+    0x08: "Сервер авторизации занят, попробуйте позже",
+    0x09: "Неподдерживаемая версия клиента",
+    0x0C: "Аккаунт временно заблокирован",
+    0x10: "Вход ограничен родительским контролем",
+}
+
 @dataclass
 class AuthResult:
     success: bool
@@ -15,7 +43,13 @@ class AuthResult:
     gmlevel: Optional[int] = 0
 
 class AuthAPI:
-    def __init__(self):
+    def __init__(self, auth_address: Optional[tuple] = None):
+        """
+        Args:
+            auth_address: (host, port) authserver. Если задан, вход идет
+                через SRP6-рукопожатие authserver, иначе - чтением из БД
+        """
+        self.auth_address = auth_address
         # Кэшируем подключение
         self._pool = None
         self.db_config = {
@@ -32,12 +66,13 @@ class AuthAPI:
     async def get_pool(self):
         """Получение или создание пула подключений"""
         if self._pool is None:
+            import aiomysql
             self._pool = await aiomysql.create_pool(**self.db_config)
         return self._pool
 
-    def _calculate_verifier(self, username: str, password: str, salt: bytes) -> bytes:
+    def _calculate_x(self, username: str, password: str, salt: bytes) -> int:
         """
-        Вычисляет верификатор для SRP6
+        Вычисляет закрытый ключ x = SHA1(salt || SHA1("USERNAME:PASSWORD"))
         """
         # 1. Вычисляем h1 = SHA1("USERNAME:PASSWORD")
         username = username.upper()
@@ -45,10 +80,16 @@ class AuthAPI:
         h1 = hashlib.sha1(f"{username}:{password}".encode()).digest()
         
         # 2. Вычисляем h2 = SHA1(salt || h1)
-        h2 = int.from_bytes(
+        return int.from_bytes(
             hashlib.sha1(salt + h1).digest(),
             byteorder='little'
         )
+
+    def _calculate_verifier(self, username: str, password: str, salt: bytes) -> bytes:
+        """
+        Вычисляет верификатор для SRP6
+        """
+        h2 = self._calculate_x(username, password, salt)
         
         # 3. Вычисляем (g^h2) % N используя встроенную функцию pow
         verifier = pow(self.g, h2, self.N)
@@ -57,6 +98,132 @@ class AuthAPI:
         return verifier.to_bytes(32, byteorder='little')
 
     async def login(self, username: str, password: str) -> AuthResult:
+        """Авторизация через authserver, если он задан, иначе через БД"""
+        if self.auth_address:
+            return await self.login_authserver(username, password)
+        return await self.login_database(username, password)
+
+    @staticmethod
+    def _session_key(S: bytes) -> bytes:
+        """Сессионный ключ K = SHA1-interleave от S (как в authserver)"""
+        # Ведущие нулевые байты отбрасываются парами
+        p = 0
+        while p < len(S) and not S[p]:
+            p += 1
+        p = (p + 1) // 2
+        even = hashlib.sha1(S[0::2][p:]).digest()
+        odd = hashlib.sha1(S[1::2][p:]).digest()
+        return bytes(b for pair in zip(even, odd) for b in pair)
+
+    def _calculate_proof(self, username: str, password: str, salt: bytes,
+                         B: bytes, a: int) -> tuple:
+        """
+        Клиентская часть SRP6: возвращает (A, M1, K)
+        """
+        N, g = self.N, self.g
+        A = pow(g, a, N).to_bytes(32, byteorder='little')
+        u = int.from_bytes(hashlib.sha1(A + B).digest(), byteorder='little')
+        x = self._calculate_x(username, password, salt)
+        v = int.from_bytes(self._calculate_verifier(username, password, salt), byteorder='little')
+
+        # S = (B - k * v) ^ (a + u * x) mod N
+        S = pow((int.from_bytes(B, byteorder='little') - SRP6_K * v) % N, a + u * x, N)
+        K = self._session_key(S.to_bytes(32, byteorder='little'))
+
+        # M1 = SHA1(SHA1(N) xor SHA1(g) || SHA1(I) || s || A || B || K)
+        hash_n = hashlib.sha1(N.to_bytes(32, byteorder='little')).digest()
+        hash_g = hashlib.sha1(g.to_bytes(1, byteorder='little')).digest()
+        M1 = hashlib.sha1(
+            bytes(n ^ m for n, m in zip(hash_n, hash_g))
+            + hashlib.sha1(username.upper().encode()).digest()
+            + salt + A + B + K
+        ).digest()
+        return A, M1, K
+
+    async def login_authserver(self, username: str, password: str) -> AuthResult:
+        """Авторизация через logon challenge/proof authserver (порт 3724)"""
+        host, port = self.auth_address
+        account = username.upper().encode()
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+        except OSError as e:
+            raise ConnectionRefusedError(f"Сервер авторизации недоступен: {e}")
+
+        try:
+            writer.write(LOGON_CHALLENGE.pack(
+                CMD_AUTH_LOGON_CHALLENGE, AUTH_PROTOCOL_VERSION,
+                LOGON_CHALLENGE.size - 4 + len(account),
+                b'WoW\0', 3, 3, 5, CLIENT_BUILD,
+                b'68x\0', b'niW\0', b'URur',  # x86, Win, ruRU задом наперед
+                0, 0, len(account)
+            ) + account)
+            await writer.drain()
+
+            cmd, _, result = await reader.readexactly(3)
+            if result != WOW_SUCCESS:
+                return AuthResult(
+                    success=False,
+                    message=AUTH_ERRORS.get(result, "Ошибка при авторизации")
+                )
+            B = await reader.readexactly(32)
+            g_len = (await reader.readexactly(1))[0]
+            g = int.from_bytes(await reader.readexactly(g_len), byteorder='little')
+            n_len = (await reader.readexactly(1))[0]
+            N = int.from_bytes(await reader.readexactly(n_len), byteorder='little')
+            salt = await reader.readexactly(32)
+            await reader.readexactly(16)  # challenge версии клиента
+            security_flags = (await reader.readexactly(1))[0]
+
+            if (g, N) != (self.g, self.N):
+                raise ValueError("Authserver uses unexpected SRP6 parameters")
+            if security_flags:
+                # PIN, матрица или токен вводятся только в самом клиенте
+                return AuthResult(
+                    success=False,
+                    message="Для аккаунта включена двухфакторная защита, войдите через клиент игры"
+                )
+            B_value = int.from_bytes(B, byteorder='little')
+            if B_value % self.N == 0:
+                raise ValueError("Authserver sent invalid public key")
+
+            A, M1, K = self._calculate_proof(
+                username, password, salt, B, secrets.randbits(152)
+            )
+            writer.write(LOGON_PROOF.pack(CMD_AUTH_LOGON_PROOF, A, M1, bytes(20), 0, 0))
+            await writer.drain()
+
+            cmd, error = await reader.readexactly(2)
+            if error != WOW_SUCCESS:
+                return AuthResult(
+                    success=False,
+                    message=AUTH_ERRORS.get(error, "Неверное имя пользователя или пароль")
+                )
+            M2, _, _, _ = LOGON_PROOF_OK.unpack(await reader.readexactly(LOGON_PROOF_OK.size))
+
+            # Сверяем доказательство сервера - иначе это не наш authserver
+            if M2 != hashlib.sha1(A + M1 + K).digest():
+                raise ValueError("Authserver proof mismatch")
+
+            return AuthResult(
+                success=True,
+                message="Успешная авторизация",
+                username=username.upper(),
+                gmlevel=0
+            )
+
+        except asyncio.IncompleteReadError:
+            raise ConnectionRefusedError("Сервер авторизации разорвал соединение")
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def login_database(self, username: str, password: str) -> AuthResult:
+        """Авторизация сверкой верификатора из acore_auth"""
+        # Драйвер БД нужен только этому способу входа
+        import aiomysql
         try:
             pool = await self.get_pool()
             async with pool.acquire() as conn:
@@ -0,0 +1,184 @@
+import os
+import json
+import random
+import asyncio
+import hashlib
+import logging
+from pathlib import Path
+from typing import Optional, Callable
+from urllib.parse import urljoin
+
+NEWS_CACHE_DIR = "config/news"
+# Как часто перепроверяем ленту (с); почти всегда ответ - 304 без тела
+NEWS_REFRESH_INTERVAL = 30 * 60
+NEWS_REFRESH_JITTER = 0.2
+NEWS_TIMEOUT = 15
+
+class NewsFeed:
+    """Лента новостей с сервера с локальной копией.
+
+    Лента ({base_url}/news) запрашивается условно, с If-None-Match и
+    If-Modified-Since: если ничего не изменилось, сервер отвечает 304
+    без тела. Последняя версия ленты и ее картинки лежат в cache_dir,
+    поэтому при старте новости показываются сразу, без сети.
+
+    Формат ленты:
+        {"items": [{"title": "...", "text": "...", "tag": "СОБЫТИЕ",
+                    "image": "images/arena.jpg"}]}
+    Первая запись показывается большой карточкой.
+    """
+
+    def __init__(self, base_url: str, cache_dir=NEWS_CACHE_DIR,
+                 on_update: Optional[Callable[[list], None]] = None):
+        self.url = f"{base_url.rstrip('/')}/news"
+        self.cache_dir = Path(cache_dir)
+        self.feed_path = self.cache_dir / 'feed.json'
+        self.images_dir = self.cache_dir / 'images'
+        self.on_update = on_update
+        self.logger = logging.getLogger('NewsFeed')
+        self._task = None
+        self.stats = {'requests': 0, 'not_modified': 0, 'updated': 0, 'body_bytes': 0}
+
+    def _read_cache(self) -> dict:
+        try:
+            with open(self.feed_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_cache(self, cache: dict):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.feed_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, self.feed_path)
+
+    def load_cached(self) -> list:
+        """Новости из локальной копии; картинки - абсолютные пути к файлам кэша"""
+        return self._localize(self._read_cache().get('items', []))
+
+    def _image_path(self, image_url: str) -> Path:
+        suffix = Path(image_url.split('?', 1)[0]).suffix or '.jpg'
+        return self.images_dir / (hashlib.sha1(image_url.encode()).hexdigest() + suffix)
+
+    def _localize(self, items: list) -> list:
+        news = []
+        for item in items:
+            item = dict(item)
+            image_url = item.pop('image_url', None)
+            path = self._image_path(image_url) if image_url else None
+            item['image'] = str(path.resolve()) if path and path.exists() else None
+            news.append(item)
+        return news
+
+    async def refresh(self, session=None) -> Optional[list]:
+        """Перепроверяет ленту.
+
+        Returns:
+            list: Новые новости, если лента изменилась, иначе None
+        """
+        if session is None:
+            import aiohttp
+            timeout = aiohttp.ClientTimeout(total=NEWS_TIMEOUT)
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                return await self.refresh(session)
+
+        cache = self._read_cache()
+        headers = {}
+        if cache.get('etag'):
+            headers['If-None-Match'] = cache['etag']
+        if cache.get('last_modified'):
+            headers['If-Modified-Since'] = cache['last_modified']
+
+        self.stats['requests'] += 1
+        async with session.get(self.url, headers=headers) as response:
+            if response.status == 304:
+                self.stats['not_modified'] += 1
+                return await self._fetch_missing_images(session, cache.get('items', []))
+            response.raise_for_status()
+            body = await response.read()
+            self.stats['body_bytes'] += len(body)
+            feed = json.loads(body)
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+
+        items = []
+        for entry in feed.get('items', []):
+            item = {
+                'title': entry.get('title', ''),
+                'text': entry.get('text', ''),
+                'tag': entry.get('tag'),
+                'image_url': urljoin(self.url, entry['image']) if entry.get('image') else None,
+            }
+            items.append(item)
+
+        await asyncio.gather(*(
+            self._fetch_image(session, item['image_url']) for item in items if item['image_url']
+        ))
+        self._write_cache({'etag': etag, 'last_modified': last_modified, 'items': items})
+        self._prune_images(items)
+        self.stats['updated'] += 1
+        return self._localize(items)
+
+    async def _fetch_missing_images(self, session, items: list) -> Optional[list]:
+        """Докачивает картинки, которые не скачались в прошлый раз"""
+        missing = [
+            item['image_url'] for item in items
+            if item.get('image_url') and not self._image_path(item['image_url']).exists()
+        ]
+        if not missing:
+            return None
+        await asyncio.gather(*(self._fetch_image(session, url) for url in missing))
+        if not any(self._image_path(url).exists() for url in missing):
+            return None
+        return self._localize(items)
+
+    async def _fetch_image(self, session, image_url: str):
+        """Качает картинку, если ее еще нет в кэше (адрес картинки считаем неизменным)"""
+        path = self._image_path(image_url)
+        if path.exists():
+            return
+        try:
+            async with session.get(image_url) as response:
+                response.raise_for_status()
+                data = await response.read()
+            self.stats['body_bytes'] += len(data)
+            self.images_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(path.name + '.tmp')
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            # Без картинки карточка покажет заглушку
+            self.logger.warning(f"Could not download news image {image_url}: {e}")
+
+    def _prune_images(self, items: list):
+        """Удаляет картинки новостей, которых больше нет в ленте"""
+        keep = {self._image_path(item['image_url']).name for item in items if item['image_url']}
+        if not self.images_dir.exists():
+            return
+        for path in self.images_dir.iterdir():
+            if path.name not in keep:
+                path.unlink(missing_ok=True)
+
+    def start(self, loop: asyncio.AbstractEventLoop, interval: float = NEWS_REFRESH_INTERVAL):
+        """Запускает периодическую перепроверку в указанном event loop (потокобезопасно)"""
+        def create():
+            if self._task is None or self._task.done():
+                self._task = loop.create_task(self._run(interval))
+        loop.call_soon_threadsafe(create)
+
+    def stop(self, loop: asyncio.AbstractEventLoop):
+        if self._task:
+            loop.call_soon_threadsafe(self._task.cancel)
+
+    async def _run(self, interval: float):
+        while True:
+            try:
+                items = await self.refresh()
+                if items is not None and self.on_update:
+                    self.on_update(items)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.warning(f"Error refreshing news: {e}")
+            await asyncio.sleep(interval * random.uniform(1 - NEWS_REFRESH_JITTER, 1 + NEWS_REFRESH_JITTER))
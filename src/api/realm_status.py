@@ -0,0 +1,121 @@
+import asyncio
+from typing import Optional
+from src.api.server_api import ServerAPI, ServerStatus
+from src.utils.player_history import PlayerHistory, Trend, history_path
+
+# Сколько реалмов опрашиваем одновременно
+MAX_CONCURRENT_PROBES = 8
+# Таймаут опроса одного реалма по умолчанию (с)
+REALM_TIMEOUT = 3.0
+# Реалм сам укладывается в свой таймаут; внешний - страховка от зависания
+REALM_TIMEOUT_GRACE = 1.0
+
+def parse_address(value, default_port: int):
+    """'host:port' или [host, port] -> (host, port)"""
+    if isinstance(value, (list, tuple)):
+        return value[0], int(value[1])
+    host, _, port = str(value).rpartition(':')
+    if not host:
+        return str(value), default_port
+    return host, int(port)
+
+def realm_from_config(config: dict) -> ServerAPI:
+    """Создает ServerAPI реалма из записи settings.json["realms"]
+
+    Пример записи:
+        {"name": "Icecrown", "auth": "logon.server.com:3724",
+         "world": "icecrown.server.com:8085", "db": {...},
+         "cache_ttl": 10, "timeout": 3, "max_players": 1000}
+    """
+    return ServerAPI(
+        realm_name=config.get('name', "WotLK Server"),
+        auth_address=parse_address(config['auth'], 3724) if config.get('auth') else None,
+        world_address=parse_address(config['world'], 8085) if config.get('world') else None,
+        db_config=config.get('db'),
+        cache_timeout=config.get('cache_ttl', 10),
+        max_players=config.get('max_players', 1000),
+        history=PlayerHistory(history_path(config.get('name', "WotLK Server")))
+    )
+
+class RealmStatusAggregator:
+    """Параллельный опрос статуса нескольких реалмов.
+
+    Каждый реалм - отдельный ServerAPI со своим кэшем и пулом БД.
+    Реалмы опрашиваются одновременно (не больше MAX_CONCURRENT_PROBES),
+    у каждого свой таймаут, поэтому общее время обновления близко
+    к времени самого медленного реалма, а не к сумме.
+    """
+
+    def __init__(self, realms: Optional[list] = None,
+                 max_concurrency: int = MAX_CONCURRENT_PROBES):
+        if realms:
+            self.realms = [realm_from_config(config) for config in realms]
+            self.timeouts = [config.get('timeout', REALM_TIMEOUT) for config in realms]
+        else:
+            self.realms = [ServerAPI(history=PlayerHistory(history_path("WotLK Server")))]
+            self.timeouts = [REALM_TIMEOUT]
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+
+    @property
+    def primary(self) -> ServerAPI:
+        """Основной реалм (первый в списке)"""
+        return self.realms[0]
+
+    async def _probe(self, realm: ServerAPI, timeout: float) -> ServerStatus:
+        async with self._semaphore:
+            try:
+                return await asyncio.wait_for(realm.get_server_status(timeout),
+                                              timeout=timeout + REALM_TIMEOUT_GRACE)
+            except asyncio.TimeoutError:
+                print(f"Realm {realm.realm_name} status timed out")
+                return ServerStatus(
+                    auth_online=False,
+                    world_online=False,
+                    players_online=0,
+                    max_players=realm.max_players,
+                    realm_name=realm.realm_name
+                )
+
+    def realm_by_name(self, realm_name: str) -> Optional[ServerAPI]:
+        for realm in self.realms:
+            if realm.realm_name == realm_name:
+                return realm
+        return None
+
+    def record_push(self, status: ServerStatus):
+        """Записывает в историю статус из push-канала (в потоке event loop, не в UI)"""
+        realm = self.realm_by_name(status.realm_name)
+        if realm:
+            realm.record_history(status)
+
+    async def get_all_status(self) -> list:
+        """Возвращает статусы всех реалмов в порядке конфигурации"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return list(await asyncio.gather(*(
+            self._probe(realm, timeout) for realm, timeout in zip(self.realms, self.timeouts)
+        )))
+
+    def get_trend(self, period: int) -> Optional[Trend]:
+        """Тренд онлайна по всем реалмам за период.
+
+        Изменение складывается по реалмам; min/max для нескольких
+        реалмов - сумма минимумов и максимумов, то есть границы.
+        """
+        trends = [realm.history.trend(period) for realm in self.realms if realm.history]
+        trends = [trend for trend in trends if trend]
+        if not trends:
+            return None
+        deltas = [trend.delta for trend in trends if trend.delta is not None]
+        return Trend(
+            current=sum(trend.current for trend in trends),
+            delta=sum(deltas) if deltas else None,
+            minimum=sum(trend.minimum for trend in trends),
+            maximum=sum(trend.maximum for trend in trends),
+            samples=max(trend.samples for trend in trends)
+        )
+
+    async def close(self):
+        """Закрывает пулы БД всех реалмов"""
+        await asyncio.gather(*(realm.close() for realm in self.realms), return_exceptions=True)
@@ -0,0 +1,146 @@
+import random
+import asyncio
+from collections import deque
+from typing import Optional
+from src.api.server_api import measure_connect_time
+from src.api.realm_status import parse_address
+
+# Границы корзин гистограммы задержек (мс); последняя корзина - все, что больше
+LATENCY_BUCKETS = (10, 20, 30, 50, 75, 100, 150, 200, 300, 500, 1000, 2000)
+# Вес старых замеров уменьшается, чтобы гистограмма следила за текущей сетью
+HISTOGRAM_DECAY = 0.9
+# По скольким последним попыткам судим о доступности
+HEALTH_WINDOW = 5
+
+# Интервал повторных замеров (с) и таймаут одного подключения
+PROBE_INTERVAL = 120
+PROBE_JITTER = 0.2
+PROBE_TIMEOUT = 2.0
+
+class LatencyHistogram:
+    """Гистограмма задержек одного logon-сервера с затуханием"""
+
+    def __init__(self):
+        self.counts = [0.0] * (len(LATENCY_BUCKETS) + 1)
+        self.attempts = deque(maxlen=HEALTH_WINDOW)  # True/False по попыткам
+        self.last_rtt = None
+
+    def add(self, rtt: Optional[float]):
+        """Учитывает замер (с) или неудачную попытку (None)"""
+        self.attempts.append(rtt is not None)
+        if rtt is None:
+            return
+        self.last_rtt = rtt
+        self.counts = [count * HISTOGRAM_DECAY for count in self.counts]
+        ms = rtt * 1000
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if ms <= bound:
+                break
+        else:
+            index = len(LATENCY_BUCKETS)
+        self.counts[index] += 1
+
+    @property
+    def healthy(self) -> bool:
+        """Последняя попытка удалась и большая часть недавних - тоже"""
+        if not self.attempts or not self.attempts[-1]:
+            return False
+        return sum(self.attempts) * 2 > len(self.attempts)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Оценка перцентиля задержки (мс) по верхней границе корзины"""
+        total = sum(self.counts)
+        if not total:
+            return None
+        threshold = total * q
+        cumulative = 0.0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= threshold:
+                break
+        if index < len(LATENCY_BUCKETS):
+            return float(LATENCY_BUCKETS[index])
+        return self.last_rtt * 1000
+
+class RealmlistSelector:
+    """Выбор ближайшего logon-сервера по задержке TCP-подключения.
+
+    Все адреса из settings.json["game"]["realmlists"] периодически
+    опрашиваются одновременно, для каждого копится гистограмма задержек.
+    При запуске игры в realmlist.wtf пишется доступный адрес с наименьшей
+    медианой; пока замеров нет, используется первый адрес списка.
+    """
+
+    def __init__(self, hosts: list, interval: float = PROBE_INTERVAL,
+                 timeout: float = PROBE_TIMEOUT):
+        self.hosts = list(hosts)
+        self.interval = interval
+        self.timeout = timeout
+        self.histograms = {host: LatencyHistogram() for host in self.hosts}
+        self._task = None
+
+    def set_hosts(self, hosts: list):
+        """Меняет список адресов, сохраняя накопленные замеры оставшихся"""
+        self.hosts = list(hosts)
+        self.histograms = {host: self.histograms.get(host) or LatencyHistogram() for host in self.hosts}
+
+    async def _probe(self, host: str) -> Optional[float]:
+        address, port = parse_address(host, 3724)
+        try:
+            return await measure_connect_time(address, port, self.timeout)
+        except Exception:
+            return None
+
+    async def probe_all(self) -> dict:
+        """Один раунд замеров по всем адресам: {адрес: RTT в с или None}"""
+        results = await asyncio.gather(*(self._probe(host) for host in self.hosts))
+        for host, rtt in zip(self.hosts, results):
+            self.histograms[host].add(rtt)
+        return dict(zip(self.hosts, results))
+
+    def best(self) -> Optional[str]:
+        """Доступный адрес с наименьшей медианой задержки"""
+        candidates = [
+            # При равных корзинах решает последний замер
+            (self.histograms[host].percentile(0.5), self.histograms[host].last_rtt, index, host)
+            for index, host in enumerate(self.hosts)
+            if self.histograms[host].healthy
+        ]
+        if candidates:
+            return min(candidates)[-1]
+        return self.hosts[0] if self.hosts else None
+
+    def stats(self) -> dict:
+        """Сводка по адресам для диагностики"""
+        return {
+            host: {
+                'healthy': histogram.healthy,
+                'p50_ms': histogram.percentile(0.5),
+                'p90_ms': histogram.percentile(0.9),
+                'last_ms': histogram.last_rtt * 1000 if histogram.last_rtt is not None else None,
+            }
+            for host, histogram in self.histograms.items()
+        }
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """Запускает периодические замеры в указанном event loop (потокобезопасно)"""
+        # Выбирать не из чего - замерять незачем
+        if len(self.hosts) < 2:
+            return
+
+        def create():
+            if self._task is None or self._task.done():
+                self._task = loop.create_task(self._run())
+        loop.call_soon_threadsafe(create)
+
+    def stop(self, loop: asyncio.AbstractEventLoop):
+        if self._task:
+            loop.call_soon_threadsafe(self._task.cancel)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.probe_all()
+            except Exception as e:
+                print(f"Error probing logon servers: {e}")
+            await asyncio.sleep(self.interval * random.uniform(1 - PROBE_JITTER, 1 + PROBE_JITTER))
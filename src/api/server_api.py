@@ -1,27 +1,65 @@
+import sys
 import asyncio
-import aiomysql
 from dataclasses import dataclass
 from typing import Optional, Tuple
 import time
-import aiohttp
+from src.utils.player_history import PlayerHistory
+
+# Запрос онлайна согласно структуре БД AzerothCore. Текст постоянный и уходит
+# обычным текстовым запросом по соединению из пула, без подготовки на сервере
+PLAYERS_COUNT_QUERY = "SELECT COUNT(*) FROM characters WHERE online > 0"
+
+# Пул соединений с БД
+DB_POOL_MAXSIZE = 2
+DB_POOL_RECYCLE = 3600  # пересоздавать соединения старше часа
+DB_KEEPALIVE_IDLE = 60  # пинговать соединение, если оно простаивало дольше
+DB_BACKOFF_MAX = 60  # максимальная пауза между попытками переподключения
+# Таймаут подключения к БД (с) - меньше таймаута опроса реалма, чтобы
+# медленная БД давала ошибку подключения, а не отмену всего опроса
+DB_CONNECT_TIMEOUT = 2
+# Запас бюджета опроса на сборку статуса после запроса к БД (с)
+DB_STEP_MARGIN = 0.2
+
+async def measure_connect_time(host: str, port: int, timeout: float = 2.0) -> float:
+    """Время установки TCP-соединения с сервером, с.
+
+    Исключения (отказ, таймаут) пробрасываются вызывающему.
+    """
+    start = time.perf_counter()
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(host, port),
+        timeout=timeout
+    )
+    elapsed = time.perf_counter() - start
+    writer.close()
+    await writer.wait_closed()
+    return elapsed
 
 @dataclass
 class ServerStatus:
     auth_online: bool
     world_online: bool
-    players_online: int
+    players_online: Optional[int]  # None - БД не ответила, онлайн неизвестен
     max_players: int = 1000
     realm_name: str = "WotLK Server"
     uptime: str = "Unknown"
 
 class ServerAPI:
-    def __init__(self):
+    def __init__(self, realm_name: str = "WotLK Server",
+                 auth_address: Tuple[str, int] = None,
+                 world_address: Tuple[str, int] = None,
+                 db_config: dict = None,
+                 cache_timeout: float = 10,
+                 max_players: int = 1000,
+                 history: Optional[PlayerHistory] = None):
         """Инициализация API для проверки статуса серверов"""
         # Настройки серверов
-        self.auth_address = ('0.0.0.0', 3724)
-        self.world_address = ('0.0.0.0', 8085)
+        self.realm_name = realm_name
+        self.max_players = max_players
+        self.auth_address = auth_address or ('0.0.0.0', 3724)
+        self.world_address = world_address or ('0.0.0.0', 8085)
         # Настройки БД (только чтение)
-        self.db_config = {
+        self.db_config = db_config or {
             'host': '0.0.0.0',
             'port': 3306,
             'user': 'launcher_ro',     # Пользователь для чтения
@@ -30,47 +68,126 @@ class ServerAPI:
         }
         # Кэш
         self._last_check = None
-        self._cache_timeout = 10
+        self._cache_timeout = cache_timeout
         self._players_cache = None
         self._players_cache_time = None
         self._players_cache_timeout = 30
         self.base_url = "https://api.server.com"  # URL вашего API
-        
+        # История онлайна для трендов (пишется при каждом опросе)
+        self.history = history
+        # Долгоживущий пул соединений с БД
+        self._pool = None
+        self._pool_lock = None
+        self._pool_backoff = 1
+        self._pool_retry_at = 0.0
+        self._pool_last_used = 0.0
+        self._pool_stats = {
+            'pools_created': 0,
+            'connect_failures': 0,
+            'queries': 0,
+            'query_failures': 0,
+            'last_error': None,
+        }
+
+    async def get_pool(self):
+        """Получение или создание пула подключений с переподключением по backoff"""
+        if self._pool is not None and not self._pool.closed:
+            return self._pool
+
+        if self._pool_lock is None:
+            self._pool_lock = asyncio.Lock()
+        async with self._pool_lock:
+            if self._pool is not None and not self._pool.closed:
+                return self._pool
+
+            now = time.monotonic()
+            if now < self._pool_retry_at:
+                raise ConnectionError(
+                    f"DB reconnect postponed for {self._pool_retry_at - now:.0f}s"
+                )
+            try:
+                # Драйвер БД грузим при первом обращении к ней
+                import aiomysql
+                self._pool = await aiomysql.create_pool(
+                    minsize=1,
+                    maxsize=DB_POOL_MAXSIZE,
+                    pool_recycle=DB_POOL_RECYCLE,
+                    connect_timeout=DB_CONNECT_TIMEOUT,
+                    autocommit=True,
+                    **self.db_config
+                )
+            except (Exception, asyncio.CancelledError) as e:
+                # Экспоненциальная пауза, чтобы не долбить недоступную БД.
+                # Отмена по таймауту опроса - такая же неудачная попытка
+                self._pool_stats['connect_failures'] += 1
+                self._pool_stats['last_error'] = str(e)
+                self._pool_retry_at = now + self._pool_backoff
+                self._pool_backoff = min(self._pool_backoff * 2, DB_BACKOFF_MAX)
+                raise
+            self._pool_backoff = 1
+            self._pool_retry_at = 0.0
+            self._pool_last_used = time.monotonic()
+            self._pool_stats['pools_created'] += 1
+            return self._pool
+
+    async def _drop_pool(self):
+        """Закрывает пул после ошибки - при следующем запросе он пересоздастся"""
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.close()
+            await pool.wait_closed()
+
+    async def close(self):
+        """Закрывает пул соединений"""
+        await self._drop_pool()
+
+    def get_pool_stats(self) -> dict:
+        """Статистика пула соединений"""
+        stats = dict(self._pool_stats)
+        pool = self._pool
+        stats.update({
+            'size': pool.size if pool else 0,
+            'free': pool.freesize if pool else 0,
+            'minsize': pool.minsize if pool else 0,
+            'maxsize': pool.maxsize if pool else DB_POOL_MAXSIZE,
+            'backoff': self._pool_backoff,
+        })
+        return stats
+
     async def get_players_count(self) -> int:
         """Получает количество игроков через БД"""
         try:
-            async with aiomysql.connect(**self.db_config) as conn:
+            pool = await self.get_pool()
+            async with pool.acquire() as conn:
+                # Проверяем соединение, только если оно долго простаивало
+                if time.monotonic() - self._pool_last_used > DB_KEEPALIVE_IDLE:
+                    await conn.ping(reconnect=True)
                 async with conn.cursor() as cur:
-                    # Запрос согласно структуре БД AzerothCore
-                    await cur.execute("""
-                        SELECT COUNT(*) as count 
-                        FROM characters 
-                        WHERE online > 0
-                    """)
+                    await cur.execute(PLAYERS_COUNT_QUERY)
                     result = await cur.fetchone()
                     count = result[0] if result else 0
-                    
-                    print(f"Current online players: {count}")  # Отладочный вывод
-                    
-                    # Обновляем кэш
-                    self._players_cache = count
-                    self._players_cache_time = time.time()
-                    
-                    return count
+
+            self._pool_last_used = time.monotonic()
+            self._pool_stats['queries'] += 1
+
+            # Обновляем кэш
+            self._players_cache = count
+            self._players_cache_time = time.time()
+
+            return count
         except Exception as e:
             print(f"Error getting players count: {e}")
+            self._pool_stats['query_failures'] += 1
+            self._pool_stats['last_error'] = str(e)
+            aiomysql = sys.modules.get('aiomysql')
+            if aiomysql and isinstance(e, (aiomysql.OperationalError, aiomysql.InterfaceError)):
+                await self._drop_pool()
             return self._players_cache if self._players_cache is not None else 0
 
     async def check_server(self, host: str, port: int) -> bool:
         """Проверяет доступность сервера"""
         try:
-            # Создаем футуру с таймаутом в 2 секунды
-            reader, writer = await asyncio.wait_for(
-                asyncio.open_connection(host, port),
-                timeout=2.0
-            )
-            writer.close()
-            await writer.wait_closed()
+            await measure_connect_time(host, port)
             print(f"Server {host}:{port} is online")
             return True
         except (ConnectionRefusedError, asyncio.TimeoutError):
@@ -80,8 +197,16 @@ class ServerAPI:
             print(f"Error checking server {host}:{port}: {e}")
             return False
 
-    async def get_server_status(self) -> ServerStatus:
-        """Получает статус серверов"""
+    async def get_server_status(self, timeout: float = None) -> ServerStatus:
+        """Получает статус серверов
+
+        Args:
+            timeout: Бюджет опроса (с). Запрос к БД получает остаток бюджета
+                после проверки портов; если он не успел, статус возвращается
+                с результатами проверки портов и players_online=None
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout else None
         # Проверяем кэш
         if self._last_check:
             if (asyncio.get_event_loop().time() - self._last_check[0]) < self._cache_timeout:
@@ -98,7 +223,16 @@ class ServerAPI:
             players_online = 0
             if world_check:
                 try:
-                    players_online = await self.get_players_count()
+                    if deadline is None:
+                        players_online = await self.get_players_count()
+                    else:
+                        db_timeout = deadline - loop.time() - DB_STEP_MARGIN
+                        if db_timeout <= 0:
+                            raise asyncio.TimeoutError
+                        players_online = await asyncio.wait_for(self.get_players_count(), db_timeout)
+                except asyncio.TimeoutError:
+                    print(f"Players count for {self.realm_name} timed out")
+                    players_online = None
                 except Exception as e:
                     print(f"Error getting players count: {e}")
 
@@ -106,21 +240,36 @@ class ServerAPI:
             status = ServerStatus(
                 auth_online=auth_check,
                 world_online=world_check,
-                players_online=players_online
+                players_online=players_online,
+                max_players=self.max_players,
+                realm_name=self.realm_name
             )
             # Сохраняем результат в кэш
             self._last_check = (asyncio.get_event_loop().time(), status)
+            self.record_history(status)
             return status
         except Exception as e:
             print(f"Error in get_server_status: {e}")
             return ServerStatus(
                 auth_online=False,
                 world_online=False,
-                players_online=0
-            ) 
+                players_online=0,
+                max_players=self.max_players,
+                realm_name=self.realm_name
+            )
+
+    def record_history(self, status: ServerStatus):
+        """Пишет замер онлайна в историю.
+
+        Пока world-сервер лежит или БД не ответила, онлайн неизвестен -
+        такие замеры пропускаются, чтобы не портить min/max и тренд нулями.
+        """
+        if self.history and status.world_online and status.players_online is not None:
+            self.history.record(status.players_online)
 
     async def get_client_info(self) -> dict:
         """Получает информацию о клиенте с сервера"""
+        import aiohttp
         try:
             async with aiohttp.ClientSession() as session:
                 async with session.get(f"{self.base_url}/client/info") as response:
@@ -0,0 +1,152 @@
+import json
+import random
+import asyncio
+from typing import Optional, Callable
+from src.api.server_api import ServerStatus
+
+# Интервалы опроса статуса (с)
+POLL_MIN_INTERVAL = 5
+POLL_BASE_INTERVAL = 30
+POLL_MAX_INTERVAL = 300
+# Пока работает push-канал, опрос нужен только как страховка
+POLL_PUSH_INTERVAL = 600
+POLL_BACKOFF_FACTOR = 2
+POLL_JITTER = 0.2
+
+# Переподключение push-канала (с)
+PUSH_RECONNECT_MIN = 5
+PUSH_RECONNECT_MAX = 300
+
+class AdaptivePollPolicy:
+    """Вычисляет паузу до следующего опроса статуса.
+
+    Когда статус меняется, опрашиваем часто; когда сервер лежит или
+    ничего не происходит - экспоненциально реже. Случайный разброс
+    не дает сотням лаунчеров опрашивать сервер синхронно.
+    """
+
+    def __init__(self, min_interval: float = POLL_MIN_INTERVAL,
+                 base_interval: float = POLL_BASE_INTERVAL,
+                 max_interval: float = POLL_MAX_INTERVAL):
+        self.min_interval = min_interval
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self.interval = base_interval
+        self.push_active = False
+        self._last_state = None
+
+    @staticmethod
+    def _state(statuses: list) -> tuple:
+        return tuple((s.realm_name, s.auth_online, s.world_online) for s in statuses)
+
+    def update(self, statuses: list) -> float:
+        """Учитывает новый результат опроса и возвращает паузу до следующего, с"""
+        state = self._state(statuses)
+        changed = self._last_state is not None and state != self._last_state
+        self._last_state = state
+
+        if changed:
+            self.interval = self.min_interval
+            return self.next_delay()
+        # И «все стабильно», и «сервер лежит» - повод опрашивать реже
+        return self.back_off()
+
+    def back_off(self) -> float:
+        """Увеличивает интервал (стабильный статус или ошибка опроса)"""
+        self.interval = min(max(self.interval, self.min_interval) * POLL_BACKOFF_FACTOR,
+                            self.max_interval)
+        return self.next_delay()
+
+    def next_delay(self) -> float:
+        interval = POLL_PUSH_INTERVAL if self.push_active else self.interval
+        return interval * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+
+    def reset(self):
+        """Сбрасывает интервал, например после возврата окна из трея"""
+        self.interval = self.base_interval
+
+def status_from_event(data: dict) -> ServerStatus:
+    """Собирает ServerStatus из push-события"""
+    players_online = data.get('players_online')
+    return ServerStatus(
+        auth_online=bool(data.get('auth_online', False)),
+        world_online=bool(data.get('world_online', False)),
+        players_online=int(players_online) if players_online is not None else None,
+        max_players=int(data.get('max_players', 1000)),
+        realm_name=data.get('realm', data.get('realm_name', "WotLK Server"))
+    )
+
+class StatusPushListener:
+    """Подписка на изменения статуса через server-sent events.
+
+    Слушает {base_url}/status/stream; каждое событие data: {...json...}
+    превращается в ServerStatus и передается в on_status. Если сервер
+    не поддерживает поток (404), подписка прекращается и остается опрос.
+    """
+
+    def __init__(self, base_url: str, on_status: Callable[[ServerStatus], None],
+                 on_state: Optional[Callable[[bool], None]] = None):
+        self.url = f"{base_url.rstrip('/')}/status/stream"
+        self.on_status = on_status
+        self.on_state = on_state
+        self._task = None
+        self._connected = False
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """Запускает подписку в указанном event loop (потокобезопасно)"""
+        def create():
+            if self._task is None or self._task.done():
+                self._task = loop.create_task(self._run())
+        loop.call_soon_threadsafe(create)
+
+    def stop(self, loop: asyncio.AbstractEventLoop):
+        if self._task:
+            loop.call_soon_threadsafe(self._task.cancel)
+
+    def _set_state(self, connected: bool):
+        # Сообщаем только о смене состояния, а не о каждой попытке
+        if connected == self._connected:
+            return
+        self._connected = connected
+        if self.on_state:
+            self.on_state(connected)
+
+    async def _run(self):
+        # Импорт в потоке event loop, а не на старте UI
+        import aiohttp
+        delay = PUSH_RECONNECT_MIN
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=None)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            while True:
+                try:
+                    async with session.get(self.url, headers={'Accept': 'text/event-stream'}) as response:
+                        if response.status in (404, 405, 501):
+                            print(f"Status push channel is not available: HTTP {response.status}")
+                            return
+                        response.raise_for_status()
+                        self._set_state(True)
+                        delay = PUSH_RECONNECT_MIN
+                        await self._read_events(response)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"Status push channel error: {e}")
+                finally:
+                    self._set_state(False)
+                await asyncio.sleep(delay * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER))
+                delay = min(delay * 2, PUSH_RECONNECT_MAX)
+
+    async def _read_events(self, response):
+        data_lines = []
+        async for raw_line in response.content:
+            line = raw_line.decode('utf-8', 'replace').rstrip('\r\n')
+            if line.startswith('data:'):
+                data_lines.append(line[5:].lstrip())
+            elif not line and data_lines:
+                # Пустая строка завершает событие
+                payload = '\n'.join(data_lines)
+                data_lines = []
+                try:
+                    self.on_status(status_from_event(json.loads(payload)))
+                except (ValueError, TypeError) as e:
+                    print(f"Bad status event: {e}")
@@ -1,14 +1,22 @@
+import os
 import sys
 from pathlib import Path
 import threading
 import asyncio
 import logging
-from PySide6.QtWidgets import QApplication, QMainWindow, QPushButton, QProgressBar
 
 # Добавляем корневую директорию проекта в PYTHONPATH
 project_root = Path(__file__).parent.parent
 sys.path.append(str(project_root))
 
+# Отчет о времени старта: --startup-report или LAUNCHER_STARTUP_REPORT=1.
+# Профайлер ставится до импорта PySide6, чтобы учесть и его
+STARTUP_REPORT = '--startup-report' in sys.argv or os.environ.get('LAUNCHER_STARTUP_REPORT') == '1'
+if STARTUP_REPORT:
+    from src.utils.startup_profiler import profiler
+    profiler.install()
+
+from PySide6.QtWidgets import QApplication
 from src.ui.main_window import MainWindow
 
 def run_async_loop(loop):
@@ -22,9 +30,24 @@ def main():
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
     
+    if STARTUP_REPORT:
+        profiler.mark('imports done')
+
+    # Сводка по прошлым запускам игры: --launch-report
+    if '--launch-report' in sys.argv:
+        from src.utils.launch_trace import LaunchTraceLog, COMPARE_KEYS
+        log = LaunchTraceLog()
+        print("\n".join(log.format_summary()))
+        for key in COMPARE_KEYS:
+            print(log.format_comparison(key))
+        return
+
     app = QApplication(sys.argv)
     app.setStyle('Fusion')  # Явно устанавливаем стиль Fusion
     window = MainWindow()
+    if STARTUP_REPORT:
+        profiler.mark('main window created')
+        profiler.watch_first_paint(window)
     
     # Запускаем event loop в отдельном потоке
     thread = threading.Thread(target=run_async_loop, args=(window.loop,), daemon=True)
@@ -0,0 +1,71 @@
+from collections import OrderedDict
+from PySide6.QtCore import Qt, QSize
+from PySide6.QtGui import QPixmap
+
+# Запас при масштабировании, чтобы не было пустых краев
+BACKGROUND_MARGIN = 50
+# Размеры округляются вверх до корзины - соседние размеры окна
+# используют одну и ту же масштабированную картинку
+SIZE_BUCKET = 64
+# Сколько масштабированных картинок держим в памяти
+CACHE_SIZE = 6
+
+class BackgroundRenderer:
+    """Масштабирование фона окна с кэшем.
+
+    Картинка масштабируется «с покрытием» под корзину размера и
+    кэшируется в небольшом LRU; на каждый размер окна остается только
+    вырезать центр. Пока окно тянут, используется быстрое
+    масштабирование, после остановки - сглаженное.
+    """
+
+    def __init__(self, source: QPixmap, cache_size: int = CACHE_SIZE):
+        self.source = source
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # (ширина, высота, сглаживание) -> QPixmap
+
+    @staticmethod
+    def _bucket(value: int) -> int:
+        return -(-(value + BACKGROUND_MARGIN) // SIZE_BUCKET) * SIZE_BUCKET
+
+    def _scaled(self, width: int, height: int, smooth: bool) -> QPixmap:
+        key = (width, height, smooth)
+        pixmap = self._cache.get(key)
+        if pixmap is not None:
+            self._cache.move_to_end(key)
+            return pixmap
+
+        pixmap = self.source.scaled(
+            width, height,
+            Qt.AspectRatioMode.KeepAspectRatioByExpanding,
+            Qt.TransformationMode.SmoothTransformation if smooth
+            else Qt.TransformationMode.FastTransformation
+        )
+        self._cache[key] = pixmap
+        # Быстрая версия больше не нужна, когда есть сглаженная
+        if smooth:
+            self._cache.pop((width, height, False), None)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return pixmap
+
+    def render(self, size: QSize, smooth: bool = True) -> QPixmap:
+        """Фон под размер окна, обрезанный по центру"""
+        width, height = size.width(), size.height()
+        if self.source.isNull() or width <= 0 or height <= 0:
+            return self.source
+
+        bucket = (self._bucket(width), self._bucket(height))
+        # Готовая сглаженная картинка лучше свежей быстрой
+        pixmap = self._cache.get((*bucket, True))
+        if pixmap is not None:
+            self._cache.move_to_end((*bucket, True))
+        else:
+            pixmap = self._scaled(*bucket, smooth)
+
+        x = (pixmap.width() - width) // 2
+        y = (pixmap.height() - height) // 2
+        return pixmap.copy(x, y, width, height)
+
+    def clear(self):
+        self._cache.clear()
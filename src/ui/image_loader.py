@@ -0,0 +1,116 @@
+import os
+import hashlib
+import logging
+from pathlib import Path
+from typing import Callable
+from concurrent.futures import ThreadPoolExecutor
+from PySide6.QtCore import Qt, QObject, QSize, QRect, Signal
+from PySide6.QtGui import QImage, QImageReader, QPixmap, QPainter, QLinearGradient, QColor
+
+THUMBNAIL_DIR = "config/thumbnails"
+THUMBNAIL_FORMAT = "jpg"
+THUMBNAIL_QUALITY = 90
+# Декодирование упирается в CPU, много потоков не нужно
+IMAGE_WORKERS = 2
+
+def placeholder_pixmap(size: QSize) -> QPixmap:
+    """Заглушка с градиентом, пока картинка грузится (или если ее нет)"""
+    pixmap = QPixmap(size)
+    pixmap.fill(Qt.transparent)
+    painter = QPainter(pixmap)
+    gradient = QLinearGradient(0, 0, pixmap.width(), 0)
+    gradient.setColorAt(0, QColor("#2c3e50"))
+    gradient.setColorAt(1, QColor("#3498db"))
+    painter.fillRect(pixmap.rect(), gradient)
+    painter.end()
+    return pixmap
+
+class ImageLoader(QObject):
+    """Загрузка картинок в фоне с дисковым кэшем миниатюр.
+
+    Картинка декодируется в рабочем потоке через QImageReader сразу
+    в нужном масштабе, обрезается по центру до точного размера и
+    сохраняется в THUMBNAIL_DIR. В UI-поток приходит только готовая
+    миниатюра; исходный JPEG целиком в памяти не держится.
+    """
+
+    image_ready = Signal(str, QImage)
+
+    def __init__(self, cache_dir=THUMBNAIL_DIR, max_workers: int = IMAGE_WORKERS, parent=None):
+        super().__init__(parent)
+        self.cache_dir = Path(cache_dir)
+        self.logger = logging.getLogger('ImageLoader')
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ImageLoader')
+        self._callbacks = {}  # ключ -> колбэки, ждущие картинку
+        self.image_ready.connect(self._deliver)
+
+    def _thumbnail_path(self, path: Path, size: QSize) -> Path:
+        st = path.stat()
+        key = f"{path.resolve()}|{st.st_size}|{st.st_mtime_ns}|{size.width()}x{size.height()}"
+        name = hashlib.sha1(key.encode()).hexdigest()
+        return self.cache_dir / f"{name}.{THUMBNAIL_FORMAT}"
+
+    def load(self, path, size: QSize, callback: Callable[[QPixmap], None]):
+        """Загружает картинку размером size и передает QPixmap в callback (в UI-потоке).
+
+        Если картинки нет или она не читается, callback не вызывается.
+        """
+        key = f"{path}|{size.width()}x{size.height()}"
+        waiting = self._callbacks.setdefault(key, [])
+        waiting.append(callback)
+        if len(waiting) == 1:
+            self._executor.submit(self._load, key, Path(path), QSize(size))
+
+    def _load(self, key: str, path: Path, size: QSize):
+        try:
+            image = self._read_thumbnail(path, size)
+        except Exception as e:
+            self.logger.warning(f"Could not load image {path}: {e}")
+            image = QImage()
+        self.image_ready.emit(key, image)
+
+    def _read_thumbnail(self, path: Path, size: QSize) -> QImage:
+        if not path.is_file():
+            return QImage()
+        cache_path = self._thumbnail_path(path, size)
+        if cache_path.exists():
+            image = QImage(str(cache_path))
+            if not image.isNull():
+                return image
+
+        reader = QImageReader(str(path))
+        source_size = reader.size()
+        if source_size.isValid():
+            # Декодируем сразу в уменьшенном виде - для JPEG это в разы быстрее
+            reader.setScaledSize(source_size.scaled(size, Qt.KeepAspectRatioByExpanding))
+        image = reader.read()
+        if image.isNull():
+            raise ValueError(reader.errorString())
+        if image.size() != size:
+            image = image.scaled(size, Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation)
+            image = image.copy(QRect(
+                (image.width() - size.width()) // 2,
+                (image.height() - size.height()) // 2,
+                size.width(), size.height()
+            ))
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(cache_path.name + '.tmp')
+        if image.save(str(tmp_path), THUMBNAIL_FORMAT, THUMBNAIL_QUALITY):
+            os.replace(tmp_path, cache_path)
+        return image
+
+    def _deliver(self, key: str, image: QImage):
+        callbacks = self._callbacks.pop(key, [])
+        if image.isNull():
+            return
+        pixmap = QPixmap.fromImage(image)
+        for callback in callbacks:
+            try:
+                callback(pixmap)
+            except RuntimeError:
+                # Виджет успели удалить, пока картинка грузилась
+                pass
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -12,9 +12,9 @@ class LoginSignals(QObject):
     error = Signal(str)
 
 class LoginDialog(QDialog):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, auth_api: AuthAPI = None):
         super().__init__(parent)
-        self.auth_api = AuthAPI()
+        self.auth_api = auth_api or AuthAPI()
         self.auth_result = None
         self.signals = LoginSignals()
         self.login_timeout = 5  # Таймаут в секундах
@@ -7,17 +7,24 @@ from PySide6.QtWidgets import (
     QCheckBox, QFileDialog, QComboBox, QMenu, QMessageBox, QGroupBox,
     QSystemTrayIcon
 )
-from PySide6.QtCore import Qt, QSize, QTimer, QPoint
+from PySide6.QtCore import Qt, QSize, QTimer, QPoint, QObject, Signal, QEvent
 from PySide6.QtGui import (
     QPixmap, QPalette, QBrush, QFont, QIcon, 
-    QPainter, QLinearGradient, QColor, QAction
+    QAction
 )
 from src.api.server_api import ServerAPI
-from src.api.auth_api import AuthResult
+from src.api.realm_status import RealmStatusAggregator, parse_address
+from src.api.status_poller import AdaptivePollPolicy, StatusPushListener
+from src.utils.player_history import HOUR, DAY, WEEK
+from src.api.auth_api import AuthAPI, AuthResult
+from src.api.news_feed import NewsFeed
 import asyncio
 import sys
 from src.ui.login_dialog import LoginDialog
+from src.ui.background import BackgroundRenderer
+from src.ui.image_loader import ImageLoader, placeholder_pixmap
 from src.utils.game_launcher import GameLauncher
+from src.utils.settings_store import SettingsStore
 import platform
 import humanize
 
@@ -28,6 +35,8 @@ DEFAULT_ICON_SIZE = QSize(20, 20)
 PLAY_BUTTON_SIZE = QSize(200, 50)
 SETTINGS_BUTTON_SIZE = QSize(40, 40)
 PROGRESS_BAR_HEIGHT = 4
+# Пауза после ресайза, после которой фон перерисовывается сглаженным (мс)
+BACKGROUND_SETTLE_MS = 150
 
 # Цвета
 COLOR_PRIMARY = "#FFB100"
@@ -37,8 +46,47 @@ COLOR_BACKGROUND = "rgba(0, 0, 0, 0.7)"
 # Размеры
 MAIN_NEWS_IMAGE_HEIGHT = 200
 SMALL_NEWS_IMAGE_HEIGHT = 100
+MAIN_NEWS_IMAGE_SIZE = QSize(400, MAIN_NEWS_IMAGE_HEIGHT)
+SMALL_NEWS_IMAGE_SIZE = QSize(200, SMALL_NEWS_IMAGE_HEIGHT)
 SETTINGS_DIALOG_WIDTH = 600
 
+# Новости, пока с сервера не пришла лента
+DEFAULT_NEWS = [
+    {
+        "title": "Открытие нового сезона",
+        "text": "Встречайте новый сезон арены с обновленной системой рейтинга и наградами!",
+        "image": "main_news.jpg"
+    },
+    {
+        "title": "Обновление 3.3.5a",
+        "text": "Список изменений и улучшений в новой версии...",
+        "image": "update_news.jpg",
+        "tag": "ОБНОВЛЕНИЕ"
+    },
+    {
+        "title": "Турнир на арене",
+        "text": "Регистрация на турнир начинается через...",
+        "image": "arena_news.jpg",
+        "tag": "СОБЫТИЕ"
+    },
+    {
+        "title": "Новые предметы",
+        "text": "В магазине появились новые предметы...",
+        "image": "items_news.jpg",
+        "tag": "МАГАЗИН"
+    }
+]
+
+class NewsSignals(QObject):
+    """Доставка обновленной ленты новостей из asyncio-потока в UI-поток"""
+    updated = Signal(list)
+
+class StatusSignals(QObject):
+    """Доставка статуса серверов из asyncio-потока в UI-поток"""
+    statuses = Signal(list)  # результаты опроса всех реалмов
+    push_status = Signal(object)  # ServerStatus из push-канала
+    push_state = Signal(bool)  # push-канал подключен/отключен
+
 class Card(QFrame):
     """Базовый класс для карточек"""
     def __init__(self, title="", parent=None):
@@ -63,13 +111,18 @@ class MainWindow(QMainWindow):
         self.loop = asyncio.new_event_loop()
         asyncio.set_event_loop(self.loop)
         
-        # Инициализация API клиента
-        self.server_api = ServerAPI()
-        
         # Таймер для обновления статуса
-        self.status_timer = QTimer()
+        # Интервал подбирается адаптивно после каждого опроса
+        self.poll_policy = AdaptivePollPolicy()
+        self.status_timer = QTimer(self)
+        self.status_timer.setSingleShot(True)
         self.status_timer.timeout.connect(self.update_server_status)
-        self.status_timer.start(30000)  # Обновляем каждые 30 секунд
+        self.status_signals = StatusSignals()
+        self.status_signals.statuses.connect(self.on_statuses_updated)
+        self.status_signals.push_status.connect(self.on_push_status)
+        self.status_signals.push_state.connect(self.on_push_state)
+        self._last_statuses = []
+        self._status_in_flight = False
         
         # Настройки
         self.settings_file = Path("config/settings.json")
@@ -87,22 +140,71 @@ class MainWindow(QMainWindow):
             "auth": {
                 "username": None,
                 "account_id": None,
-                "auto_login": False
+                "auto_login": False,
+                "method": "authserver"
+            },
+            "server": {
+                "api_url": ""
             }
         }
         
+        self.settings_store = SettingsStore(self.settings_file, self.default_settings)
         self.settings = self.load_settings()
+
+        # Инициализация API клиента: все реалмы из настроек, первый - основной
+        self.realm_status = RealmStatusAggregator(self.settings.get('realms'))
+        self.server_api = self.realm_status.primary
+
+        # API сервера (push-статус, лента новостей) - только если он задан
+        # в настройках; без него статус опрашивается, а новости встроенные
+        api_url = self.settings.get('server', {}).get('api_url')
+
+        # Push-обновления статуса, если API их поддерживает
+        self.status_push = None
+        if api_url:
+            self.status_push = StatusPushListener(
+                api_url,
+                on_status=self.on_push_event,
+                on_state=self.status_signals.push_state.emit
+            )
+            self.status_push.start(self.loop)
+
+        # Лента новостей: локальная копия сразу, перепроверка в фоне
+        self.news_signals = NewsSignals()
+        self.news_signals.updated.connect(self.populate_news)
+        self.news_feed = None
+        if api_url:
+            self.news_feed = NewsFeed(api_url, on_update=self.news_signals.updated.emit)
+            self.news_feed.start(self.loop)
+
         self.game_launcher = GameLauncher(self.settings, self)
+        self.settings_store.changed.connect(self.game_launcher.on_setting_changed)
+        self.game_launcher.realmlist_selector.start(self.loop)
+        # wineserver префикса и кэш MPQ прогреваются в фоне, пока пользователь входит
+        self.game_launcher.prewarm()
+        self.game_launcher.prefetch()
         self.current_user = None
         
         # Подключаем сигналы GameLauncher
         self.game_launcher.signals.client_missing.connect(self.show_download_buttons)
         self.game_launcher.signals.download_progress.connect(self.update_download_progress)
         self.game_launcher.signals.download_error.connect(self.on_download_error)
+        self.game_launcher.signals.download_finished.connect(self.on_download_finished)
+        self.game_launcher.signals.client_playable.connect(self.on_client_playable)
+        self.game_launcher.signals.launch_finished.connect(self.on_game_launched)
+        self.game_launcher.signals.verify_progress.connect(self.on_verify_progress)
+        self.game_launcher.signals.file_verified.connect(self.on_file_verified)
+        self.game_launcher.signals.verify_finished.connect(self.on_verify_finished)
+        # Идущая проверка клиента: 'verify', 'repair' или None
+        self._verify_mode = None
+        self._verify_bad = 0
+        self.game_launcher.supervisor.exited.connect(self.on_game_exited)
+        self.game_launcher.supervisor.stats_updated.connect(self.on_game_stats)
         
         # Проверяем сохраненные данные авторизации
         auth = self.settings.get('auth', {})
-        if auth.get('username') and auth.get('account_id'):
+        # account_id при входе через authserver неизвестен
+        if auth.get('username'):
             self.current_user = AuthResult(
                 success=True,
                 message="Сессия восстановлена",
@@ -119,9 +221,16 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("WoW 3.3.5 Launcher")
         self.setMinimumSize(1200, 800)
         
-        # Фоновое изображение
-        self.background = QPixmap("assets/images/background.jpg")
+        # Фоновое изображение; при ресайзе сглаженный фон рисуется после паузы
+        self.background = BackgroundRenderer(QPixmap("assets/images/background.jpg"))
+        self.background_timer = QTimer(self)
+        self.background_timer.setSingleShot(True)
+        self.background_timer.setInterval(BACKGROUND_SETTLE_MS)
+        self.background_timer.timeout.connect(self.updateBackground)
         self.updateBackground()
+
+        # Картинки новостей декодируются в фоне
+        self.image_loader = ImageLoader(parent=self)
         
         # Главный виджет
         central_widget = QWidget()
@@ -153,8 +262,11 @@ class MainWindow(QMainWindow):
         
         main_layout.addWidget(footer)
         
-        # Первоначальное получение статуса
-        self.update_server_status()
+        # Первоначальное получение статуса произойдет в showEvent
+
+        # Проверяем обновления клиента, если задан сервер обновлений
+        if self.settings.get('game', {}).get('update_url'):
+            asyncio.run_coroutine_threadsafe(self.game_launcher.update_client(), self.loop)
         
         # Обновляем UI если есть сохраненная сессия
         if self.current_user:
@@ -208,47 +320,39 @@ class MainWindow(QMainWindow):
         grid.setSpacing(15)
         content.layout.addLayout(grid)
         
-        # Главная новость (большая карточка слева)
+        self.news_grid = grid
+        # Сначала локальная копия ленты, свежая придет после перепроверки
+        cached = self.news_feed.load_cached() if self.news_feed else None
+        self.populate_news(cached or DEFAULT_NEWS)
+        
+        return content
+
+    def populate_news(self, items: list):
+        """Заполняет сетку новостей: первая - большая карточка слева, остальные справа"""
+        while self.news_grid.count():
+            widget = self.news_grid.takeAt(0).widget()
+            if widget:
+                widget.deleteLater()
+
+        if not items:
+            return
+        main = items[0]
         main_news = self.create_news_card(
-            "Открытие нового сезона",
-            "Встречайте новый сезон арены с обновленной системой рейтинга и наградами!",
-            "main_news.jpg",
+            main["title"],
+            main["text"],
+            main.get("image"),
             is_main=True
         )
-        grid.addWidget(main_news, 0, 0, 2, 2)  # Занимает 2x2 ячейки
-        
-        # Дополнительные новости (справа)
-        news_items = [
-            {
-                "title": "Обновление 3.3.5a",
-                "text": "Список изменений и улучшений в новой версии...",
-                "image": "update_news.jpg",
-                "tag": "ОБНОВЛЕНИЕ"
-            },
-            {
-                "title": "Турнир на арене",
-                "text": "Регистрация на турнир начинается через...",
-                "image": "arena_news.jpg",
-                "tag": "СОБЫТИЕ"
-            },
-            {
-                "title": "Новые предметы",
-                "text": "В магазине появились новые предметы...",
-                "image": "items_news.jpg",
-                "tag": "МАГАЗИН"
-            }
-        ]
-        
-        for i, news in enumerate(news_items):
+        self.news_grid.addWidget(main_news, 0, 0, 2, 2)  # Занимает 2x2 ячейки
+
+        for i, news in enumerate(items[1:4]):
             card = self.create_news_card(
                 news["title"],
                 news["text"],
-                news["image"],
-                tag=news["tag"]
+                news.get("image"),
+                tag=news.get("tag")
             )
-            grid.addWidget(card, i, 2)  # Добавляем справа
-        
-        return content
+            self.news_grid.addWidget(card, i, 2)  # Добавляем справа
 
     def create_header(self):
         """Создает шапку с логотипом и навигацией"""
@@ -302,23 +406,32 @@ class MainWindow(QMainWindow):
         layout.setSpacing(CARD_SPACING)
         layout.setContentsMargins(0, 0, 0, 0)
         
-        # Статус сервера
-        status_card = Card()
-        status_card.setObjectName("status_card")
-        status_card.setProperty("class", "base-card status-card status-card-green")
-        
-        status_layout = QVBoxLayout()
-        status_layout.setSpacing(5)
-        status_layout.setContentsMargins(*CARD_MARGINS)
-        
-        title = self.create_label("СТАТУС СЕРВЕРА", "title")
-        self.status_label = self.create_label("Онлайн", "status-value-online")
-        self.realm_name = self.create_label("REALM NAME", "subtitle")
-        
-        status_layout.addWidget(title)
-        status_layout.addWidget(self.status_label)
-        status_layout.addWidget(self.realm_name)
-        status_card.layout.addLayout(status_layout)
+        # Статус серверов - по карточке на каждый реалм
+        self.realm_cards = []
+        for index, realm in enumerate(self.realm_status.realms):
+            status_card = Card()
+            status_card.setObjectName("status_card" if index == 0 else f"status_card_{index}")
+            status_card.setProperty("class", "base-card status-card status-card-green")
+
+            status_layout = QVBoxLayout()
+            status_layout.setSpacing(5)
+            status_layout.setContentsMargins(*CARD_MARGINS)
+
+            title = self.create_label("СТАТУС СЕРВЕРА", "title")
+            status_label = self.create_label("Онлайн", "status-value-online")
+            realm_name = self.create_label(realm.realm_name, "subtitle")
+
+            status_layout.addWidget(title)
+            status_layout.addWidget(status_label)
+            status_layout.addWidget(realm_name)
+            status_card.layout.addLayout(status_layout)
+
+            self.realm_cards.append((status_card, status_label, realm_name))
+            layout.addWidget(status_card)
+
+        # Карточка основного реалма
+        self.status_label = self.realm_cards[0][1]
+        self.realm_name = self.realm_cards[0][2]
         
         # Онлайн
         online_card = Card()
@@ -332,7 +445,7 @@ class MainWindow(QMainWindow):
         
         self.online_count = self.create_label("1500", "value")
         
-        self.online_trend = self.create_label("↑ +125 за час", "trend-up")
+        self.online_trend = self.create_label("нет данных за час", "trend-flat")
         
         online_layout.addWidget(online_title)
         online_layout.addWidget(self.online_count)
@@ -359,7 +472,6 @@ class MainWindow(QMainWindow):
         version_card.layout.addLayout(version_layout)
         
         # Добавляем карточки в layout
-        layout.addWidget(status_card)
         layout.addWidget(online_card)
         layout.addWidget(version_card)
         layout.addStretch()
@@ -416,42 +528,17 @@ class MainWindow(QMainWindow):
         layout = QVBoxLayout(card)
         layout.setSpacing(10)
         
-        # Изображение новости
+        # Изображение новости: сразу заглушка, миниатюра придет из фонового загрузчика
         image_label = QLabel()
         image_label.setProperty("class", "news-image")
-        pixmap = QPixmap(f"assets/images/news/{image_path}")
-        
-        # Проверяем, загрузилось ли изображение
-        if pixmap.isNull():
-            # Создаем заглушку с градиентом
-            if is_main:
-                pixmap = QPixmap(400, 200)
-            else:
-                pixmap = QPixmap(200, 100)
-            pixmap.fill(Qt.transparent)
-            
-            # Можно добавить градиент или цвет заглушки
-            painter = QPainter(pixmap)
-            gradient = QLinearGradient(0, 0, pixmap.width(), 0)
-            gradient.setColorAt(0, QColor("#2c3e50"))
-            gradient.setColorAt(1, QColor("#3498db"))
-            painter.fillRect(pixmap.rect(), gradient)
-            painter.end()
-        
-        # Устанавливаем размер и масштабируем изображение
-        if is_main:
-            image_label.setFixedHeight(200)
-        else:
-            image_label.setFixedHeight(100)
-        
-        scaled_pixmap = pixmap.scaled(
-            image_label.width() if image_label.width() > 0 else pixmap.width(),
-            image_label.height(),
-            Qt.KeepAspectRatioByExpanding,
-            Qt.SmoothTransformation
-        )
-        
-        image_label.setPixmap(scaled_pixmap)
+        image_size = MAIN_NEWS_IMAGE_SIZE if is_main else SMALL_NEWS_IMAGE_SIZE
+        image_label.setFixedHeight(image_size.height())
+        image_label.setPixmap(placeholder_pixmap(image_size))
+        if image_path:
+            # Картинки из кэша ленты приходят абсолютными путями
+            self.image_loader.load(
+                Path("assets/images/news") / image_path, image_size, image_label.setPixmap
+            )
         layout.addWidget(image_label)  # Добавляем изображение в layout
         
         # Тег (если есть)
@@ -492,29 +579,13 @@ class MainWindow(QMainWindow):
     
     def resizeEvent(self, event):
         super().resizeEvent(event)
-        self.updateBackground()
+        # Пока окно тянут - быстрое масштабирование, сглаженное - после остановки
+        self.updateBackground(smooth=False)
+        self.background_timer.start()
     
-    def updateBackground(self):
-        # Получаем размеры окна
-        window_size = self.size()
-        
-        # Масштабируем изображение, чтобы оно покрывало всё окно
-        scaled_bg = self.background.scaled(
-            window_size.width() + 50,  # Добавляем небольшой запас по ширине
-            window_size.height() + 50,  # и высоте, чтобы избежать пустых краёв
-            Qt.AspectRatioMode.KeepAspectRatioByExpanding,
-            Qt.TransformationMode.SmoothTransformation
-        )
-        
-        # Если изображение больше окна, обрезаем его по центру
-        if scaled_bg.width() > window_size.width() or scaled_bg.height() > window_size.height():
-            x = (scaled_bg.width() - window_size.width()) // 2
-            y = (scaled_bg.height() - window_size.height()) // 2
-            scaled_bg = scaled_bg.copy(
-                x, y, 
-                window_size.width(), 
-                window_size.height()
-            )
+    def updateBackground(self, smooth: bool = True):
+        # Масштабированная под окно и обрезанная по центру картинка
+        scaled_bg = self.background.render(self.size(), smooth)
         
         # Устанавливаем фон
         palette = self.palette()
@@ -525,20 +596,12 @@ class MainWindow(QMainWindow):
         self.play_button.setProperty("class", "play-button-pulse")
     
     def load_settings(self):
-        """Загружает настройки из файла"""
-        if self.settings_file.exists():
-            try:
-                with open(self.settings_file, "r") as f:
-                    return json.load(f)
-            except:
-                return self.default_settings.copy()
-        return self.default_settings.copy()
+        """Загружает настройки из файла (или из резервной копии, если он испорчен)"""
+        return self.settings_store.load()
     
     def save_settings(self):
-        """Сохраняет настройки в файл"""
-        self.settings_file.parent.mkdir(parents=True, exist_ok=True)
-        with open(self.settings_file, "w") as f:
-            json.dump(self.settings, f, indent=4)
+        """Планирует сохранение настроек; запись идет в фоне и атомарно"""
+        self.settings_store.save(self.settings)
     
     def get_setting(self, category, key):
         """Получает значение настройки по категории и ключу"""
@@ -546,10 +609,7 @@ class MainWindow(QMainWindow):
     
     def set_setting(self, category, key, value):
         """Устанавливает значение настройки"""
-        if category not in self.settings:
-            self.settings[category] = {}
-        self.settings[category][key] = value
-        self.save_settings()
+        self.settings_store.set(category, key, value)
     
     def show_settings(self):
         """Показывает окно настроек"""
@@ -575,64 +635,168 @@ class MainWindow(QMainWindow):
         return label
 
     def update_server_status(self):
-        """Обновляет информацию о статусе сервера"""
+        """Запрашивает статус серверов; результат придет сигналом в UI-поток"""
+        if self._status_in_flight:
+            return
+        self._status_in_flight = True
+
         async def get_status():
-            status = await self.server_api.get_server_status()
-            if status:
-                # Обновляем UI в главном потоке
-                online = status.auth_online and status.world_online
-                
-                # Определяем текст статуса
-                if online:
-                    status_text = "Онлайн"
-                elif not status.auth_online and not status.world_online:
-                    status_text = "Оффлайн"
-                elif not status.auth_online:
-                    status_text = "Auth Оффлайн"
-                else:
-                    status_text = "World Оффлайн"
-                
-                # Обновляем текст и стиль статуса
-                self.status_label.setText(status_text)
-                self.status_label.setProperty(
-                    "class", 
-                    "status-value-online" if online else "status-value-offline"
-                )
-                self.status_label.style().unpolish(self.status_label)
-                self.status_label.style().polish(self.status_label)
-                
-                # Обновляем стиль карточки статуса
-                status_card = self.findChild(Card, "status_card")
-                if status_card:
-                    new_class = f"base-card status-card {'status-card-green' if online else 'status-card-red'}"
-                    print(f"Setting card class to: {new_class}")  # Отладочный вывод
-                    status_card.setProperty("class", new_class)
-                    status_card.style().unpolish(status_card)
-                    status_card.style().polish(status_card)
-                    status_card.update()  # Принудительно обновляем виджет
-                
-                self.realm_name.setText(status.realm_name)
-                self.online_count.setText(str(status.players_online))
-                
-                # Обновляем тренд
-                self.online_trend.setText(f"↑ {status.players_online} из {status.max_players}")
-            else:
-                self.status_label.setText("Недоступен")
-                self.status_label.setProperty("class", "status-value-offline")
-                self.status_label.style().unpolish(self.status_label)
-                self.status_label.style().polish(self.status_label)
-                
-                # Обновляем стиль карточки на красный
-                status_card = self.findChild(Card, "status_card")
-                if status_card:
-                    status_card.setProperty("class", "base-card status-card status-card-red")
-                    status_card.style().unpolish(status_card)
-                    status_card.style().polish(status_card)
-        
+            try:
+                statuses = await self.realm_status.get_all_status()
+            except Exception:
+                # Пустой список - сигнал UI-потоку, что опрос не удался
+                self.status_signals.statuses.emit([])
+                raise
+            self.status_signals.statuses.emit(statuses)
+
         # Запускаем асинхронную задачу в нашем event loop
         future = asyncio.run_coroutine_threadsafe(get_status(), self.loop)
         future.add_done_callback(lambda f: self.handle_status_update_error(f))
 
+    def is_status_polling_paused(self) -> bool:
+        """Опрос не нужен, пока окно скрыто в трей или свернуто"""
+        return not self.isVisible() or self.isMinimized()
+
+    def schedule_status_update(self, delay: float):
+        """Планирует следующий опрос, если окно видно"""
+        if self.is_status_polling_paused():
+            self.status_timer.stop()
+            return
+        self.status_timer.start(int(delay * 1000))
+
+    def on_statuses_updated(self, statuses: list):
+        """Обрабатывает результат опроса в UI-потоке"""
+        self._status_in_flight = False
+        if not statuses:
+            self.schedule_status_update(self.poll_policy.back_off())
+            return
+        self._last_statuses = list(statuses)
+        self.render_statuses()
+        self.schedule_status_update(self.poll_policy.update(statuses))
+
+    def on_push_event(self, status):
+        """Статус из push-канала в потоке event loop: запись истории - здесь, а не в UI"""
+        self.realm_status.record_push(status)
+        self.status_signals.push_status.emit(status)
+
+    def on_push_status(self, status):
+        """Применяет статус реалма, пришедший по push-каналу"""
+        realm = self.realm_status.realm_by_name(status.realm_name)
+        if realm is None:
+            return
+        index = self.realm_status.realms.index(realm)
+        if len(self._last_statuses) != len(self.realm_status.realms):
+            self._last_statuses = [None] * len(self.realm_status.realms)
+        self._last_statuses[index] = status
+        self.render_statuses()
+
+    def on_push_state(self, connected: bool):
+        """Пока push-канал жив, опрос нужен только как страховка"""
+        self.poll_policy.push_active = connected
+        # Канал пропал - возвращаемся к обычному интервалу опроса
+        if not connected and not self._status_in_flight:
+            self.schedule_status_update(self.poll_policy.next_delay())
+
+    def render_statuses(self):
+        """Перерисовывает карточки статуса и онлайна"""
+        statuses = self._last_statuses
+        for (status_card, status_label, realm_name), status in zip(self.realm_cards, statuses):
+            self.update_realm_card(status_card, status_label, realm_name, status)
+
+        # Онлайн по всем реалмам
+        known = [status for status in statuses if status]
+        players_online = sum(status.players_online or 0 for status in known)
+        max_players = sum(status.max_players for status in known)
+        self.online_count.setText(str(players_online))
+
+        self.online_count.setToolTip(f"{players_online} из {max_players}")
+        self.render_online_trend()
+
+    def render_online_trend(self):
+        """Показывает изменение онлайна по локальной истории"""
+        hourly = self.realm_status.get_trend(HOUR)
+        if not hourly or hourly.delta is None:
+            text, class_name = "нет данных за час", "trend-flat"
+        elif hourly.delta > 0:
+            text, class_name = f"↑ +{hourly.delta} за час", "trend-up"
+        elif hourly.delta < 0:
+            text, class_name = f"↓ {hourly.delta} за час", "trend-down"
+        else:
+            text, class_name = "→ 0 за час", "trend-flat"
+        self.online_trend.setText(text)
+        self.online_trend.setProperty("class", class_name)
+        self.online_trend.style().unpolish(self.online_trend)
+        self.online_trend.style().polish(self.online_trend)
+
+        lines = []
+        for title, period in (("За час", HOUR), ("За сутки", DAY), ("За неделю", WEEK)):
+            trend = hourly if period == HOUR else self.realm_status.get_trend(period)
+            if not trend:
+                continue
+            delta = f"{trend.delta:+d}" if trend.delta is not None else "нет данных"
+            lines.append(f"{title}: {delta} (мин {trend.minimum}, макс {trend.maximum})")
+        self.online_trend.setToolTip("\n".join(lines))
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.resume_status_polling()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.status_timer.stop()
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.WindowStateChange:
+            if self.isMinimized():
+                self.status_timer.stop()
+            else:
+                self.resume_status_polling()
+
+    def resume_status_polling(self):
+        """Сразу обновляет статус после возврата окна и снова включает опрос"""
+        if self.is_status_polling_paused() or self.status_timer.isActive():
+            return
+        self.poll_policy.reset()
+        self.update_server_status()
+
+    def update_realm_card(self, status_card, status_label, realm_name, status):
+        """Обновляет карточку статуса одного реалма"""
+        if status:
+            online = status.auth_online and status.world_online
+
+            # Определяем текст статуса
+            if online:
+                status_text = "Онлайн"
+            elif not status.auth_online and not status.world_online:
+                status_text = "Оффлайн"
+            elif not status.auth_online:
+                status_text = "Auth Оффлайн"
+            else:
+                status_text = "World Оффлайн"
+
+            # Обновляем текст и стиль статуса
+            status_label.setText(status_text)
+            status_label.setProperty(
+                "class",
+                "status-value-online" if online else "status-value-offline"
+            )
+            realm_name.setText(status.realm_name)
+        else:
+            online = False
+            status_label.setText("Недоступен")
+            status_label.setProperty("class", "status-value-offline")
+
+        status_label.style().unpolish(status_label)
+        status_label.style().polish(status_label)
+
+        # Обновляем стиль карточки статуса
+        new_class = f"base-card status-card {'status-card-green' if online else 'status-card-red'}"
+        status_card.setProperty("class", new_class)
+        status_card.style().unpolish(status_card)
+        status_card.style().polish(status_card)
+        status_card.update()  # Принудительно обновляем виджет
+
     def handle_status_update_error(self, future):
         """Обрабатывает ошибки при обновлении статуса"""
         try:
@@ -642,12 +806,18 @@ class MainWindow(QMainWindow):
 
     def show_login(self):
         """Показывает диалог авторизации"""
-        dialog = LoginDialog(self)
+        dialog = LoginDialog(self, self.create_auth_api())
         if dialog.exec_():
             # Успешная авторизация
             self.current_user = dialog.auth_result
             self.update_ui_after_login()
     
+    def create_auth_api(self) -> AuthAPI:
+        """API авторизации: authserver выбранного realmlist или БД (auth.method = "database")"""
+        if self.settings.get('auth', {}).get('method', 'authserver') == 'database':
+            return AuthAPI()
+        return AuthAPI(auth_address=parse_address(self.game_launcher.get_realmlist(), 3724))
+
     def update_ui_after_login(self):
         """Обновляет UI после успешной авторизации"""
         self.game_button.setEnabled(True)
@@ -797,10 +967,10 @@ class MainWindow(QMainWindow):
         self.footer_layout.insertWidget(1, self.download_button)
         self.footer_layout.insertWidget(2, self.select_folder_button)
         
-    def show_download_progress(self):
-        """Показывает прогресс загрузки"""
+    def show_download_progress(self, text: str = "Загрузка..."):
+        """Показывает прогресс загрузки (или проверки)"""
         self.game_button.setEnabled(False)
-        self.game_button.setText("Загрузка...")
+        self.game_button.setText(text)
         self.game_button.setProperty("state", "downloading")
         
         # Создаем и добавляем прогресс-бар
@@ -823,11 +993,94 @@ class MainWindow(QMainWindow):
             speed_str = humanize.naturalsize(speed, binary=True) + "/s"
             self.progress_bar.setFormat(f"{status} - {speed_str}")
 
+    def hide_download_progress(self):
+        """Убирает прогресс загрузки из футера"""
+        if hasattr(self, 'progress_bar'):
+            self.footer_layout.removeWidget(self.progress_bar)
+            self.progress_bar.deleteLater()
+            del self.progress_bar
+        self.game_button.setEnabled(True)
+        self.update_game_button_state()
+
     def on_download_error(self, error_msg: str):
         """Обработчик ошибки загрузки"""
+        self._verify_mode = None
         self.hide_download_progress()
         QMessageBox.critical(self, "Ошибка загрузки", error_msg)
 
+    def on_download_finished(self):
+        """Обработчик завершения загрузки"""
+        self.hide_download_progress()
+
+    def verify_client(self, repair: bool = False, force: bool = None):
+        """Проверяет файлы клиента в фоне.
+
+        repair=True - проверка по частям торрента с докачкой только битых частей.
+        force=True - перечитать все файлы без кэша, по умолчанию из game.deep_verify.
+        """
+        if force is None:
+            force = bool(self.settings.get('game', {}).get('deep_verify', False))
+        path = self.settings.get('game', {}).get('path', '')
+        if self._verify_mode or not path:
+            return
+        self._verify_mode = 'repair' if repair else 'verify'
+        self._verify_bad = 0
+        if not hasattr(self, 'progress_bar'):
+            self.show_download_progress("Проверка...")
+        if repair:
+            self.game_launcher.start_repair(path)
+        else:
+            self.game_launcher.start_verification(path, force=force)
+
+    def on_verify_progress(self, progress: float, status: str):
+        """Обновляет прогресс проверки клиента"""
+        if not self._verify_mode or not hasattr(self, 'progress_bar'):
+            return
+        self.progress_bar.setValue(int(progress))
+        title = "Проверка частей" if status == "checking pieces" else "Проверка файлов"
+        bad = f", повреждено: {self._verify_bad}" if self._verify_bad else ""
+        self.progress_bar.setFormat(f"{title} - {int(progress)}%{bad}")
+
+    def on_file_verified(self, path: str, ok: bool):
+        """Считает поврежденные файлы по мере проверки"""
+        if self._verify_mode and not ok:
+            self._verify_bad += 1
+
+    def on_verify_finished(self, ok: bool, bad_files: list):
+        """Показывает результат проверки клиента"""
+        mode, self._verify_mode = self._verify_mode, None
+        if mode is None:
+            return
+        if mode == 'repair' and not ok and bad_files:
+            # Битые части докачиваются - дальше прогресс идет от загрузчика
+            self.progress_bar.setValue(0)
+            self.progress_bar.setFormat("Восстановление...")
+            return
+
+        self.hide_download_progress()
+        if ok:
+            QMessageBox.information(self, "Проверка клиента", "Файлы клиента в порядке.")
+            return
+        if not bad_files:
+            QMessageBox.warning(self, "Проверка клиента", "Не удалось проверить файлы клиента.")
+            return
+
+        shown = "\n".join(bad_files[:10])
+        more = f"\n... и еще {len(bad_files) - 10}" if len(bad_files) > 10 else ""
+        if QMessageBox.question(
+            self,
+            "Проверка клиента",
+            f"Повреждены или отсутствуют файлы:\n{shown}{more}\n\n"
+            "Восстановить их? Будут скачаны только поврежденные части.",
+            QMessageBox.Yes | QMessageBox.No
+        ) == QMessageBox.Yes:
+            self.verify_client(repair=True)
+
+    def on_client_playable(self):
+        """Файлы для запуска докачаны - разрешаем играть, загрузка идет дальше"""
+        self.update_game_button_state()
+        self.game_button.setEnabled(True)
+
     def setup_game_button(self):
         """Настройка основной кнопки игры/загрузки"""
         self.game_button = QPushButton()
@@ -861,9 +1114,7 @@ class MainWindow(QMainWindow):
                 self.current_user.account_id
             )
             
-        if self.game_launcher.launch_game():
-            self.hide()
-            self.tray_icon.show()
+        self.game_launcher.start_launch()
 
     def update_game_button_state(self):
         """Обновляет состояние кнопки в зависимости от наличия клиента"""
@@ -899,7 +1150,10 @@ class MainWindow(QMainWindow):
     def start_download(self):
         """Запускает загрузку клиента"""
         try:
+            # Загрузка идет в потоке TorrentManager, UI не блокируется
             self.game_launcher._download_client()
+            if not hasattr(self, 'progress_bar'):
+                self.show_download_progress()
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", str(e))
             
@@ -917,10 +1171,22 @@ class MainWindow(QMainWindow):
             self.update_game_button_state()
             
     def launch_game(self):
-        """Запускает игру"""
-        if self.game_launcher.launch_game():
-            self.hide()  # Скрываем окно
-            self.tray_icon.show()  # Показываем иконку в трее
+        """Запускает игру; подготовка идет в фоне, результат придет в on_game_launched"""
+        self.game_launcher.start_launch()
+
+    def on_game_launched(self, success: bool, timings: dict):
+        """Обрабатывает результат запуска игры"""
+        if not success:
+            QMessageBox.critical(
+                self,
+                "Ошибка",
+                "Не удалось запустить игру. Проверьте настройки и файлы игры."
+            )
+            return
+        self.hide()  # Скрываем окно
+        self.tray_icon.show()  # Показываем иконку в трее
+        if 'click_to_popen' in timings:
+            self.tray_icon.setToolTip(f"WoW 3.3.5 Launcher\nИгра запущена за {timings['click_to_popen']:.0f} мс")
 
     def on_login_success(self, result: AuthResult):
         """Обработчик успешной авторизации"""
@@ -928,25 +1194,38 @@ class MainWindow(QMainWindow):
         self.settings['auth']['username'] = result.username
         self.settings['auth']['account_id'] = result.account_id
         self.save_settings()
+        # Сервер мог завершиться, пока лаунчер был открыт без игры
+        self.game_launcher.prewarm()
 
-    def start_game_monitoring(self):
-        """Запускает мониторинг процесса игры"""
-        self.game_monitor_timer = QTimer()
-        self.game_monitor_timer.timeout.connect(self.check_game_running)
-        self.game_monitor_timer.start(5000)  # Проверяем каждые 5 секунд
+    def on_game_exited(self, returncode: int):
+        """Игра закрылась - возвращаем окно из трея"""
+        self.tray_icon.setToolTip("WoW 3.3.5 Launcher")
+        self.show_normal()
 
-    def check_game_running(self):
-        """Проверяет, запущена ли игра"""
-        if not self.game_launcher.is_game_running():
-            self.game_monitor_timer.stop()
-            self.tray_icon.hide()  # Скрываем иконку
-            self.showNormal()  # Восстанавливаем окно
+    def on_game_stats(self, stats: dict):
+        """Показывает потребление ресурсов игрой в подсказке трея"""
+        memory = humanize.naturalsize(stats['rss'], binary=True)
+        self.tray_icon.setToolTip(
+            f"WoW 3.3.5 Launcher\nИгра: CPU {stats['cpu']:.0f}%, память {memory}"
+        )
 
     def show_normal(self):
         """Восстанавливает окно из трея"""
         self.showNormal()
         self.activateWindow()
 
+    def closeEvent(self, event):
+        """Сохраняет состояние загрузки перед выходом"""
+        self.game_launcher.realmlist_selector.stop(self.loop)
+        self.image_loader.shutdown()
+        if self.news_feed:
+            self.news_feed.stop(self.loop)
+        if self.status_push:
+            self.status_push.stop(self.loop)
+        self.game_launcher.shutdown()
+        self.settings_store.flush()
+        super().closeEvent(event)
+
 class SettingsDialog(QDialog):
     def __init__(self, main_window, parent=None):
         super().__init__(parent)
@@ -1041,10 +1320,17 @@ class SettingsDialog(QDialog):
             prefix_layout.addWidget(prefix_input)
             prefix_layout.addWidget(prefix_browse)
             
+            # Заранее запущенный wineserver ускоряет повторные запуски
+            prewarm_check = QCheckBox("Держать wine запущенным между сессиями")
+            prewarm_check.setObjectName("prewarm_check")
+            prewarm_check.setProperty("class", "settings-checkbox")
+            prewarm_check.setChecked(bool(self.settings.get('game', {}).get('prewarm', False)))
+            
             linux_layout.addWidget(runner_label)
             linux_layout.addWidget(runner_combo)
             linux_layout.addWidget(prefix_label)
             linux_layout.addLayout(prefix_layout)
+            linux_layout.addWidget(prewarm_check)
             
             layout.addWidget(linux_group)
         
@@ -1084,9 +1370,41 @@ class SettingsDialog(QDialog):
         layout.addWidget(realmlist_input)
         layout.addWidget(launch_label)
         layout.addWidget(launch_input)
+
+        # Проверка и восстановление файлов клиента
+        verify_layout = QHBoxLayout()
+        verify_btn = QPushButton("Проверить файлы")
+        verify_btn.setObjectName("verify_button")
+        verify_btn.setProperty("class", "browse-button")
+        verify_btn.clicked.connect(lambda: self.start_client_check(repair=False))
+        repair_btn = QPushButton("Восстановить клиент")
+        repair_btn.setObjectName("repair_button")
+        repair_btn.setProperty("class", "browse-button")
+        repair_btn.clicked.connect(lambda: self.start_client_check(repair=True))
+        verify_layout.addWidget(verify_btn)
+        verify_layout.addWidget(repair_btn)
+        verify_layout.addStretch()
+        layout.addLayout(verify_layout)
+
+        # Кэш хешей не видит порчи без изменения размера и mtime - глубокая проверка
+        deep_verify_check = QCheckBox("Глубокая проверка: перечитывать все файлы без кэша")
+        deep_verify_check.setObjectName("deep_verify_check")
+        deep_verify_check.setProperty("class", "settings-checkbox")
+        deep_verify_check.setChecked(bool(self.settings.get('game', {}).get('deep_verify', False)))
+        layout.addWidget(deep_verify_check)
         
         return tab
     
+    def start_client_check(self, repair: bool):
+        """Запускает проверку установленного клиента; прогресс - в главном окне"""
+        path = self.settings.get('game', {}).get('path', '')
+        if not path or not self.game_launcher.validate_game_path(path):
+            QMessageBox.warning(self, "Проверка клиента", "Сначала укажите папку с установленным клиентом.")
+            return
+        deep = self.findChild(QCheckBox, "deep_verify_check").isChecked()
+        self.main_window.verify_client(repair=repair, force=deep)
+        self.reject()
+
     def create_graphics_tab(self):
         tab = QWidget()
         layout = QVBoxLayout(tab)
@@ -1175,6 +1493,7 @@ class SettingsDialog(QDialog):
             # Параметры запуска
             launch_options = game_tab.findChild(QLineEdit, "launch_options").text()
             self.settings['game']['launch_options'] = launch_options
+            self.settings['game']['deep_verify'] = game_tab.findChild(QCheckBox, "deep_verify_check").isChecked()
             
             # Настройки Linux
             if platform.system().lower() == 'linux':
@@ -1183,6 +1502,7 @@ class SettingsDialog(QDialog):
                 
                 self.settings['game']['runner'] = runner
                 self.settings['game']['wineprefix'] = wineprefix
+                self.settings['game']['prewarm'] = game_tab.findChild(QCheckBox, "prewarm_check").isChecked()
             
             # Сохраняем настройки
             self.main_window.settings = self.settings
@@ -0,0 +1,163 @@
+import os
+import asyncio
+import logging
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Optional, Callable
+from urllib.parse import urljoin
+import aiohttp
+
+from src.utils.file_verifier import FileVerifier, sha1_file
+from src.utils.delta_patch import apply_delta
+
+# Размер блока при потоковой загрузке
+READ_CHUNK = 256 * 1024
+
+@dataclass
+class UpdateItem:
+    path: str
+    sha1: str
+    size: int
+    url: str
+    local_sha1: Optional[str] = None
+    delta_url: Optional[str] = None
+
+    @property
+    def is_delta(self) -> bool:
+        return self.delta_url is not None
+
+class ClientUpdater:
+    """Обновление файлов клиента по манифесту с сервера.
+
+    Манифест обновлений (update_url/manifest.json):
+        {"files": {"Data/patch-4.MPQ": {
+            "sha1": "...", "size": 123, "url": "files/Data/patch-4.MPQ",
+            "deltas": {"<sha1 старой версии>": "deltas/patch-4.delta"}}}}
+
+    Если у клиента есть версия, для которой сервер выложил дельту,
+    качается только дельта, иначе - файл целиком. Новый файл сверяется
+    с SHA1 и атомарно заменяет старый, а его хеш записывается в локальный
+    overlay манифеста, чтобы FileVerifier проверял уже новую версию.
+    """
+
+    def __init__(self, update_url: str, game_path, verifier: FileVerifier):
+        self.update_url = update_url.rstrip('/') + '/'
+        self.game_path = Path(game_path)
+        self.verifier = verifier
+        self.logger = logging.getLogger('ClientUpdater')
+
+    async def fetch_manifest(self, session) -> dict:
+        async with session.get(urljoin(self.update_url, 'manifest.json')) as response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+    async def check(self, session) -> list:
+        """Возвращает список файлов, которые нужно обновить"""
+        manifest = await self.fetch_manifest(session)
+        loop = asyncio.get_running_loop()
+
+        async def check_one(rel_path, entry):
+            # Хеш локальной версии берется из кэша, если файл не менялся
+            result = await loop.run_in_executor(
+                None, self.verifier.check_file, self.game_path, rel_path, entry['sha1'].lower()
+            )
+            if result.ok:
+                return None
+            delta = entry.get('deltas', {}).get(result.actual) if result.actual else None
+            return UpdateItem(
+                path=rel_path,
+                sha1=entry['sha1'].lower(),
+                size=entry.get('size', 0),
+                url=urljoin(self.update_url, entry['url']),
+                local_sha1=result.actual,
+                delta_url=urljoin(self.update_url, delta) if delta else None
+            )
+
+        items = await asyncio.gather(*(
+            check_one(rel_path, entry) for rel_path, entry in manifest.get('files', {}).items()
+        ))
+        if self.verifier.cache:
+            self.verifier.cache.save()
+        return [item for item in items if item]
+
+    async def _download(self, session, url: str, dest: Path, on_chunk=None):
+        """Потоково скачивает url в dest, запись на диск идет вне event loop"""
+        loop = asyncio.get_running_loop()
+        async with session.get(url) as response:
+            response.raise_for_status()
+            f = await loop.run_in_executor(None, open, dest, 'wb')
+            try:
+                async for chunk in response.content.iter_chunked(READ_CHUNK):
+                    await loop.run_in_executor(None, f.write, chunk)
+                    if on_chunk:
+                        on_chunk(len(chunk))
+            finally:
+                await loop.run_in_executor(None, f.close)
+
+    async def apply(self, session, item: UpdateItem, on_chunk=None):
+        """Обновляет один файл через дельту или полной загрузкой"""
+        loop = asyncio.get_running_loop()
+        target = self.game_path / item.path
+        target.parent.mkdir(parents=True, exist_ok=True)
+
+        if item.is_delta:
+            delta_path = target.with_name(target.name + '.delta')
+            try:
+                await self._download(session, item.delta_url, delta_path, on_chunk)
+                await loop.run_in_executor(None, apply_delta, target, delta_path, target)
+                self.logger.info(f"Patched {item.path} with delta")
+                await loop.run_in_executor(None, self._commit, item)
+                return
+            except Exception as e:
+                self.logger.warning(f"Delta update of {item.path} failed, downloading full file: {e}")
+            finally:
+                delta_path.unlink(missing_ok=True)
+
+        part_path = target.with_name(target.name + '.part')
+        try:
+            await self._download(session, item.url, part_path, on_chunk)
+            actual = await loop.run_in_executor(None, sha1_file, part_path)
+            if actual != item.sha1:
+                raise RuntimeError(f"Контрольная сумма не совпала: {item.path}")
+            os.replace(part_path, target)
+        finally:
+            part_path.unlink(missing_ok=True)
+        self.logger.info(f"Downloaded {item.path}")
+        await loop.run_in_executor(None, self._commit, item)
+
+    def _commit(self, item: UpdateItem):
+        """Запоминает новый хеш в локальном манифесте и кэше проверки"""
+        target = self.game_path / item.path
+        if self.verifier.cache:
+            self.verifier.cache.store(target, target.stat(), item.sha1)
+            self.verifier.cache.save()
+        self.verifier.record_hashes({item.path: item.sha1})
+
+    async def update(self, progress_callback: Callable[[int, int, str], None] = None) -> list:
+        """Проверяет и устанавливает все обновления.
+
+        Args:
+            progress_callback: (скачано байт, всего байт, текущий файл)
+
+        Returns:
+            list: Обновленные файлы
+        """
+        async with aiohttp.ClientSession() as session:
+            items = await self.check(session)
+            if not items:
+                return []
+
+            # Для дельт точный размер заранее неизвестен - считаем по полному файлу
+            total = sum(item.size for item in items)
+            done = 0
+            updated = []
+            for item in items:
+                def on_chunk(n, path=item.path):
+                    nonlocal done
+                    done += n
+                    if progress_callback:
+                        progress_callback(done, total, path)
+
+                await self.apply(session, item, on_chunk)
+                updated.append(item.path)
+            return updated
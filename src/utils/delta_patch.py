@@ -0,0 +1,223 @@
+import os
+import mmap
+import zlib
+import struct
+import hashlib
+import logging
+from pathlib import Path
+from typing import Optional, Callable
+
+# Формат дельты:
+#   заголовок: MAGIC, версия, размеры и SHA1 исходного и нового файла
+#   команды:   COPY (смещение в старом файле, длина) | ADD (длина, данные) | END
+MAGIC = b'WLDP'
+VERSION = 1
+HEADER = struct.Struct('<4sB3xQQ20s20s')
+OP_END = 0
+OP_COPY = 1
+OP_ADD = 2
+COPY_ARGS = struct.Struct('<QI')
+ADD_ARGS = struct.Struct('<I')
+
+# Размер буфера при копировании - память на применение патча ограничена им
+BUFFER_SIZE = 1024 * 1024
+# Размер блока при поиске совпадений в create_delta
+BLOCK_SIZE = 64 * 1024
+# Модуль adler32 - для сдвига хеша окна на байт
+ADLER_MOD = 65521
+
+logger = logging.getLogger('DeltaPatch')
+
+def read_header(f) -> dict:
+    """Читает заголовок дельты"""
+    data = f.read(HEADER.size)
+    if len(data) != HEADER.size:
+        raise ValueError("Delta is truncated")
+    magic, version, source_size, target_size, source_sha1, target_sha1 = HEADER.unpack(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Unsupported delta format")
+    return {
+        'source_size': source_size,
+        'target_size': target_size,
+        'source_sha1': source_sha1.hex(),
+        'target_sha1': target_sha1.hex(),
+    }
+
+def _read_exact(f, size: int) -> bytes:
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("Delta is truncated")
+    return data
+
+def apply_delta(source_path, delta_path, target_path,
+                progress_callback: Optional[Callable[[int, int], None]] = None) -> str:
+    """Применяет дельту к файлу потоково, не держа файлы в памяти.
+
+    Результат пишется во временный файл рядом с target_path, сверяется
+    с SHA1 из заголовка дельты и только после этого атомарно заменяет
+    target_path (который может совпадать с source_path).
+
+    Returns:
+        str: SHA1 нового файла
+    """
+    source_path = Path(source_path)
+    target_path = Path(target_path)
+    tmp_path = target_path.with_name(target_path.name + '.patching')
+    h = hashlib.sha1()
+    written = 0
+
+    try:
+        with open(delta_path, 'rb') as delta, open(source_path, 'rb') as source, \
+                open(tmp_path, 'wb') as out:
+            header = read_header(delta)
+            if os.fstat(source.fileno()).st_size != header['source_size']:
+                raise ValueError("Source file size does not match delta")
+
+            def emit(chunk):
+                nonlocal written
+                out.write(chunk)
+                h.update(chunk)
+                written += len(chunk)
+                if progress_callback:
+                    progress_callback(written, header['target_size'])
+
+            while True:
+                op = _read_exact(delta, 1)[0]
+                if op == OP_END:
+                    break
+                if op == OP_COPY:
+                    offset, length = COPY_ARGS.unpack(_read_exact(delta, COPY_ARGS.size))
+                    if offset + length > header['source_size']:
+                        raise ValueError("COPY outside of source file")
+                    source.seek(offset)
+                    while length:
+                        chunk = _read_exact(source, min(length, BUFFER_SIZE))
+                        emit(chunk)
+                        length -= len(chunk)
+                elif op == OP_ADD:
+                    (length,) = ADD_ARGS.unpack(_read_exact(delta, ADD_ARGS.size))
+                    while length:
+                        chunk = _read_exact(delta, min(length, BUFFER_SIZE))
+                        emit(chunk)
+                        length -= len(chunk)
+                else:
+                    raise ValueError(f"Unknown delta op {op}")
+
+            out.flush()
+            os.fsync(out.fileno())
+
+        if written != header['target_size'] or h.hexdigest() != header['target_sha1']:
+            raise RuntimeError(f"Patched file checksum mismatch: {target_path.name}")
+
+        os.replace(tmp_path, target_path)
+        return header['target_sha1']
+
+    except Exception:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+def _map(f):
+    """Отображает файл в память; пустой файл mmap не поддерживает"""
+    size = os.fstat(f.fileno()).st_size
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+def _block_hashes(block) -> tuple:
+    """Слабый (adler32, скользящий) и сильный (SHA1) хеши блока"""
+    return zlib.adler32(block), hashlib.sha1(block).digest()
+
+def create_delta(source_path, target_path, delta_path, block_size: int = BLOCK_SIZE) -> int:
+    """Строит дельту между двумя версиями файла (для подготовки обновлений).
+
+    Алгоритм rsync: блоки старого файла индексируются по слабому хешу
+    (adler32), по новому файлу скользит окно размером с блок. Совпадение
+    слабого хеша подтверждается SHA1 блока, и окно прыгает на блок
+    вперед; при промахе байт уходит в ADD, а хеш окна сдвигается на
+    один байт за O(1). Поэтому вставки и удаления внутри MPQ не сбивают
+    поиск: после измененного места совпадения снова находятся не
+    дальше чем через блок. Файлы отображаются в память и целиком не читаются.
+
+    Returns:
+        int: Размер дельты в байтах
+    """
+    with open(source_path, 'rb') as source_file, open(target_path, 'rb') as target_file, \
+            open(delta_path, 'wb') as out:
+        source = _map(source_file)
+        target = _map(target_file)
+        try:
+            source_size = len(source)
+            target_size = len(target)
+
+            # Индекс полных блоков старого файла: слабый хеш -> {SHA1: смещение}
+            index = {}
+            for offset in range(0, source_size - block_size + 1, block_size):
+                weak, strong = _block_hashes(source[offset:offset + block_size])
+                index.setdefault(weak, {}).setdefault(strong, offset)
+
+            out.write(HEADER.pack(MAGIC, VERSION, source_size, target_size,
+                                  hashlib.sha1(source).digest(), hashlib.sha1(target).digest()))
+            pending_copy = None  # (смещение, длина) - соседние COPY склеиваются
+            pending_add = bytearray()
+
+            def flush_copy():
+                nonlocal pending_copy
+                if pending_copy:
+                    out.write(bytes([OP_COPY]) + COPY_ARGS.pack(*pending_copy))
+                    pending_copy = None
+
+            def flush_add():
+                if pending_add:
+                    out.write(bytes([OP_ADD]) + ADD_ARGS.pack(len(pending_add)))
+                    out.write(pending_add)
+                    pending_add.clear()
+
+            pos = 0
+            weak = None
+            while index and pos + block_size <= target_size:
+                if weak is None:
+                    weak = zlib.adler32(target[pos:pos + block_size])
+                candidates = index.get(weak)
+                match = None
+                if candidates:
+                    match = candidates.get(hashlib.sha1(target[pos:pos + block_size]).digest())
+
+                if match is not None:
+                    flush_add()
+                    if pending_copy and pending_copy[0] + pending_copy[1] == match \
+                            and pending_copy[1] + block_size <= 0xFFFFFFFF:
+                        pending_copy = (pending_copy[0], pending_copy[1] + block_size)
+                    else:
+                        flush_copy()
+                        pending_copy = (match, block_size)
+                    pos += block_size
+                    weak = None
+                    continue
+
+                # Промах: первый байт окна - в ADD, окно сдвигается на байт
+                flush_copy()
+                out_byte = target[pos]
+                pending_add.append(out_byte)
+                if len(pending_add) >= BUFFER_SIZE:
+                    flush_add()
+                if pos + block_size < target_size:
+                    a = (weak & 0xFFFF) - out_byte + target[pos + block_size]
+                    a %= ADLER_MOD
+                    b = ((weak >> 16) - block_size * out_byte + a - 1) % ADLER_MOD
+                    weak = (b << 16) | a
+                pos += 1
+
+            # Хвост короче блока (или весь файл, если совпадать не с чем)
+            flush_copy()
+            for offset in range(pos, target_size, BUFFER_SIZE):
+                pending_add += target[offset:min(offset + BUFFER_SIZE, target_size)]
+                flush_add()
+            flush_add()
+            out.write(bytes([OP_END]))
+            size = out.tell()
+        finally:
+            if isinstance(source, mmap.mmap):
+                source.close()
+            if isinstance(target, mmap.mmap):
+                target.close()
+
+    logger.info(f"Delta {Path(delta_path).name}: {size} bytes for {target_size} byte target")
+    return size
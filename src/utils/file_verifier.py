@@ -0,0 +1,234 @@
+import os
+import mmap
+import json
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Optional, Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Размер блока чтения: hashlib отпускает GIL на больших буферах,
+# поэтому потоки хешируют файлы действительно параллельно
+CHUNK_SIZE = 8 * 1024 * 1024
+
+# Файлы манифеста, которые лаунчер сам перезаписывает перед запуском
+MUTABLE_SUFFIXES = ('.wtf',)
+# Хеши файлов, обновленных ClientUpdater. Манифест в репозитории не трогаем:
+# запись действует, пока в нем прежний хеш, от которого шло обновление
+MANIFEST_OVERLAY = "config/wow_hashes.local.json"
+
+@dataclass
+class FileCheckResult:
+    path: str
+    ok: bool
+    expected: str
+    actual: Optional[str] = None
+    size: int = 0
+    error: Optional[str] = None
+
+@dataclass
+class VerifyReport:
+    results: list
+    bytes_total: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return all(r.ok for r in self.results)
+
+    @property
+    def missing(self) -> list:
+        return [r.path for r in self.results if r.error == 'missing']
+
+    @property
+    def corrupted(self) -> list:
+        return [r.path for r in self.results if not r.ok and r.error != 'missing']
+
+def load_manifest(manifest_path) -> dict:
+    """Загружает манифест хешей {относительный путь: sha1}"""
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    return {
+        path: sha1.lower() for path, sha1 in manifest.items()
+        if not path.lower().endswith(MUTABLE_SUFFIXES)
+    }
+
+def sha1_file(path, chunk_size: int = CHUNK_SIZE,
+              progress_callback: Optional[Callable[[int], None]] = None) -> str:
+    """Считает SHA1 файла через mmap, не загружая его в память целиком"""
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return h.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mm, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            view = memoryview(mm)
+            try:
+                for offset in range(0, size, chunk_size):
+                    chunk = view[offset:offset + chunk_size]
+                    h.update(chunk)
+                    chunk.release()
+                    if progress_callback:
+                        progress_callback(min(chunk_size, size - offset))
+            finally:
+                view.release()
+    return h.hexdigest()
+
+def _load_overlay(overlay_path) -> dict:
+    """Загружает локальные хеши {путь: {'sha1': новый, 'base': из манифеста}}"""
+    try:
+        with open(overlay_path, 'r', encoding='utf-8') as f:
+            overlay = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logging.getLogger('FileVerifier').warning(f"Ignoring broken hash overlay {overlay_path}: {e}")
+        return {}
+    return overlay if isinstance(overlay, dict) else {}
+
+class FileVerifier:
+    """Параллельная проверка файлов клиента по манифесту SHA1"""
+
+    def __init__(self, manifest_path="config/wow_hashes.json", max_workers: int = None,
+                 cache=None, overlay_path=MANIFEST_OVERLAY):
+        self.manifest_path = Path(manifest_path)
+        self.overlay_path = Path(overlay_path)
+        self.cache = cache
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self.logger = logging.getLogger('FileVerifier')
+        self._manifest = None
+        self._lock = threading.Lock()
+
+    @property
+    def manifest(self) -> dict:
+        """Манифест с примененными локальными обновлениями"""
+        manifest = self._manifest
+        if manifest is None:
+            manifest = load_manifest(self.manifest_path)
+            for path, entry in _load_overlay(self.overlay_path).items():
+                # Манифест с тех пор обновился - локальная запись устарела.
+                # base=None - файла в манифесте не было, его добавило обновление
+                if manifest.get(path) == entry.get('base'):
+                    manifest[path] = entry['sha1'].lower()
+            self._manifest = manifest
+        return manifest
+
+    def invalidate(self):
+        """Сбрасывает загруженный манифест, следующее обращение перечитает файлы"""
+        self._manifest = None
+
+    def record_hashes(self, hashes: dict):
+        """Запоминает новые хеши обновленных файлов в локальном overlay
+
+        Файлы, которых нет в манифесте, записываются с base=None.
+
+        Args:
+            hashes: {относительный путь: sha1}
+        """
+        with self._lock:
+            base = load_manifest(self.manifest_path)
+            overlay = _load_overlay(self.overlay_path)
+            for path, sha1 in hashes.items():
+                if not path.lower().endswith(MUTABLE_SUFFIXES):
+                    overlay[path] = {'sha1': sha1.lower(), 'base': base.get(path)}
+            self.overlay_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.overlay_path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(overlay, f, indent=4)
+            os.replace(tmp_path, self.overlay_path)
+            self.invalidate()
+
+    def check_file(self, game_path: Path, rel_path: str, expected: str,
+                   progress_callback=None, force: bool = False) -> FileCheckResult:
+        """Проверяет один файл манифеста
+
+        Если файл есть в кэше и его stat не изменился, хеш берется из кэша.
+        force=True всегда перечитывает файл целиком.
+        """
+        full_path = game_path / rel_path
+        try:
+            st = full_path.stat()
+        except FileNotFoundError:
+            return FileCheckResult(rel_path, False, expected, error='missing')
+        except OSError as e:
+            return FileCheckResult(rel_path, False, expected, error=str(e))
+        size = st.st_size
+
+        actual = None
+        if self.cache and not force:
+            actual = self.cache.lookup(full_path, st)
+            if actual and progress_callback:
+                progress_callback(size)
+
+        if actual is None:
+            try:
+                actual = sha1_file(full_path, progress_callback=progress_callback)
+            except OSError as e:
+                self.logger.error(f"Error hashing {full_path}: {e}")
+                return FileCheckResult(rel_path, False, expected, size=size, error=str(e))
+            if self.cache:
+                self.cache.store(full_path, st, actual)
+
+        ok = actual == expected
+        return FileCheckResult(rel_path, ok, expected, actual, size,
+                               None if ok else 'hash mismatch')
+
+    def verify(self, game_path, files: dict = None,
+               progress_callback: Callable[[int, int], None] = None,
+               file_callback: Callable[[FileCheckResult], None] = None,
+               force: bool = False) -> VerifyReport:
+        """Проверяет файлы параллельно.
+
+        Args:
+            game_path: Корень клиента
+            files: {путь: sha1}, по умолчанию весь манифест
+            progress_callback: (обработано байт, всего байт), вызывается из рабочих потоков
+            file_callback: результат по каждому файлу по мере готовности
+            force: глубокая проверка, игнорируя кэш
+
+        Returns:
+            VerifyReport: Результаты в порядке манифеста
+        """
+        game_path = Path(game_path)
+        files = self.manifest if files is None else files
+
+        sizes = {}
+        for rel_path in files:
+            try:
+                sizes[rel_path] = (game_path / rel_path).stat().st_size
+            except OSError:
+                sizes[rel_path] = 0
+        bytes_total = sum(sizes.values())
+        bytes_done = 0
+        lock = threading.Lock()
+
+        def on_chunk(n):
+            nonlocal bytes_done
+            with lock:
+                bytes_done += n
+                done = bytes_done
+            if progress_callback:
+                progress_callback(done, bytes_total)
+
+        # Крупные файлы первыми, чтобы они не остались «хвостом» в конце
+        order = sorted(files, key=lambda p: sizes[p], reverse=True)
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers,
+                                thread_name_prefix='verify') as pool:
+            futures = {
+                pool.submit(self.check_file, game_path, rel_path, files[rel_path],
+                            on_chunk, force): rel_path
+                for rel_path in order
+            }
+            for future in as_completed(futures):
+                result = future.result()
+                results[result.path] = result
+                if file_callback:
+                    file_callback(result)
+
+        if self.cache:
+            self.cache.save()
+        return VerifyReport([results[p] for p in files], bytes_total)
@@ -1,17 +1,43 @@
 import os
-from subprocess import Popen, PIPE
+import re
+import mmap
+import struct
+from subprocess import Popen, PIPE, run
 from pathlib import Path
 import logging
 import platform
 import shutil
 import json
+import time
+import threading
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
 from PySide6.QtCore import QObject, Signal
 from src.utils.torrent_manager import TorrentManager
+from src.utils.file_verifier import FileVerifier
+from src.utils.verify_cache import VerifyCache
+from src.utils.torrent_verifier import PieceVerifier
+from src.api.realmlist_selector import RealmlistSelector
+from src.utils.process_supervisor import ProcessSupervisor, find_processes
+from src.utils.launch_trace import LaunchTrace, LaunchTraceLog
+from src.utils.wine_prewarm import WinePrefixSession
+from src.utils.mpq_prefetch import MpqPrefetcher
+from src.utils.mpq_reader import MpqArchive
+
+# Сигнатура VS_FIXEDFILEINFO в ресурсе версии exe
+VS_FIXEDFILEINFO_SIGNATURE = b'\xbd\x04\xef\xfe'
+FRAMEXML_TOC = 'Interface\\FrameXML\\FrameXML.toc'
 
 class GameLauncherSignals(QObject):
     client_missing = Signal()  # Сигнал об отсутствии клиента
     download_progress = Signal(float, str, float)  # прогресс, статус, скорость
     download_error = Signal(str)  # ошибка загрузки
+    download_finished = Signal()  # загрузка завершена
+    client_playable = Signal()  # файлы для запуска докачаны, можно играть
+    verify_progress = Signal(float, str)  # прогресс проверки (%), этап: checking, checking pieces, finished
+    file_verified = Signal(str, bool)  # файл, результат проверки
+    verify_finished = Signal(bool, list)  # успех, список битых/отсутствующих файлов
+    launch_finished = Signal(bool, dict)  # игра запущена, длительности шагов (мс)
 
 class GameLauncher:
     def __init__(self, settings: dict, parent=None):
@@ -23,7 +49,10 @@ class GameLauncher:
         self.account_username = None
         self.account_id = None
         self.torrent_manager = None
+        self.http_downloader = None  # загрузка с HTTP-зеркала (game.mirror_url)
         self.client_version = "3.3.5a"
+        self.client_build = 12340
+        self.client_interface = 30300
         self.required_size = 17_179_869_184  # 16GB в байтах
         # Кэшируем пути к файлам
         self.game_path = Path(settings.get('game', {}).get('path', ''))
@@ -33,14 +62,38 @@ class GameLauncher:
             self.game_path / 'Data' / 'realmlist.wtf'
         ]
         self.client_info = None
+        # Подготовка к запуску: кэш Config.wtf и записанных файлов, замеры шагов
+        self._config_cache = None
+        self._written = {}
+        self._launch_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='LaunchPrep')
+        self._launch_lock = threading.Lock()
+        self._launching = False
+        self.last_launch_timings = {}
+        # Запущенная игра: дерево процессов, выход и потребление ресурсов
+        self.supervisor = ProcessSupervisor()
+        # Хронологии запусков от нажатия кнопки до первого MPQ
+        self.trace_log = LaunchTraceLog()
+        self.last_trace = None
+        # Заранее поднятый wineserver префикса (game.prewarm)
+        self.prefix_session = WinePrefixSession(settings, on_process=self.supervisor.ignore)
+        # Прогрев кэша MPQ (game.prefetch, объем - game.prefetch_budget_mb)
+        self.prefetcher = MpqPrefetcher(self._prefetch_budget())
+        self.verify_cache = VerifyCache("config/verify_cache.json")
+        self.verifier = FileVerifier("config/wow_hashes.json", cache=self.verify_cache)
+        # Несколько logon-адресов - при запуске выбирается ближайший
+        self.realmlist_selector = RealmlistSelector(self.get_realmlist_candidates())
         self.torrent_path = Path("assets/client/wow-3.3.5.torrent")
         self.trackers = [
             "udp://tracker1.example.com:6969/announce",
             "udp://tracker2.example.com:6969/announce"
         ]
 
-    def validate_game_path(self, path: str) -> bool:
-        """Проверяет корректность пути к игре"""
+    def validate_game_path(self, path: str, deep: bool = False) -> bool:
+        """Проверяет корректность пути к игре
+
+        deep=True дополнительно сверяет SHA1 обязательных файлов. Благодаря
+        кэшу повторная проверка неизмененного клиента не читает файлы заново.
+        """
         if not path:
             self.signals.client_missing.emit()
             return False
@@ -59,11 +112,80 @@ class GameLauncher:
                 if not required_file.exists():
                     self.logger.error(f"Missing required file: {required_file}")
                     return False
+
+            if deep:
+                manifest = self.verifier.manifest
+                files = {
+                    rel_path: manifest[rel_path]
+                    for rel_path in ('Wow.exe', 'Data/common.MPQ', 'Data/common-2.MPQ')
+                    if rel_path in manifest
+                }
+                report = self.verifier.verify(game_path, files)
+                if not report.ok:
+                    self.logger.error(f"Corrupted required files: {report.corrupted}")
+                    return False
             return True
         except Exception as e:
             self.logger.error(f"Error validating game path: {e}")
             return False
 
+    def on_setting_changed(self, category: str, key: str, value):
+        """Обновляет закэшированные пути и адреса при изменении настроек"""
+        if category != 'game':
+            return
+        if key == 'path':
+            self.game_path = Path(value or '')
+            self.config_path = self.game_path / 'WTF' / 'Config.wtf'
+            self.realmlist_paths = [
+                self.game_path / 'Data' / 'ruRU' / 'realmlist.wtf',
+                self.game_path / 'Data' / 'realmlist.wtf'
+            ]
+        elif key in ('realmlist', 'realmlists'):
+            self.realmlist_selector.set_hosts(self.get_realmlist_candidates())
+        elif key == 'prefetch_budget_mb':
+            self.prefetcher.budget = self._prefetch_budget()
+        elif key in ('prewarm', 'runner', 'wineprefix', 'wineserver'):
+            # Остановка старого сервера долгая - перезапуск идет в фоне
+            self.prefix_session.restart(self.prewarm, lambda: self.supervisor.running)
+
+    def get_realmlist_candidates(self) -> list:
+        """Адреса logon-серверов из настроек (realmlists или realmlist)"""
+        game = self.settings.get('game', {})
+        hosts = game.get('realmlists') or []
+        if not hosts:
+            hosts = [game.get('realmlist', 'logon.server.com')]
+        return hosts
+
+    def get_realmlist(self) -> str:
+        """Realmlist для запуска: самый быстрый доступный из кандидатов"""
+        game = self.settings.get('game', {})
+        if not game.get('realmlists'):
+            return game.get('realmlist', 'logon.server.com')
+        return self.realmlist_selector.best()
+
+    def _write_if_changed(self, path: Path, content: str) -> bool:
+        """Пишет файл, только если его содержимое отличается.
+
+        Returns:
+            bool: True, если файл был перезаписан
+        """
+        data = content.encode('utf-8')
+        try:
+            st = path.stat()
+            # Файл не трогали с нашей записи - сравнивать содержимое не нужно
+            if self._written.get(path) == (st.st_mtime_ns, st.st_size, data):
+                return False
+            if st.st_size == len(data) and path.read_bytes() == data:
+                self._written[path] = (st.st_mtime_ns, st.st_size, data)
+                return False
+        except FileNotFoundError:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        st = path.stat()
+        self._written[path] = (st.st_mtime_ns, st.st_size, data)
+        return True
+
     def update_realmlist(self, path: str, realmlist: str) -> bool:
         """Обновляет файл realmlist.wtf"""
         try:
@@ -77,9 +199,7 @@ class GameLauncher:
             updated = False
             for data_path in data_paths:
                 try:
-                    data_path.parent.mkdir(parents=True, exist_ok=True)
-                    with open(data_path, 'w', encoding='utf-8') as f:
-                        f.write(f'set realmlist {realmlist}\n')
+                    self._write_if_changed(data_path, f'set realmlist {realmlist}\n')
                     updated = True
                 except Exception as e:
                     self.logger.warning(f"Could not update {data_path}: {e}")
@@ -89,25 +209,37 @@ class GameLauncher:
             self.logger.error(f"Error updating realmlist: {e}")
             return False
 
-    def update_config_wtf(self, path: str) -> bool:
+    def _read_config_wtf(self, config_path: Path) -> dict:
+        """Разобранный Config.wtf с сохранением порядка ключей.
+
+        Файл перечитывается, только если изменился с прошлого чтения.
+        """
+        try:
+            st = config_path.stat()
+        except FileNotFoundError:
+            return {}
+        signature = (config_path, st.st_mtime_ns, st.st_size)
+        if self._config_cache and self._config_cache[0] == signature:
+            return dict(self._config_cache[1])
+
+        config = {}
+        with open(config_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('SET '):
+                    key, value = line[4:].strip().split(' ', 1)
+                    config[key] = value.strip('"')
+        self._config_cache = (signature, config)
+        return dict(config)
+
+    def update_config_wtf(self, path: str, realmlist: str = None) -> bool:
         """Обновляет файл Config.wtf для автологина"""
         try:
-            # Получаем realmlist из настроек
-            realmlist = self.settings.get('game', {}).get('realmlist', 'logon.server.com')
+            realmlist = realmlist or self.get_realmlist()
             
             config_path = Path(path) / 'WTF' / 'Config.wtf'
             
-            # Создаем директорию WTF если её нет
-            config_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            # Читаем существующие настройки
-            config = {}
-            if config_path.exists():
-                with open(config_path, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        if line.startswith('SET '):
-                            key, value = line[4:].strip().split(' ', 1)
-                            config[key] = value.strip('"')
+            # Читаем существующие настройки (из памяти, если файл не менялся)
+            config = self._read_config_wtf(config_path)
             
             # Обновляем настройки
             if self.account_username:
@@ -130,8 +262,6 @@ class GameLauncher:
                 'readTerminationWithoutNotice': '1',
                 'accounttype': 'LK',
                 'lastSelectedRealm': '1',  # Индекс последнего выбранного реалма
-                'realmList': realmlist,  # Адрес сервера
-                'patchlist': f"'{realmlist}'",  # Адрес сервера для патчей
                 'accountListType': "1",  # Тип списка аккаунтов
                 'autoSelect': "1",  # Автовыбор аккаунта
                 'autoConnect': "1"  # Автоподключение
@@ -140,15 +270,22 @@ class GameLauncher:
             for key, value in defaults.items():
                 if key not in config:
                     config[key] = value
+
+            # Адрес сервера пишем всегда: селектор мог выбрать другой logon-хост
+            config['realmList'] = realmlist
+            config['patchlist'] = f"'{realmlist}'"
             
-            # Записываем обновленный конфиг
-            with open(config_path, 'w', encoding='utf-8') as f:
-                for key, value in config.items():
-                    # Если значение похоже на число, записываем без кавычек
-                    if value.replace('.', '').isdigit():
-                        f.write(f'SET {key} {value}\n')
-                    else:
-                        f.write(f'SET {key} "{value}"\n')
+            # Записываем обновленный конфиг, если он изменился
+            lines = []
+            for key, value in config.items():
+                # Если значение похоже на число, записываем без кавычек
+                if value.replace('.', '').isdigit():
+                    lines.append(f'SET {key} {value}\n')
+                else:
+                    lines.append(f'SET {key} "{value}"\n')
+            if self._write_if_changed(config_path, ''.join(lines)):
+                st = config_path.stat()
+                self._config_cache = ((config_path, st.st_mtime_ns, st.st_size), config)
             
             return True
             
@@ -161,80 +298,167 @@ class GameLauncher:
         self.account_username = username
         self.account_id = account_id
 
-    def launch_game(self) -> bool:
-        """Запускает игру с заданными параметрами"""
-        try:
-            game_path = self.settings.get('game', {}).get('path', '')
-            if not game_path or not self.validate_game_path(game_path):
-                self.logger.error("Invalid game path")
+    def start_launch(self) -> bool:
+        """Запускает игру в фоновом потоке; результат придет сигналом launch_finished"""
+        clicked_at = time.perf_counter()
+        with self._launch_lock:
+            if self._launching:
                 return False
+            self._launching = True
+        threading.Thread(target=self._launch_in_background, args=(clicked_at,),
+                         name='GameLaunch', daemon=True).start()
+        return True
 
-            # Обновляем realmlist
-            realmlist = self.settings.get('game', {}).get('realmlist', 'logon.server.com')
-            if not self.update_realmlist(game_path, realmlist):
-                return False
+    def _launch_in_background(self, clicked_at: float):
+        try:
+            success = self.launch_game(clicked_at)
+        finally:
+            with self._launch_lock:
+                self._launching = False
+        self.signals.launch_finished.emit(success, dict(self.last_launch_timings))
 
-            # Обновляем Config.wtf для автологина
-            if self.account_username and not self.update_config_wtf(game_path):
-                return False
+    def _timed(self, name: str, func, *args):
+        """Выполняет шаг запуска и запоминает его длительность (мс)"""
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.last_launch_timings[name] = (time.perf_counter() - start) * 1000
 
-            # Формируем путь к исполняемому файлу
-            exe_path = str(Path(game_path) / 'Wow.exe')
+    def prepare_launch(self, game_path: str) -> bool:
+        """Подготовка к запуску: проверка клиента, затем realmlist и Config.wtf параллельно"""
+        # Проверка - это несколько stat, а писать файлы в чужую папку нельзя.
+        # С game.deep_verify сверяются и SHA1 обязательных файлов (через кэш)
+        deep = bool(self.settings.get('game', {}).get('deep_verify', False))
+        if not self._timed('validate', self.validate_game_path, game_path, deep):
+            self.logger.error("Invalid game path")
+            return False
 
-            # Формируем параметры запуска
-            launch_options = self.settings.get('game', {}).get('launch_options', '').split()
-            
-            # Добавляем параметры графики
-            graphics = self.settings.get('graphics', {})
-            if graphics.get('windowed', False):
-                launch_options.append('-windowed')
-            
-            resolution = graphics.get('resolution', '1920x1080')
-            if resolution:
-                width, height = resolution.split('x')
-                launch_options.extend(['-width', width, '-height', height])
+        # Ближайший доступный logon-сервер
+        realmlist = self.get_realmlist()
+        steps = [self._launch_pool.submit(
+            self._timed, 'realmlist', self.update_realmlist, game_path, realmlist
+        )]
+        # Config.wtf для автологина
+        if self.account_username:
+            steps.append(self._launch_pool.submit(
+                self._timed, 'config_wtf', self.update_config_wtf, game_path, realmlist
+            ))
+        return all(step.result() for step in steps)
 
-            # Запускаем процесс
-            if self.platform == 'linux':
-                try:
-                    runner = self.settings.get('game', {}).get('runner', 'wine')
-                    
-                    if runner == 'portproton':
-                        cmd = ['portproton', exe_path] + launch_options
-                    elif runner == 'wine':
-                        cmd = ['wine', exe_path] + launch_options
-                    elif runner == 'lutris':
-                        cmd = ['lutris', 'rungame', exe_path] + launch_options
-                    elif runner == 'proton':
-                        cmd = ['proton', 'run', exe_path] + launch_options
-                    elif runner == 'crossover':
-                        cmd = ['crossover', exe_path] + launch_options
-                    else:
-                        raise RuntimeError(f"Неизвестный эмулятор: {runner}")
-                      
-                    # Добавляем переменные окружения для Wine
-                    env = os.environ.copy()
-                    if self.settings.get('game', {}).get('wineprefix'):
-                        env['WINEPREFIX'] = self.settings['game']['wineprefix']
-                    env['WINEARCH'] = 'win32'
-                      
-                    # Запускаем процесс
-                    Popen(cmd, env=env)
-                    
-                except Exception as e:
-                    self.logger.error(f"Error launching with Wine: {e}")
-                    return False
-                    
-            elif self.platform == 'darwin':
-                Popen(['open', exe_path, '--args'] + launch_options)
+    def _build_launch_command(self, game_path: str) -> tuple[list, Optional[dict]]:
+        """Командная строка и окружение для запуска клиента"""
+        # Формируем путь к исполняемому файлу
+        exe_path = str(Path(game_path) / 'Wow.exe')
+
+        # Формируем параметры запуска
+        launch_options = self.settings.get('game', {}).get('launch_options', '').split()
+        
+        # Добавляем параметры графики
+        graphics = self.settings.get('graphics', {})
+        if graphics.get('windowed', False):
+            launch_options.append('-windowed')
+        
+        resolution = graphics.get('resolution', '1920x1080')
+        if resolution:
+            width, height = resolution.split('x')
+            launch_options.extend(['-width', width, '-height', height])
+
+        if self.platform == 'linux':
+            runner = self.settings.get('game', {}).get('runner', 'wine')
+            
+            if runner == 'portproton':
+                cmd = ['portproton', exe_path] + launch_options
+            elif runner == 'wine':
+                cmd = ['wine', exe_path] + launch_options
+            elif runner == 'lutris':
+                cmd = ['lutris', 'rungame', exe_path] + launch_options
+            elif runner == 'proton':
+                cmd = ['proton', 'run', exe_path] + launch_options
+            elif runner == 'crossover':
+                cmd = ['crossover', exe_path] + launch_options
             else:
-                Popen([exe_path] + launch_options)
+                raise RuntimeError(f"Неизвестный эмулятор: {runner}")
+              
+            return cmd, self._wine_env()
                 
+        if self.platform == 'darwin':
+            return ['open', exe_path, '--args'] + launch_options, None
+        return [exe_path] + launch_options, None
+
+    def _wine_env(self) -> dict:
+        """Окружение для Wine"""
+        env = os.environ.copy()
+        if self.settings.get('game', {}).get('wineprefix'):
+            env['WINEPREFIX'] = self.settings['game']['wineprefix']
+        env['WINEARCH'] = 'win32'
+        return env
+
+    def prewarm(self) -> bool:
+        """Поднимает wineserver префикса заранее, если это включено в настройках"""
+        if self.platform != 'linux' or not self.settings.get('game', {}).get('prewarm'):
+            return False
+        return self.prefix_session.start(self._wine_env())
+
+    def _prefetch_budget(self) -> Optional[int]:
+        budget_mb = self.settings.get('game', {}).get('prefetch_budget_mb')
+        return int(budget_mb) * 1024 * 1024 if budget_mb is not None else None
+
+    def prefetch(self) -> bool:
+        """Прогревает кэш MPQ клиента в фоне, если это не выключено в настройках"""
+        game = self.settings.get('game', {})
+        if not game.get('prefetch', True) or not game.get('path'):
+            return False
+        try:
+            files = self.verifier.manifest
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"MPQ prefetch skipped, no manifest: {e}")
+            return False
+        return self.prefetcher.start(game['path'], files)
+
+    def _launch_context(self) -> dict:
+        """Условия запуска для хронологии - по ним сравниваются запуски"""
+        context = {'platform': self.platform, 'prefetch': self.prefetcher.state}
+        if self.platform == 'linux':
+            game = self.settings.get('game', {})
+            context['runner'] = game.get('runner', 'wine')
+            context['wineprefix'] = game.get('wineprefix') or None
+            context['prewarm'] = self.prefix_session.ready
+        return context
+
+    def launch_game(self, clicked_at: float = None) -> bool:
+        """Запускает игру с заданными параметрами
+
+        Args:
+            clicked_at: time.perf_counter() нажатия кнопки - для замера задержки
+        """
+        clicked_at = clicked_at or time.perf_counter()
+        self.last_launch_timings = {}
+        try:
+            game_path = self.settings.get('game', {}).get('path', '')
+            # Прогрев идет в фоне и запуск не ждет
+            self.prefetch()
+            if not game_path or not self.prepare_launch(game_path):
+                return False
+
+            cmd, env = self._timed('command', self._build_launch_command, game_path)
+
+            # Запускаем процесс и передаем его под наблюдение
+            process = self._timed('popen', lambda: Popen(cmd, env=env))
+            trace = LaunchTrace(clicked_at, self.trace_log, self._launch_context())
+            trace.mark('popen')
+            trace.steps.update(self.last_launch_timings)
+            self.last_trace = trace
+            self.supervisor.watch(process, trace)
+            self.last_launch_timings['click_to_popen'] = trace.milestones['popen']
+            self.logger.info("Launch timings: " + ", ".join(
+                f"{name} {ms:.1f} ms" for name, ms in self.last_launch_timings.items()
+            ))
             return True
 
         except Exception as e:
             self.logger.error(f"Error launching game: {e}")
-            return False 
+            return False
 
     def _check_free_space(self, path: str) -> bool:
         """Проверяет достаточно ли свободного места"""
@@ -245,30 +469,127 @@ class GameLauncher:
             self.logger.error(f"Error checking free space: {e}")
             return False
 
-    def _verify_client_files(self, path: str) -> tuple[bool, list[str]]:
-        """Проверяет целостность файлов клиента"""
-        missing_files = []
-        game_path = Path(path)
-        
-        # Список критически важных файлов и их MD5
-        required_files = {
-            'Wow.exe': 'expected_md5_1',
-            'Data/common.MPQ': 'expected_md5_2',
-            'Data/common-2.MPQ': 'expected_md5_3',
-            'Data/expansion.MPQ': 'expected_md5_4',
-            'Data/lichking.MPQ': 'expected_md5_5',
-            'Data/patch.MPQ': 'expected_md5_6',
-        }
-        
-        for file_path, expected_md5 in required_files.items():
-            full_path = game_path / file_path
-            if not full_path.exists():
-                missing_files.append(file_path)
-                continue
-                
-            # TODO: Добавить проверку MD5
-        
-        return len(missing_files) == 0, missing_files
+    def _verify_progress_emitter(self, status: str):
+        """Колбэк прогресса (сделано, всего) для рабочих потоков проверки.
+
+        Сигнал уходит не чаще раза на процент и из одного потока за раз.
+        """
+        last_percent = -1
+        lock = threading.Lock()
+
+        def on_progress(done, total):
+            nonlocal last_percent
+            percent = int(done * 100 / total) if total else 100
+            with lock:
+                if percent <= last_percent:
+                    return
+                last_percent = percent
+                self.signals.verify_progress.emit(float(percent), status)
+
+        return on_progress
+
+    def _verify_client_files(self, path: str, force: bool = False) -> tuple[bool, list[str]]:
+        """Проверяет целостность файлов клиента по SHA1 из wow_hashes.json
+
+        Перехешируются только файлы, у которых изменились размер, mtime или inode.
+        force=True - глубокая проверка всех файлов без учета кэша.
+        """
+        on_progress = self._verify_progress_emitter("checking")
+
+        def on_file(result):
+            if not result.ok:
+                self.logger.warning(f"Verification failed for {result.path}: {result.error}")
+            self.signals.file_verified.emit(result.path, result.ok)
+
+        try:
+            report = self.verifier.verify(path, progress_callback=on_progress,
+                                          file_callback=on_file, force=force)
+        except Exception as e:
+            self.logger.error(f"Error verifying client files: {e}")
+            self.signals.verify_finished.emit(False, [])
+            return False, []
+
+        bad_files = report.missing + report.corrupted
+        self.signals.verify_progress.emit(100.0, "finished")
+        self.signals.verify_finished.emit(report.ok, bad_files)
+        return report.ok, bad_files
+
+    def start_verification(self, path: str = None, force: bool = False):
+        """Запускает проверку клиента в фоновом потоке"""
+        path = path or self.settings.get('game', {}).get('path', '')
+        thread = threading.Thread(target=self._verify_client_files, args=(path, force), daemon=True)
+        thread.start()
+        return thread
+
+    def start_repair(self, path: str = None):
+        """Запускает проверку по частям торрента и докачку битых частей в фоновом потоке"""
+        thread = threading.Thread(target=self._repair_client, args=(path,), daemon=True)
+        thread.start()
+        return thread
+
+    def _repair_client(self, path: str = None) -> bool:
+        """Проверяет клиент по частям торрента и докачивает только битые части"""
+        path = path or self.settings.get('game', {}).get('path', '')
+        try:
+            if not self.torrent_path.exists():
+                raise RuntimeError("Торрент файл не найден")
+
+            verifier = PieceVerifier(self.torrent_path)
+            report = verifier.verify(
+                path, progress_callback=self._verify_progress_emitter("checking pieces")
+            )
+            self.signals.verify_finished.emit(report.ok, report.affected_files)
+            if report.ok:
+                return True
+
+            self.logger.info(
+                f"Repairing {len(report.bad_pieces())} pieces ({report.bytes_to_repair} bytes)"
+            )
+            if not self.torrent_manager:
+                self.torrent_manager = TorrentManager()
+
+            self.torrent_manager.repair(
+                torrent_path=str(self.torrent_path),
+                game_path=path,
+                have_pieces=report.have_pieces(),
+                trackers=self.trackers,
+                status_callback=self._emit_download_status,
+                finished_callback=self._on_download_finished,
+                error_callback=self.signals.download_error.emit
+            )
+            # Эти файлы будут перезаписаны - их хеши в кэше больше не актуальны
+            for rel_path in report.affected_files:
+                self.verify_cache.invalidate(Path(path) / rel_path)
+            self.verify_cache.save()
+            return True
+
+        except Exception as e:
+            self.logger.error(f"Error repairing client: {e}")
+            self.signals.download_error.emit(str(e))
+            return False
+
+    async def update_client(self, update_url: str = None) -> list:
+        """Скачивает обновления файлов клиента, по возможности дельтами"""
+        update_url = update_url or self.settings.get('game', {}).get('update_url')
+        path = self.settings.get('game', {}).get('path', '')
+        if not update_url or not path:
+            return []
+        try:
+            # aiohttp нужен только при обновлении - не тянем его на старте
+            from src.utils.client_updater import ClientUpdater
+            updater = ClientUpdater(update_url, path, self.verifier)
+            updated = await updater.update(
+                progress_callback=lambda done, total, _: self.signals.download_progress.emit(
+                    done * 100 / total if total else 100.0, "patching", 0
+                )
+            )
+            if updated:
+                self.logger.info(f"Updated files: {updated}")
+                self.signals.download_finished.emit()
+            return updated
+        except Exception as e:
+            self.logger.error(f"Error updating client: {e}")
+            return []
 
     async def _get_client_info(self):
         """Получает информацию о клиенте с сервера"""
@@ -277,35 +598,96 @@ class GameLauncher:
         return self.client_info
         
     def _verify_client_version(self, path: str) -> bool:
-        """Проверяет версию клиента"""
+        """Проверяет версию клиента: сборку Wow.exe и версию интерфейса в MPQ.
+
+        Неудачей считается только несовпадение; если версию прочитать не
+        удалось (нестандартный exe, нет архивов локализации), клиент не
+        отвергается.
+        """
         try:
             exe_path = Path(path) / "Wow.exe"
             if not exe_path.exists():
                 return False
-                
-            # TODO: Добавить проверку версии из exe
+
+            version = self._read_exe_version(exe_path)
+            if version is not None and version[3] != self.client_build:
+                self.logger.error(
+                    f"Unsupported client build {'.'.join(map(str, version))}, "
+                    f"expected {self.client_version} ({self.client_build})"
+                )
+                return False
+
+            interface = self._read_interface_version(Path(path))
+            if interface is not None and interface != self.client_interface:
+                self.logger.error(f"Unsupported interface version {interface}, expected {self.client_interface}")
+                return False
             return True
         except Exception as e:
             self.logger.error(f"Error verifying client version: {e}")
             return False
 
+    def _read_exe_version(self, exe_path: Path) -> Optional[tuple]:
+        """Версия файла из ресурса VS_VERSIONINFO: (3, 3, 5, 12340)"""
+        with open(exe_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            # Ресурсы в конце файла - ищем с конца
+            offset = data.rfind(VS_FIXEDFILEINFO_SIGNATURE)
+            if offset < 0 or offset + 16 > len(data):
+                return None
+            # dwSignature, dwStrucVersion, dwFileVersionMS, dwFileVersionLS
+            _, _, version_ms, version_ls = struct.unpack_from('<4I', data, offset)
+        return version_ms >> 16, version_ms & 0xFFFF, version_ls >> 16, version_ls & 0xFFFF
+
+    def _locale_archives(self, game_path: Path) -> list:
+        """MPQ локализации в порядке приоритета: patch-ruRU-3, patch-ruRU-2, patch-ruRU, locale-ruRU"""
+        data_path = game_path / 'Data'
+        if not data_path.is_dir():
+            return []
+
+        def patch_number(archive: Path) -> int:
+            match = re.search(r'-(\d+)\.mpq$', archive.name.lower())
+            return int(match.group(1)) if match else 1
+
+        archives = []
+        for locale_dir in sorted(data_path.iterdir()):
+            if not locale_dir.is_dir() or len(locale_dir.name) != 4:
+                continue
+            files = [f for f in locale_dir.iterdir() if f.suffix.lower() == '.mpq']
+            patches = [f for f in files if f.name.lower().startswith('patch-')]
+            archives += sorted(patches, key=patch_number, reverse=True)
+            archives += [f for f in files if f.name.lower().startswith('locale-')]
+        return archives
+
+    def _read_interface_version(self, game_path: Path) -> Optional[int]:
+        """Версия интерфейса (## Interface:) из FrameXML.toc самого свежего архива"""
+        for archive_path in self._locale_archives(game_path):
+            try:
+                with MpqArchive(archive_path) as archive:
+                    if FRAMEXML_TOC not in archive:
+                        continue
+                    toc = archive.read(FRAMEXML_TOC).decode('utf-8', errors='replace')
+            except (OSError, ValueError) as e:
+                self.logger.warning(f"Could not read {archive_path.name}: {e}")
+                continue
+            match = re.search(r'^##\s*Interface:\s*(\d+)', toc, re.MULTILINE)
+            return int(match.group(1)) if match else None
+        return None
+
     def is_game_running(self) -> bool:
         """Проверяет, запущена ли игра"""
+        if self.supervisor.running:
+            return True
         if self.platform == 'linux':
-            # Для Linux проверяем процесс wine
+            # Игру могли запустить не из лаунчера - ищем Wow.exe в /proc
             try:
-                result = subprocess.run(['pgrep', '-f', 'Wow.exe'], 
-                                      stdout=subprocess.PIPE)
-                return result.returncode == 0
-            except:
+                return bool(find_processes('Wow.exe'))
+            except OSError:
                 return False
         else:
             # Для Windows проверяем процесс Wow.exe
             try:
-                result = subprocess.run(['tasklist', '/FI', 'IMAGENAME eq Wow.exe'],
-                                      stdout=subprocess.PIPE)
+                result = run(['tasklist', '/FI', 'IMAGENAME eq Wow.exe'], stdout=PIPE)
                 return b"Wow.exe" in result.stdout
-            except:
+            except OSError:
                 return False
 
     def _download_client(self):
@@ -321,24 +703,58 @@ class GameLauncher:
             # Создаем директорию если её нет
             Path(self.settings['game']['path']).mkdir(parents=True, exist_ok=True)
 
-            # Инициализируем TorrentManager
-            if not self.torrent_manager:
-                self.torrent_manager = TorrentManager()
+            # При наличии HTTP-зеркала качаем с него, иначе через торрент.
+            # torrent_manager остается торрентовым - через него идет восстановление
+            mirror_url = self.settings.get('game', {}).get('mirror_url')
+            if mirror_url:
+                if not self.http_downloader:
+                    from src.utils.http_downloader import HttpDownloader
+                    self.http_downloader = HttpDownloader(mirror_url, verifier=self.verifier)
+                downloader = self.http_downloader
+            else:
+                if not self.torrent_manager:
+                    self.torrent_manager = TorrentManager()
+                downloader = self.torrent_manager
 
             # Показываем прогресс в футере
             self.signals.download_progress.emit(0, '', 0)
 
             # Запускаем загрузку
-            self.torrent_manager.start_download(
+            downloader.start_download(
                 torrent_path=str(self.torrent_path),
                 save_path=self.settings['game']['path'],
                 trackers=self.trackers,
-                status_callback=lambda s: self.signals.download_progress.emit(
-                    s.progress, s.state, s.speed
-                )
+                status_callback=self._emit_download_status,
+                finished_callback=self._on_download_finished,
+                error_callback=self.signals.download_error.emit,
+                playable_callback=self.signals.client_playable.emit
             )
 
         except Exception as e:
             self.logger.error(f"Error downloading client: {e}")
             self.signals.download_error.emit(str(e))
             raise
+
+    def _emit_download_status(self, status):
+        """Пробрасывает статус из потока TorrentManager в UI через сигнал"""
+        self.signals.download_progress.emit(status.progress, status.state, status.speed)
+
+    def _on_download_finished(self):
+        """Вызывается из потока TorrentManager по окончании загрузки"""
+        self.signals.download_finished.emit()
+
+    def shutdown(self):
+        """Корректно завершает фоновые загрузки с сохранением resume data"""
+        self._launch_pool.shutdown(wait=False)
+        self.prefetcher.stop()
+        # Пока игра идет, ее wineserver не трогаем
+        self.prefix_session.cancel_restart()
+        self.prefix_session.shutdown(keep_running=self.supervisor.running)
+        self.supervisor.stop()
+        for downloader in (self.http_downloader, self.torrent_manager):
+            if not downloader:
+                continue
+            try:
+                downloader.shutdown()
+            except Exception as e:
+                self.logger.error(f"Error shutting down {type(downloader).__name__}: {e}")
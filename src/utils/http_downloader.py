@@ -0,0 +1,365 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional, Callable
+from urllib.parse import quote
+import aiohttp
+
+from src.utils.file_verifier import FileVerifier, sha1_file
+from src.utils.torrent_verifier import TorrentMeta
+from src.utils.torrent_manager import TorrentStatus, DownloadPlanner, PRIORITY_CRITICAL, STATUS_INTERVAL_MS
+
+# Размер одного range-запроса
+SEGMENT_SIZE = 16 * 1024 * 1024
+# Размер блока при чтении ответа
+READ_CHUNK = 256 * 1024
+# Повторные попытки скачать сегмент
+SEGMENT_RETRIES = 3
+# Потоки записи на диск, чтобы не блокировать event loop
+WRITER_THREADS = 4
+
+async def _gather(aws):
+    """gather, который при ошибке отменяет остальные задачи и дожидается их"""
+    tasks = [asyncio.ensure_future(a) for a in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+@dataclass
+class _FileJob:
+    rel_path: str
+    sha1: str
+    dest: Path
+    size: Optional[int] = None  # None - размер неизвестен до конца загрузки
+    ranges: bool = True
+    done_segments: set = field(default_factory=set)
+
+    @property
+    def part_path(self) -> Path:
+        return self.dest.with_name(self.dest.name + '.part')
+
+    @property
+    def state_path(self) -> Path:
+        return self.dest.with_name(self.dest.name + '.part.json')
+
+    @property
+    def num_segments(self) -> int:
+        return max(1, ((self.size or 0) + SEGMENT_SIZE - 1) // SEGMENT_SIZE)
+
+    def segment_range(self, index: int) -> tuple[int, int]:
+        start = index * SEGMENT_SIZE
+        return start, min(start + SEGMENT_SIZE, self.size) - 1
+
+class HttpDownloader:
+    """Загрузка клиента с HTTP-зеркала параллельными range-запросами.
+
+    Интерфейс повторяет TorrentManager: start_download сразу возвращает
+    управление, а колбэки вызываются из собственного потока загрузчика.
+    Недокачанные файлы лежат рядом как *.part с картой готовых сегментов
+    в *.part.json, поэтому загрузка продолжается после перезапуска.
+    Каждый файл сверяется с SHA1 из манифеста перед переименованием.
+    """
+
+    def __init__(self, base_url: str, verifier: FileVerifier = None,
+                 connections: int = 16):
+        self.base_url = base_url.rstrip('/')
+        self.verifier = verifier or FileVerifier()
+        self.connections = connections
+        self.planner = DownloadPlanner()
+        self.logger = logging.getLogger('HttpDownloader')
+        self._loop = None
+        self._thread = None
+        self._task = None
+        self._running = None  # asyncio.Event, сброшен на паузе
+        self._writer = None  # ThreadPoolExecutor для записи на диск
+        self._state_lock = threading.Lock()
+        self._sizes = {}  # {путь: размер} из .torrent, если сервер не отдал Content-Length
+        self._bytes_total = 0
+        self._bytes_done = 0
+        self._last_sample = None
+
+    def start_download(self, save_path: str, files: dict = None,
+                       status_callback=None, finished_callback=None,
+                       error_callback=None, playable_callback=None,
+                       torrent_path=None, **kwargs):
+        """Запускает загрузку в фоновом потоке.
+
+        Args:
+            save_path: Корень клиента
+            files: {путь: sha1}, по умолчанию весь манифест
+            torrent_path: .torrent клиента, из него берутся размеры файлов
+        """
+        if self._thread and self._thread.is_alive():
+            raise RuntimeError("Загрузка уже идет")
+        files = self.verifier.manifest if files is None else files
+        self._sizes = {}
+        if torrent_path:
+            try:
+                meta = TorrentMeta.load(torrent_path)
+                self._sizes = {f.path: f.length for f in meta.files if not f.pad}
+            except (OSError, ValueError, KeyError) as e:
+                self.logger.warning(f"Cannot read file sizes from torrent: {e}")
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(Path(save_path), files, status_callback, finished_callback,
+                  error_callback, playable_callback),
+            name='HttpDownloader', daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, save_path, files, status_callback, finished_callback,
+             error_callback, playable_callback):
+        asyncio.set_event_loop(self._loop)
+        self._task = self._loop.create_task(self._download_all(
+            save_path, files, status_callback, playable_callback
+        ))
+        try:
+            self._loop.run_until_complete(self._task)
+            if finished_callback:
+                finished_callback()
+        except asyncio.CancelledError:
+            self.logger.info("Download cancelled")
+        except Exception as e:
+            self.logger.error(f"Error downloading from mirror: {e}")
+            if error_callback:
+                error_callback(str(e))
+        finally:
+            if self.verifier.cache:
+                self.verifier.cache.save()
+            self._loop.close()
+
+    def url_for(self, rel_path: str) -> str:
+        return f"{self.base_url}/{quote(rel_path)}"
+
+    async def _download_all(self, save_path: Path, files: dict,
+                            status_callback, playable_callback):
+        self._running = asyncio.Event()
+        self._running.set()
+        connector = aiohttp.TCPConnector(
+            limit=self.connections,
+            limit_per_host=self.connections,
+            keepalive_timeout=60
+        )
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=30)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            # Критичные для запуска файлы первыми, ролики и озвучка - последними
+            jobs = [
+                _FileJob(rel_path, sha1, save_path / rel_path)
+                for rel_path, sha1 in sorted(
+                    files.items(), key=lambda item: -self.planner.classify(item[0])
+                )
+            ]
+            jobs = await self._prepare(session, save_path, jobs)
+            critical = [j for j in jobs if self.planner.classify(j.rel_path) == PRIORITY_CRITICAL]
+
+            reporter = asyncio.ensure_future(self._report_status(status_callback))
+            semaphore = asyncio.Semaphore(self.connections)
+            self._writer = ThreadPoolExecutor(WRITER_THREADS, thread_name_prefix='HttpWriter')
+            try:
+                if critical:
+                    await _gather(self._download_file(session, j, semaphore) for j in critical)
+                if playable_callback:
+                    playable_callback()
+                rest = [j for j in jobs if j not in critical]
+                await _gather(self._download_file(session, j, semaphore) for j in rest)
+            finally:
+                reporter.cancel()
+                self._writer.shutdown(wait=True)
+                self._emit_status(status_callback, "finished")
+
+    async def _prepare(self, session, save_path: Path, jobs: list) -> list:
+        """Отбрасывает уже готовые файлы, узнает размеры и поднимает .part"""
+        loop = asyncio.get_running_loop()
+
+        async def prepare(job):
+            # Хеш берется из VerifyCache, неизмененные файлы не перечитываются
+            result = await loop.run_in_executor(
+                None, self.verifier.check_file, save_path, job.rel_path, job.sha1
+            )
+            if result.ok:
+                return None
+            async with session.head(self.url_for(job.rel_path), allow_redirects=True) as response:
+                response.raise_for_status()
+                length = response.headers.get('Content-Length')
+                job.size = int(length) if length is not None else self._sizes.get(job.rel_path)
+                job.ranges = (job.size is not None and
+                              response.headers.get('Accept-Ranges', '').lower() == 'bytes')
+            if job.size is None:
+                self.logger.warning(f"Unknown size of {job.rel_path}, downloading as a stream")
+            await loop.run_in_executor(None, self._load_state, job)
+            return job
+
+        pending = [j for j in await _gather(prepare(j) for j in jobs) if j]
+
+        self._bytes_total = sum(j.size or 0 for j in pending)
+        self._bytes_done = sum(
+            j.segment_range(i)[1] - j.segment_range(i)[0] + 1
+            for j in pending for i in j.done_segments
+        )
+        return pending
+
+    def _load_state(self, job: _FileJob):
+        """Восстанавливает карту готовых сегментов недокачанного файла"""
+        try:
+            with open(job.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if (state.get('size') == job.size and state.get('segment_size') == SEGMENT_SIZE
+                    and job.part_path.stat().st_size == job.size):
+                job.done_segments = set(state.get('done', []))
+                return
+        except (OSError, ValueError):
+            pass
+        job.done_segments = set()
+
+    def _save_state(self, job: _FileJob, done: list):
+        with self._state_lock:
+            tmp_path = job.state_path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'size': job.size, 'segment_size': SEGMENT_SIZE, 'done': done}, f)
+            os.replace(tmp_path, job.state_path)
+
+    def _create_part(self, job: _FileJob):
+        """Создает .part нужного размера, если его нет или он от другой версии"""
+        job.dest.parent.mkdir(parents=True, exist_ok=True)
+        if (job.size is None or not job.part_path.exists()
+                or job.part_path.stat().st_size != job.size):
+            with open(job.part_path, 'wb') as f:
+                f.truncate(job.size or 0)
+            job.done_segments = set()
+
+    async def _download_file(self, session, job: _FileJob, semaphore):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._writer, self._create_part, job)
+
+        if job.size == 0:
+            segments = []
+        elif job.ranges:
+            segments = [i for i in range(job.num_segments) if i not in job.done_segments]
+        else:
+            # Сервер без Range - один поток на весь файл, докачка невозможна
+            segments = [None]
+            self._bytes_done -= sum(
+                job.segment_range(i)[1] - job.segment_range(i)[0] + 1 for i in job.done_segments
+            )
+            job.done_segments = set()
+
+        await _gather(self._download_segment(session, job, i, semaphore) for i in segments)
+
+        actual = await loop.run_in_executor(None, sha1_file, job.part_path)
+        if actual != job.sha1:
+            job.part_path.unlink(missing_ok=True)
+            job.state_path.unlink(missing_ok=True)
+            raise RuntimeError(f"Контрольная сумма не совпала: {job.rel_path}")
+        await loop.run_in_executor(None, self._finish_file, job, actual)
+        self.logger.info(f"Downloaded {job.rel_path}")
+
+    def _finish_file(self, job: _FileJob, sha1: str):
+        """Переносит проверенный .part на место и запоминает хеш в кэше"""
+        os.replace(job.part_path, job.dest)
+        job.state_path.unlink(missing_ok=True)
+        if self.verifier.cache:
+            self.verifier.cache.store(job.dest, job.dest.stat(), sha1)
+
+    async def _download_segment(self, session, job: _FileJob, index, semaphore):
+        loop = asyncio.get_running_loop()
+        if index is None:
+            start, headers = 0, {}
+            end = job.size - 1 if job.size is not None else None
+        else:
+            start, end = job.segment_range(index)
+            headers = {'Range': f'bytes={start}-{end}'}
+
+        for attempt in range(SEGMENT_RETRIES):
+            written = 0
+            try:
+                async with semaphore:
+                    async with session.get(self.url_for(job.rel_path), headers=headers) as response:
+                        if index is not None and response.status != 206:
+                            raise RuntimeError(f"HTTP {response.status} for range request")
+                        response.raise_for_status()
+                        # Запись идет в потоках self._writer, loop занят только сетью
+                        f = await loop.run_in_executor(self._writer, open, job.part_path, 'r+b')
+                        try:
+                            await loop.run_in_executor(self._writer, f.seek, start)
+                            async for chunk in response.content.iter_chunked(READ_CHUNK):
+                                await self._running.wait()
+                                await loop.run_in_executor(self._writer, f.write, chunk)
+                                written += len(chunk)
+                                self._bytes_done += len(chunk)
+                            if index is None:
+                                # Отрезаем хвост от прошлой, более длинной попытки
+                                await loop.run_in_executor(self._writer, f.truncate)
+                        finally:
+                            await loop.run_in_executor(self._writer, f.close)
+                if end is None:
+                    # Размер стал известен только по факту загрузки
+                    job.size = written
+                    self._bytes_total += written
+                elif written != end - start + 1:
+                    raise RuntimeError(f"Short read: {written} of {end - start + 1} bytes")
+                if index is not None:
+                    job.done_segments.add(index)
+                    await loop.run_in_executor(
+                        self._writer, self._save_state, job, sorted(job.done_segments)
+                    )
+                return
+            except (aiohttp.ClientError, asyncio.TimeoutError, RuntimeError) as e:
+                self._bytes_done -= written
+                if attempt == SEGMENT_RETRIES - 1:
+                    raise
+                self.logger.warning(f"Retrying {job.rel_path} [{start}-{end}]: {e}")
+                await asyncio.sleep(2 ** attempt)
+
+    async def _report_status(self, status_callback):
+        """Отдает статус не чаще STATUS_INTERVAL_MS, как и TorrentManager"""
+        while True:
+            await asyncio.sleep(STATUS_INTERVAL_MS / 1000)
+            self._emit_status(status_callback, "progress" if self._running.is_set() else "paused")
+
+    def _emit_status(self, status_callback, state: str):
+        now = time.monotonic()
+        last_time, last_bytes = self._last_sample or (now, self._bytes_done)
+        elapsed = now - last_time
+        speed = (self._bytes_done - last_bytes) / elapsed if elapsed > 0 else 0.0
+        self._last_sample = (now, self._bytes_done)
+        if status_callback:
+            status_callback(TorrentStatus(
+                updated_at=int(time.time()),
+                bytes_total=self._bytes_total,
+                bytes_done=self._bytes_done,
+                progress=self._bytes_done * 100 / self._bytes_total if self._bytes_total else 100.0,
+                state=state,
+                speed=speed
+            ))
+
+    def pause(self):
+        """Приостанавливает загрузку"""
+        if self._loop and self._running:
+            self._loop.call_soon_threadsafe(self._running.clear)
+
+    def resume(self):
+        """Продолжает загрузку"""
+        if self._loop and self._running:
+            self._loop.call_soon_threadsafe(self._running.set)
+
+    def stop(self):
+        """Прерывает загрузку, недокачанные сегменты останутся в .part"""
+        if self._loop and self._task and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def shutdown(self):
+        self.stop()
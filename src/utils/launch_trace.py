@@ -0,0 +1,212 @@
+import os
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime
+
+LAUNCH_TRACE_LOG = "config/launch_traces.jsonl"
+# По скольким последним запускам считаются перцентили
+SUMMARY_WINDOW = 50
+SUMMARY_PERCENTILES = (50, 90, 99)
+# Журнал обрезается до LAUNCH_TRACE_KEEP последних записей, когда
+# становится больше LAUNCH_TRACE_MAX_BYTES
+LAUNCH_TRACE_KEEP = 500
+LAUNCH_TRACE_MAX_BYTES = 1024 * 1024
+# Журнал читается с конца блоками такого размера
+READ_BLOCK = 64 * 1024
+# Условия, по которым в логе сравниваются запуски, и веха, на которую они влияют
+COMPARE_KEYS = {'prewarm': 'wow_exec', 'prefetch': 'io_idle'}
+
+def percentile(values: list, p: float) -> float:
+    """Перцентиль с линейной интерполяцией между соседними значениями"""
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100
+    lower = int(k)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (k - lower)
+
+class LaunchTrace:
+    """Хронология одного запуска игры.
+
+    steps - длительности шагов подготовки (validate, realmlist,
+    config_wtf, command, popen), milestones - моменты от нажатия кнопки:
+        popen      - процесс обертки создан
+        wow_exec   - в дереве процессов появился Wow.exe
+        first_mpq  - Wow.exe открыл первый MPQ
+        io_idle    - чтение файлов затихло: клиент загрузился до экрана входа
+        exit       - игра закрылась раньше, чем дошла до всех вех
+    Все значения в миллисекундах. context - условия запуска (эмулятор,
+    префикс), по ним можно сравнивать настройки.
+    """
+
+    def __init__(self, clicked_at: float, log: 'LaunchTraceLog' = None, context: dict = None):
+        self.clicked_at = clicked_at
+        self.started = time.time()
+        self.log = log
+        self.context = context or {}
+        self.steps = {}
+        self.milestones = {}
+        self.details = {}
+        self.finished = False
+
+    def since_click(self, at: float = None) -> float:
+        """Миллисекунды от нажатия до at (time.perf_counter())"""
+        return ((at or time.perf_counter()) - self.clicked_at) * 1000
+
+    def mark(self, name: str, at: float = None, detail: str = None):
+        """Отмечает веху; повторные отметки той же вехи игнорируются"""
+        if name in self.milestones:
+            return
+        self.milestones[name] = round(self.since_click(at), 1)
+        if detail:
+            self.details[name] = detail
+
+    def finish(self):
+        """Записывает хронологию в журнал (один раз)"""
+        if self.finished:
+            return
+        self.finished = True
+        if self.log:
+            self.log.append(self)
+
+    def to_record(self) -> dict:
+        return {
+            'time': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+            'context': self.context,
+            'steps': {name: round(ms, 1) for name, ms in self.steps.items()},
+            'milestones': self.milestones,
+            'details': self.details,
+        }
+
+class LaunchTraceLog:
+    """Журнал хронологий запусков (JSON Lines) со сводкой по перцентилям.
+
+    Сводки читают файл с конца и останавливаются, набрав нужное число
+    записей; сам файл не растет больше LAUNCH_TRACE_MAX_BYTES.
+    """
+
+    def __init__(self, path=LAUNCH_TRACE_LOG):
+        self.path = Path(path)
+        self.logger = logging.getLogger('LaunchTrace')
+        self._lock = threading.Lock()
+
+    def append(self, trace: LaunchTrace):
+        record = trace.to_record()
+        try:
+            with self._lock:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                    size = f.tell()
+                if size > LAUNCH_TRACE_MAX_BYTES:
+                    self._compact()
+        except OSError as e:
+            self.logger.error(f"Error writing launch trace: {e}")
+            return
+
+        self.logger.info("Launch timeline: " + ", ".join(
+            f"{name} {ms:.0f} ms" for name, ms in record['milestones'].items()
+        ))
+        for line in self.format_summary(**trace.context):
+            self.logger.info(line)
+        for key, milestone in COMPARE_KEYS.items():
+            if key in trace.context:
+                context = {k: v for k, v in trace.context.items() if k not in COMPARE_KEYS}
+                self.logger.info(self.format_comparison(key, milestone, **context))
+
+    def _compact(self):
+        """Оставляет в журнале LAUNCH_TRACE_KEEP последних записей (под self._lock)"""
+        lines = []
+        for line in self._lines_from_end():
+            lines.append(line)
+            if len(lines) >= LAUNCH_TRACE_KEEP:
+                break
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.writelines(line + b'\n' for line in reversed(lines))
+        os.replace(tmp_path, self.path)
+
+    def _lines_from_end(self):
+        """Непустые строки журнала от последней к первой; файл читается с конца"""
+        with open(self.path, 'rb') as f:
+            position = f.seek(0, os.SEEK_END)
+            tail = b''
+            while position > 0:
+                size = min(READ_BLOCK, position)
+                position -= size
+                f.seek(position)
+                lines = (f.read(size) + tail).split(b'\n')
+                # Первая строка блока может быть неполной - она дочитается со следующим
+                tail = lines.pop(0)
+                for line in reversed(lines):
+                    if line.strip():
+                        yield line
+            if tail.strip():
+                yield tail
+
+    def records(self, limit: int = SUMMARY_WINDOW, **context) -> list:
+        """Последние limit записей; context отбирает запуски с такими условиями"""
+        result = []
+        try:
+            for line in self._lines_from_end():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if all(record.get('context', {}).get(key) == value for key, value in context.items()):
+                    result.append(record)
+                    if len(result) >= limit:
+                        break
+        except OSError:
+            return []
+        result.reverse()
+        return result
+
+    def summary(self, limit: int = SUMMARY_WINDOW, **context) -> dict:
+        """Перцентили шагов и вех по последним запускам.
+
+        Returns:
+            dict: {'launches': N, 'steps': {шаг: {'count', 'p50', ...}}, 'milestones': {...}}
+        """
+        records = self.records(limit, **context)
+        result = {'launches': len(records)}
+        for section in ('steps', 'milestones'):
+            values = {}
+            for record in records:
+                for name, ms in record.get(section, {}).items():
+                    values.setdefault(name, []).append(ms)
+            result[section] = {
+                name: {'count': len(samples),
+                       **{f"p{p}": round(percentile(samples, p), 1) for p in SUMMARY_PERCENTILES}}
+                for name, samples in values.items()
+            }
+        return result
+
+    def format_summary(self, limit: int = SUMMARY_WINDOW, **context) -> list:
+        """Сводка в виде строк для лога или консоли"""
+        summary = self.summary(limit, **context)
+        where = ", ".join(f"{key}={value}" for key, value in context.items())
+        lines = [f"Launch summary over {summary['launches']} launches" + (f" ({where})" if where else "")]
+        for section in ('steps', 'milestones'):
+            for name, stats in summary[section].items():
+                percentiles = ", ".join(f"p{p} {stats[f'p{p}']:.0f}" for p in SUMMARY_PERCENTILES)
+                lines.append(f"  {section[:-1]} {name:<14} {percentiles} ms (n={stats['count']})")
+        return lines
+
+    def format_comparison(self, key: str, milestone: str = None,
+                          limit: int = SUMMARY_WINDOW, **context) -> str:
+        """Медиана вехи для разных значений условия key (например, с прогревом и без)"""
+        milestone = milestone or COMPARE_KEYS.get(key, 'wow_exec')
+        groups = {}
+        for record in self.records(limit * 2, **context):
+            value = record.get('milestones', {}).get(milestone)
+            if value is not None and key in record.get('context', {}):
+                groups.setdefault(record['context'][key], []).append(value)
+        if not groups:
+            return f"No launches to compare by {key}"
+        return f"{milestone} p50 by {key}: " + ", ".join(
+            f"{value} {percentile(samples[-limit:], 50):.0f} ms (n={len(samples[-limit:])})"
+            for value, samples in groups.items()
+        )
@@ -0,0 +1,177 @@
+import os
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import Optional
+
+# Какая доля доступной памяти может уйти под кэш MPQ
+PREFETCH_RAM_SHARE = 0.5
+# Память, которая остается самой игре (32-битный клиент)
+GAME_MEMORY_RESERVE = 2 * 1024 ** 3
+PREFETCH_CHUNK = 32 * 1024 * 1024
+# Повторный прогрев не раньше чем через (с): кэш за это время вряд ли вытеснен
+PREFETCH_TTL = 10 * 60
+# Порядок прогрева: файлы сначала ищутся в патчах, при входе читается
+# локализация (DBC, интерфейс), при входе в мир - модели и текстуры
+PREFETCH_PRIORITY = ('patch', 'locale', 'common', 'expansion', 'lichking')
+# Озвучка читается по мере надобности, резервные архивы не читаются вовсе
+PREFETCH_SKIP = ('speech', 'backup')
+# Файловые системы, где fadvise не запускает чтение - читаем файлы сами
+NETWORK_FILESYSTEMS = ('nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', '9p', 'ceph')
+
+def available_memory() -> int:
+    """Доступная память (MemAvailable) в байтах; 0, если узнать нельзя"""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return 0
+
+def filesystem_type(path) -> Optional[str]:
+    """Тип файловой системы, на которой лежит path (по /proc/self/mounts)"""
+    path = os.path.realpath(path)
+    best, fs_type = '', None
+    try:
+        with open('/proc/self/mounts') as f:
+            for line in f:
+                fields = line.split()
+                mount_point = fields[1].replace('\\040', ' ')
+                prefix = mount_point.rstrip('/') + '/'
+                if (path == mount_point or path.startswith(prefix)) and len(mount_point) >= len(best):
+                    best, fs_type = mount_point, fields[2]
+    except OSError:
+        pass
+    return fs_type
+
+def prefetch_priority(rel_path: str) -> int:
+    name = Path(rel_path).name.lower()
+    for index, pattern in enumerate(PREFETCH_PRIORITY):
+        if pattern in name:
+            return index
+    return len(PREFETCH_PRIORITY)
+
+def prefetch_plan(game_path, files, budget: int) -> list:
+    """MPQ из манифеста, которые помещаются в бюджет, в порядке прогрева.
+
+    Returns:
+        list: [(путь, размер)]
+    """
+    candidates = sorted(
+        (rel_path for rel_path in files
+         if rel_path.lower().endswith('.mpq')
+         and not any(skip in Path(rel_path).name.lower() for skip in PREFETCH_SKIP)),
+        key=lambda rel_path: (prefetch_priority(rel_path), rel_path)
+    )
+    plan = []
+    for rel_path in candidates:
+        path = Path(game_path) / rel_path
+        try:
+            size = path.stat().st_size
+        except OSError:
+            continue
+        # Большой архив, который не влез, не мешает прогреть меньшие следом
+        if size <= budget:
+            plan.append((path, size))
+            budget -= size
+    return plan
+
+class MpqPrefetcher:
+    """Прогрев страничного кэша MPQ перед запуском игры.
+
+    В фоновом потоке просит ядро заранее прочитать архивы, которые
+    клиент открывает при входе и в мир (posix_fadvise WILLNEED
+    кусками по PREFETCH_CHUNK). На сетевых файловых системах и там, где
+    fadvise нет, файлы читаются напрямую. Объем ограничен долей
+    доступной памяти за вычетом памяти самой игры, чтобы прогрев не
+    вытеснял ничего нужного. Кнопку «Играть» прогрев не задерживает.
+    """
+
+    def __init__(self, budget: int = None):
+        self.budget = budget  # None - по доступной памяти
+        self.logger = logging.getLogger('MpqPrefetcher')
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._finished_at = None
+
+    @property
+    def state(self) -> str:
+        """'running', 'done' (кэш прогрет недавно) или 'cold'"""
+        if self._thread and self._thread.is_alive():
+            return 'running'
+        if self._finished_at and time.monotonic() - self._finished_at < PREFETCH_TTL:
+            return 'done'
+        return 'cold'
+
+    def memory_budget(self) -> int:
+        if self.budget is not None:
+            return self.budget
+        return max(0, int((available_memory() - GAME_MEMORY_RESERVE) * PREFETCH_RAM_SHARE))
+
+    def start(self, game_path, files) -> bool:
+        """Запускает прогрев в фоне (если он не идет и не был сделан недавно)
+
+        Args:
+            game_path: Папка клиента
+            files: Относительные пути файлов клиента (манифест)
+        """
+        with self._lock:
+            if self.state != 'cold':
+                return False
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(Path(game_path), list(files)),
+                                            name='MpqPrefetch', daemon=True)
+            self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, game_path: Path, files: list):
+        started = time.perf_counter()
+        budget = self.memory_budget()
+        plan = prefetch_plan(game_path, files, budget)
+        use_read = not hasattr(os, 'posix_fadvise') or filesystem_type(game_path) in NETWORK_FILESYSTEMS
+        done = 0
+        for path, size in plan:
+            if self._stop.is_set():
+                break
+            try:
+                self._prefetch_file(path, size, use_read)
+                done += size
+            except OSError as e:
+                self.logger.warning(f"Could not prefetch {path.name}: {e}")
+
+        self.stats = {
+            'files': len(plan), 'bytes': done, 'budget': budget,
+            'seconds': time.perf_counter() - started, 'mode': 'read' if use_read else 'fadvise',
+        }
+        if done and not self._stop.is_set():
+            self._finished_at = time.monotonic()
+        self.logger.info(
+            f"Prefetched {done / 1024 ** 2:.0f} MB of {len(plan)} MPQ "
+            f"(budget {budget / 1024 ** 2:.0f} MB, {self.stats['mode']}) "
+            f"in {self.stats['seconds']:.1f} s"
+        )
+
+    def _prefetch_file(self, path: Path, size: int, use_read: bool):
+        with open(path, 'rb', buffering=0) as f:
+            if use_read:
+                buffer = bytearray(PREFETCH_CHUNK)
+                while not self._stop.is_set() and f.readinto(buffer):
+                    pass
+                return
+            fd = f.fileno()
+            # Кусками: ядро ставит чтение в очередь, а мы можем остановиться
+            for offset in range(0, size, PREFETCH_CHUNK):
+                if self._stop.is_set():
+                    return
+                os.posix_fadvise(fd, offset, min(PREFETCH_CHUNK, size - offset), os.POSIX_FADV_WILLNEED)
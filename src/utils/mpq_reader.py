@@ -0,0 +1,319 @@
+import os
+import bz2
+import sys
+import mmap
+import zlib
+import struct
+from array import array
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Optional, Iterator
+
+# Формат MPQ v1/v2 (архивы клиента 3.3.5):
+#   заголовок: MPQ_MAGIC, размер заголовка и архива, версия формата,
+#              размер сектора, смещения и размеры хеш-таблицы и таблицы блоков
+#   хеш-таблица: (хеш A, хеш B, локаль, платформа, номер блока), зашифрована
+#   таблица блоков: (смещение, сжатый размер, размер, флаги), зашифрована
+# Смещения в таблицах - от начала архива, который может идти не с начала файла.
+MPQ_MAGIC = b'MPQ\x1a'
+MPQ_USER_DATA_MAGIC = b'MPQ\x1b'
+HEADER_V1 = struct.Struct('<4sIIHHIIII')
+HEADER_V2 = struct.Struct('<QHH')
+USER_DATA = struct.Struct('<4sIII')
+# Заголовок ищется с таким шагом (перед архивом могут быть чужие данные)
+HEADER_ALIGN = 0x200
+
+# Флаги блока
+MPQ_FILE_IMPLODE = 0x00000100
+MPQ_FILE_COMPRESS = 0x00000200
+MPQ_FILE_ENCRYPTED = 0x00010000
+MPQ_FILE_FIX_KEY = 0x00020000
+MPQ_FILE_SINGLE_UNIT = 0x01000000
+MPQ_FILE_DELETE_MARKER = 0x02000000
+MPQ_FILE_SECTOR_CRC = 0x04000000
+MPQ_FILE_EXISTS = 0x80000000
+
+# Метод сжатия - первый байт сжатого сектора
+MPQ_COMPRESSION_ZLIB = 0x02
+MPQ_COMPRESSION_BZIP2 = 0x10
+
+HASH_ENTRY_EMPTY = 0xFFFFFFFF
+HASH_ENTRY_DELETED = 0xFFFFFFFE
+LOCALE_NEUTRAL = 0
+
+# Типы хеша имени файла
+HASH_TABLE_OFFSET = 0
+HASH_NAME_A = 1
+HASH_NAME_B = 2
+HASH_FILE_KEY = 3
+
+LISTFILE = '(listfile)'
+MASK32 = 0xFFFFFFFF
+
+def _build_crypt_table() -> array:
+    table = array('I', bytes(4 * 0x500))
+    seed = 0x00100001
+    for index1 in range(0x100):
+        index2 = index1
+        for _ in range(5):
+            seed = (seed * 125 + 3) % 0x2AAAAB
+            high = (seed & 0xFFFF) << 16
+            seed = (seed * 125 + 3) % 0x2AAAAB
+            table[index2] = high | (seed & 0xFFFF)
+            index2 += 0x100
+    return table
+
+CRYPT_TABLE = _build_crypt_table()
+
+def hash_string(name: str, hash_type: int) -> int:
+    """Хеш имени файла в архиве (регистр и вид слеша не важны)"""
+    table = CRYPT_TABLE
+    offset = hash_type << 8
+    seed1, seed2 = 0x7FED7FED, 0xEEEEEEEE
+    for ch in name.replace('/', '\\').encode('utf-8').upper():
+        seed1 = (table[offset + ch] ^ (seed1 + seed2)) & MASK32
+        seed2 = (ch + seed1 + seed2 + (seed2 << 5) + 3) & MASK32
+    return seed1
+
+def _words(data) -> array:
+    words = array('I')
+    words.frombytes(data)
+    if sys.byteorder == 'big':
+        words.byteswap()
+    return words
+
+def decrypt(data, key: int) -> bytes:
+    """Расшифровывает данные; хвост короче 4 байт не шифруется"""
+    whole = len(data) & ~3
+    words = _words(data[:whole])
+    table = CRYPT_TABLE
+    seed1, seed2 = key, 0xEEEEEEEE
+    for i in range(len(words)):
+        seed2 = (seed2 + table[0x400 + (seed1 & 0xFF)]) & MASK32
+        value = words[i] ^ ((seed1 + seed2) & MASK32)
+        words[i] = value
+        seed1 = ((((~seed1 & MASK32) << 21) + 0x11111111) & MASK32) | (seed1 >> 11)
+        seed2 = (value + seed2 + (seed2 << 5) + 3) & MASK32
+    if sys.byteorder == 'big':
+        words.byteswap()
+    return words.tobytes() + bytes(data[whole:])
+
+def decompress(data: bytes) -> bytes:
+    """Распаковывает сектор по байту метода сжатия"""
+    method = data[0]
+    if method == MPQ_COMPRESSION_ZLIB:
+        return zlib.decompress(data[1:])
+    if method == MPQ_COMPRESSION_BZIP2:
+        return bz2.decompress(data[1:])
+    raise ValueError(f"Unsupported MPQ compression 0x{method:02x}")
+
+@dataclass
+class MpqBlock:
+    offset: int       # от начала архива
+    packed_size: int
+    size: int
+    flags: int
+
+class MpqArchive:
+    """Чтение MPQ v1/v2 через mmap.
+
+    Архив не читается в память: при открытии разбирается только
+    заголовок, таблицы расшифровываются один раз при первом поиске
+    (их размер зависит от числа файлов, а не от размера архива), данные
+    файлов берутся из отображения по секторам. Поиск файла - по
+    хеш-таблице, O(1).
+
+    Поддерживаются файлы без сжатия, zlib и bzip2, зашифрованные и
+    цельные (single unit); PKWARE implode и сжатие звука (Huffman/ADPCM)
+    в архивах 3.3.5 не используются для нужных лаунчеру файлов.
+
+    Имена внутри архива - через обратный слеш: Interface\\FrameXML\\FrameXML.toc
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._read_header()
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        mm = getattr(self, '_mm', None)
+        if mm is not None:
+            mm.close()
+            self._mm = None
+        self._file.close()
+
+    def _find_header(self) -> int:
+        mm = self._mm
+        for offset in range(0, len(mm) - HEADER_V1.size + 1, HEADER_ALIGN):
+            magic = mm[offset:offset + 4]
+            if magic == MPQ_MAGIC:
+                return offset
+            if magic == MPQ_USER_DATA_MAGIC:
+                _, _, header_offset, _ = USER_DATA.unpack_from(mm, offset)
+                if mm[offset + header_offset:offset + header_offset + 4] == MPQ_MAGIC:
+                    return offset + header_offset
+        raise ValueError(f"{self.path.name} is not an MPQ archive")
+
+    def _read_header(self):
+        self.archive_offset = self._find_header()
+        (_, self.header_size, self.archive_size, self.format_version, sector_shift,
+         hash_offset, block_offset, self.hash_table_entries,
+         self.block_table_entries) = HEADER_V1.unpack_from(self._mm, self.archive_offset)
+        if self.format_version > 1:
+            raise ValueError(f"Unsupported MPQ format version {self.format_version + 1}")
+        self.sector_size = 512 << sector_shift
+
+        hi_block_offset = hash_offset_high = block_offset_high = 0
+        if self.format_version == 1:
+            hi_block_offset, hash_offset_high, block_offset_high = HEADER_V2.unpack_from(
+                self._mm, self.archive_offset + HEADER_V1.size
+            )
+        self._hash_table_pos = self.archive_offset + (hash_offset_high << 32 | hash_offset)
+        self._block_table_pos = self.archive_offset + (block_offset_high << 32 | block_offset)
+        self._hi_block_table_pos = self.archive_offset + hi_block_offset if hi_block_offset else None
+        self._hash_table = None
+
+    def _read_table(self, pos: int, entries: int, key_name: str) -> array:
+        data = self._mm[pos:pos + entries * 16]
+        if len(data) != entries * 16:
+            raise ValueError(f"{self.path.name}: {key_name} is truncated")
+        return _words(decrypt(data, hash_string(key_name, HASH_FILE_KEY)))
+
+    def _read_tables(self):
+        if self.hash_table_entries & (self.hash_table_entries - 1):
+            raise ValueError(f"{self.path.name}: hash table size is not a power of two")
+        # Плоские массивы по 4 слова на запись
+        self._hash_table = self._read_table(self._hash_table_pos, self.hash_table_entries, '(hash table)')
+        self._block_table = self._read_table(self._block_table_pos, self.block_table_entries, '(block table)')
+        self._hi_block_table = None
+        if self._hi_block_table_pos is not None:
+            self._hi_block_table = array('H')
+            self._hi_block_table.frombytes(
+                self._mm[self._hi_block_table_pos:self._hi_block_table_pos + self.block_table_entries * 2]
+            )
+            if sys.byteorder == 'big':
+                self._hi_block_table.byteswap()
+
+    def _find_block_index(self, name: str, locale: int) -> Optional[int]:
+        if self._hash_table is None:
+            self._read_tables()
+        table = self._hash_table
+        mask = self.hash_table_entries - 1
+        start = hash_string(name, HASH_TABLE_OFFSET) & mask
+        name_a = hash_string(name, HASH_NAME_A)
+        name_b = hash_string(name, HASH_NAME_B)
+        fallback = None
+        for step in range(self.hash_table_entries):
+            i = ((start + step) & mask) * 4
+            block_index = table[i + 3]
+            if block_index == HASH_ENTRY_EMPTY:
+                break
+            if block_index == HASH_ENTRY_DELETED or table[i] != name_a or table[i + 1] != name_b:
+                continue
+            entry_locale = table[i + 2] & 0xFFFF
+            if entry_locale == locale:
+                return block_index
+            # Иначе - нейтральная локаль, а за неимением ее любая
+            if fallback is None or entry_locale == LOCALE_NEUTRAL:
+                fallback = block_index
+        return fallback
+
+    def find(self, name: str, locale: int = LOCALE_NEUTRAL) -> Optional[MpqBlock]:
+        """Блок файла или None, если файла в архиве нет"""
+        index = self._find_block_index(name, locale)
+        if index is None or index >= self.block_table_entries:
+            return None
+        table = self._block_table
+        offset, packed_size, size, flags = table[index * 4:index * 4 + 4]
+        if self._hi_block_table is not None:
+            offset |= self._hi_block_table[index] << 32
+        if not flags & MPQ_FILE_EXISTS or flags & MPQ_FILE_DELETE_MARKER:
+            return None
+        return MpqBlock(offset, packed_size, size, flags)
+
+    def __contains__(self, name: str) -> bool:
+        return self.find(name) is not None
+
+    def _file_key(self, name: str, block: MpqBlock) -> int:
+        key = hash_string(name.replace('/', '\\').rsplit('\\', 1)[-1], HASH_FILE_KEY)
+        if block.flags & MPQ_FILE_FIX_KEY:
+            key = ((key + (block.offset & MASK32)) & MASK32) ^ block.size
+        return key
+
+    def iter_file(self, name: str, locale: int = LOCALE_NEUTRAL) -> Iterator[bytes]:
+        """Содержимое файла по секторам - память не зависит от размера файла"""
+        block = self.find(name, locale)
+        if block is None:
+            raise KeyError(name)
+        if block.flags & MPQ_FILE_IMPLODE:
+            raise ValueError(f"{name}: PKWARE implode is not supported")
+
+        mm = self._mm
+        start = self.archive_offset + block.offset
+        encrypted = block.flags & MPQ_FILE_ENCRYPTED
+        compressed = block.flags & MPQ_FILE_COMPRESS
+        key = self._file_key(name, block) if encrypted else 0
+
+        if block.flags & MPQ_FILE_SINGLE_UNIT:
+            data = mm[start:start + block.packed_size]
+            if encrypted:
+                data = decrypt(data, key)
+            if compressed and block.packed_size < block.size:
+                data = decompress(data)
+            yield data
+            return
+
+        sector_size = self.sector_size
+        sectors = -(-block.size // sector_size)
+        if not compressed:
+            for i in range(sectors):
+                data = mm[start + i * sector_size:start + min((i + 1) * sector_size, block.size)]
+                yield decrypt(data, (key + i) & MASK32) if encrypted else data
+            return
+
+        # Перед сжатыми секторами - таблица их смещений
+        count = sectors + 1 + (1 if block.flags & MPQ_FILE_SECTOR_CRC else 0)
+        offsets = mm[start:start + count * 4]
+        if encrypted:
+            offsets = decrypt(offsets, (key - 1) & MASK32)
+        offsets = _words(offsets)
+        for i in range(sectors):
+            data = mm[start + offsets[i]:start + offsets[i + 1]]
+            if encrypted:
+                data = decrypt(data, (key + i) & MASK32)
+            expected = min(sector_size, block.size - i * sector_size)
+            # Сектор, который не удалось сжать, хранится как есть
+            yield decompress(data) if len(data) < expected else data
+
+    def read(self, name: str, locale: int = LOCALE_NEUTRAL) -> bytes:
+        """Содержимое файла целиком"""
+        return b''.join(self.iter_file(name, locale))
+
+    def extract(self, name: str, target_path, locale: int = LOCALE_NEUTRAL):
+        """Извлекает файл на диск по секторам"""
+        target_path = Path(target_path)
+        tmp_path = target_path.with_name(target_path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            for data in self.iter_file(name, locale):
+                f.write(data)
+        os.replace(tmp_path, target_path)
+
+    def namelist(self) -> list:
+        """Имена файлов из (listfile), которые есть в архиве"""
+        try:
+            listfile = self.read(LISTFILE)
+        except KeyError:
+            return []
+        names = listfile.decode('utf-8', errors='replace').replace(';', '\n').splitlines()
+        return [name.strip() for name in names if name.strip() and name.strip() in self]
@@ -0,0 +1,207 @@
+import os
+import re
+import sys
+import time
+import struct
+import threading
+from array import array
+from bisect import bisect_right
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Optional
+
+# Формат файла:
+#   заголовок: MAGIC, версия, емкость, позиция записи, число записей
+#   затем два массива фиксированной ширины (little-endian):
+#   uint32 времена (unix, с) [capacity] и uint16 онлайн [capacity]
+MAGIC = b'WLPH'
+VERSION = 1
+HEADER = struct.Struct('<4sB3xIII')
+TIME_SIZE = 4
+COUNT_SIZE = 2
+MAX_COUNT = 0xFFFF
+
+# Одна запись в минуту; 60 дней истории - около 500 КБ на реалм
+RESOLUTION = 60
+DEFAULT_CAPACITY = 60 * 24 * 60
+
+HISTORY_DIR = "config/history"
+
+HOUR = 3600
+DAY = 24 * HOUR
+WEEK = 7 * DAY
+
+@dataclass
+class Trend:
+    current: int
+    delta: Optional[int]  # None - истории за период еще нет
+    minimum: int
+    maximum: int
+    samples: int
+
+def history_path(realm_name: str, directory=HISTORY_DIR) -> Path:
+    """Файл истории для реалма"""
+    slug = re.sub(r'[^A-Za-z0-9_-]+', '_', realm_name).strip('_').lower() or 'realm'
+    return Path(directory) / f"{slug}.bin"
+
+class PlayerHistory:
+    """Кольцевой буфер истории онлайна с хранением в бинарном файле.
+
+    Записи лежат в двух массивах фиксированной ширины, поэтому каждая
+    новая запись - это запись 6 байт на место в файле, а поиск момента
+    времени - бинарный поиск по кольцу. Чаще раза в RESOLUTION секунд
+    записи не добавляются: новое значение заменяет последнее.
+    """
+
+    def __init__(self, path, capacity: int = DEFAULT_CAPACITY):
+        self.path = Path(path)
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._times = None
+        self._counts = None
+        self._head = 0   # куда пойдет следующая запись
+        self._size = 0   # сколько записей заполнено
+
+    @property
+    def _times_offset(self) -> int:
+        return HEADER.size
+
+    @property
+    def _counts_offset(self) -> int:
+        return HEADER.size + self.capacity * TIME_SIZE
+
+    def _ensure_loaded(self):
+        """Читает файл при первом обращении"""
+        if self._times is not None:
+            return
+        self._times = array('I', bytes(self.capacity * TIME_SIZE))
+        self._counts = array('H', bytes(self.capacity * COUNT_SIZE))
+        try:
+            with open(self.path, 'rb') as f:
+                magic, version, capacity, head, size = HEADER.unpack(f.read(HEADER.size))
+                if magic != MAGIC or version != VERSION or capacity != self.capacity \
+                        or head >= capacity or size > capacity:
+                    raise ValueError("Unsupported history file")
+                times = array('I')
+                counts = array('H')
+                times.frombytes(f.read(capacity * TIME_SIZE))
+                counts.frombytes(f.read(capacity * COUNT_SIZE))
+                if len(times) != capacity or len(counts) != capacity:
+                    raise ValueError("History file is truncated")
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, struct.error) as e:
+            print(f"Player history {self.path.name} is reset: {e}")
+            return
+        if sys.byteorder == 'big':
+            times.byteswap()
+            counts.byteswap()
+        self._times, self._counts = times, counts
+        self._head, self._size = head, size
+
+    def _create_file(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.capacity, 0, 0))
+            f.truncate(self._counts_offset + self.capacity * COUNT_SIZE)
+        os.replace(tmp_path, self.path)
+
+    def _write_slot(self, slot: int):
+        """Пишет на диск одну запись и заголовок"""
+        if not self.path.exists():
+            self._create_file()
+        with open(self.path, 'r+b') as f:
+            f.seek(self._times_offset + slot * TIME_SIZE)
+            f.write(struct.pack('<I', self._times[slot]))
+            f.seek(self._counts_offset + slot * COUNT_SIZE)
+            f.write(struct.pack('<H', self._counts[slot]))
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, VERSION, self.capacity, self._head, self._size))
+
+    def _slot(self, index: int) -> int:
+        """Логический индекс (0 - самая старая запись) -> место в кольце"""
+        return (self._head - self._size + index) % self.capacity
+
+    def record(self, players_online: int, timestamp: float = None):
+        """Добавляет замер онлайна"""
+        now = int(time.time() if timestamp is None else timestamp)
+        count = max(0, min(int(players_online), MAX_COUNT))
+        with self._lock:
+            self._ensure_loaded()
+            last = self._slot(self._size - 1) if self._size else None
+            if last is not None and now < self._times[last]:
+                # Часы ушли назад - такая точка сломала бы порядок записей
+                return
+            if last is not None and now // RESOLUTION == self._times[last] // RESOLUTION:
+                slot = last
+            else:
+                slot = self._head
+                self._head = (self._head + 1) % self.capacity
+                self._size = min(self._size + 1, self.capacity)
+            self._times[slot] = now
+            self._counts[slot] = count
+            try:
+                self._write_slot(slot)
+            except OSError as e:
+                print(f"Error saving player history: {e}")
+
+    def _find(self, timestamp: int) -> int:
+        """Число записей с временем <= timestamp"""
+        times, slot = self._times, self._slot
+        return bisect_right(range(self._size), timestamp, key=lambda i: times[slot(i)])
+
+    def _window(self, start: int) -> tuple:
+        """Онлайн в записях начиная с логического индекса start"""
+        if start >= self._size:
+            return ()
+        begin = self._slot(start)
+        end = self._slot(self._size - 1) + 1
+        if begin < end:
+            return (self._counts[begin:end],)
+        return (self._counts[begin:], self._counts[:end])
+
+    def latest(self) -> Optional[tuple]:
+        """(время, онлайн) последнего замера"""
+        with self._lock:
+            self._ensure_loaded()
+            if not self._size:
+                return None
+            slot = self._slot(self._size - 1)
+            return self._times[slot], self._counts[slot]
+
+    def value_at(self, timestamp: float) -> Optional[int]:
+        """Онлайн на момент timestamp (последний замер не позже него)"""
+        with self._lock:
+            self._ensure_loaded()
+            index = self._find(int(timestamp))
+            return self._counts[self._slot(index - 1)] if index else None
+
+    def trend(self, period: int, now: float = None) -> Optional[Trend]:
+        """Изменение онлайна и min/max за период (HOUR, DAY, WEEK)"""
+        now = int(time.time() if now is None else now)
+        with self._lock:
+            self._ensure_loaded()
+            if not self._size:
+                return None
+            current = self._counts[self._slot(self._size - 1)]
+            index = self._find(now - period)
+            # Замер на начало периода - последний перед ним
+            delta = current - self._counts[self._slot(index - 1)] if index else None
+            parts = self._window(max(index - 1, 0))
+            return Trend(
+                current=current,
+                delta=delta,
+                minimum=min(min(part) for part in parts),
+                maximum=max(max(part) for part in parts),
+                samples=sum(len(part) for part in parts)
+            )
+
+    def hourly(self) -> Optional[Trend]:
+        return self.trend(HOUR)
+
+    def daily(self) -> Optional[Trend]:
+        return self.trend(DAY)
+
+    def weekly(self) -> Optional[Trend]:
+        return self.trend(WEEK)
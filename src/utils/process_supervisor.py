@@ -0,0 +1,453 @@
+import os
+import sys
+import time
+import ctypes
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+from PySide6.QtCore import QObject, Signal
+
+IS_LINUX = sys.platform.startswith('linux')
+if IS_LINUX:
+    import select
+
+PROC_DIR = "/proc"
+# Как часто ищем новых потомков и снимаем CPU/RSS дерева (с)
+SAMPLE_INTERVAL = 2.0
+# Служебные процессы wine живут дольше игры и игрой не считаются
+WINE_SERVICES = frozenset({
+    'wineserver', 'services.exe', 'winedevice.exe', 'plugplay.exe',
+    'svchost.exe', 'explorer.exe', 'rpcss.exe', 'conhost.exe',
+})
+# Пока запуск трассируется, дерево осматривается чаще (с) и не дольше TRACE_TIMEOUT
+TRACE_INTERVAL = 0.05
+TRACE_TIMEOUT = 120
+GAME_PROCESS = "Wow.exe"
+# Загрузка считается законченной, когда Wow.exe за IO_IDLE_WINDOW (с)
+# прочитал меньше IO_IDLE_BYTES - клиент дошел до экрана входа
+IO_IDLE_WINDOW = 1.0
+IO_IDLE_BYTES = 1024 * 1024
+PR_SET_CHILD_SUBREAPER = 36
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if IS_LINUX else 100
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if IS_LINUX else 4096
+
+@dataclass
+class ProcStat:
+    name: str
+    state: str
+    ppid: int
+    ticks: int  # utime + stime
+    rss: int    # байты
+    starttime: int = 0  # время запуска в тиках с загрузки системы
+
+@dataclass
+class TrackedProcess:
+    pid: int
+    name: str
+    pidfd: Optional[int] = None
+    ticks: int = 0
+    reads: deque = field(default_factory=deque)  # (время, прочитано байт) для вехи io_idle
+
+def read_stat(pid: int) -> Optional[ProcStat]:
+    """Разбирает /proc/<pid>/stat; None, если процесса уже нет"""
+    try:
+        with open(f"{PROC_DIR}/{pid}/stat", 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    # Имя в скобках может содержать пробелы и скобки - режем по последней
+    name = data[data.find(b'(') + 1:data.rfind(b')')].decode(errors='replace')
+    fields = data[data.rfind(b')') + 2:].split()
+    return ProcStat(
+        name=name,
+        state=fields[0].decode(),
+        ppid=int(fields[1]),
+        ticks=int(fields[11]) + int(fields[12]),
+        rss=int(fields[21]) * PAGE_SIZE,
+        starttime=int(fields[19]),
+    )
+
+def children(pid: int) -> list:
+    """Прямые потомки процесса (по всем его потокам)"""
+    result = []
+    try:
+        tasks = os.listdir(f"{PROC_DIR}/{pid}/task")
+    except OSError:
+        return result
+    for tid in tasks:
+        try:
+            with open(f"{PROC_DIR}/{pid}/task/{tid}/children") as f:
+                result.extend(int(child) for child in f.read().split())
+        except OSError:
+            continue
+    return result
+
+def read_io_bytes(pid: int) -> Optional[int]:
+    """Сколько байт процесс прочитал вызовами read (rchar из /proc/<pid>/io)"""
+    try:
+        with open(f"{PROC_DIR}/{pid}/io") as f:
+            for line in f:
+                if line.startswith('rchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def find_open_file(pid: int, suffix: str) -> Optional[str]:
+    """Первый открытый процессом файл с указанным расширением"""
+    fd_dir = f"{PROC_DIR}/{pid}/fd"
+    try:
+        fds = os.listdir(fd_dir)
+    except OSError:
+        return None
+    for fd in fds:
+        try:
+            target = os.readlink(f"{fd_dir}/{fd}")
+        except OSError:
+            continue
+        if target.lower().endswith(suffix):
+            return target
+    return None
+
+def find_processes(name: str) -> list:
+    """pid всех процессов с указанным именем (без запуска pgrep)"""
+    pids = []
+    for entry in os.listdir(PROC_DIR):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"{PROC_DIR}/{entry}/comm") as f:
+                if f.read().strip() == name:
+                    pids.append(int(entry))
+        except OSError:
+            continue
+    return pids
+
+_subreaper = False
+
+def _become_subreaper():
+    """Осиротевшие потомки игры переходят к лаунчеру, а не к init"""
+    global _subreaper
+    if _subreaper:
+        return
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.prctl(PR_SET_CHILD_SUBREAPER, 1, 0, 0, 0) != 0:
+            raise OSError(ctypes.get_errno(), "prctl(PR_SET_CHILD_SUBREAPER) failed")
+        _subreaper = True
+    except (OSError, AttributeError) as e:
+        logging.getLogger('ProcessSupervisor').warning(f"Could not become subreaper: {e}")
+
+class ProcessSupervisor(QObject):
+    """Наблюдение за запущенной игрой без опроса через pgrep.
+
+    Держит все дерево процессов игры: обертку (wine, portproton,
+    lutris...) и ее потомков, включая сам Wow.exe. О завершении
+    процессов сообщает ядро через pidfd - один фоновый поток ждет их в
+    poll. Раз в SAMPLE_INTERVAL поток находит новых потомков и снимает
+    CPU/RSS дерева из /proc, внешние команды не запускаются. Лаунчер
+    становится subreaper'ом, поэтому потомки обертки, которая запустила
+    игру и вышла, не теряются.
+
+    Сигнал exited(код возврата обертки) приходит, как только не осталось
+    процессов игры. Служебные процессы wine при этом не учитываются, но
+    поток дожидается их и убирает зомби.
+
+    Если вместе с процессом передана хронология запуска (LaunchTrace),
+    пока Wow.exe не открыл первый MPQ, дерево осматривается каждые
+    TRACE_INTERVAL и в хронологию попадают вехи wow_exec, first_mpq и
+    io_idle.
+
+    На других системах просто ждем запущенный процесс.
+    """
+
+    exited = Signal(int)
+    stats_updated = Signal(dict)  # processes, cpu (% одного ядра), rss (байты)
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL, parent=None):
+        super().__init__(parent)
+        self.interval = interval
+        self.logger = logging.getLogger('ProcessSupervisor')
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._roots = {}      # pid -> Popen обертки
+        self._pending = []    # pid, которые поток еще не взял под наблюдение
+        self._processes = {}  # pid -> TrackedProcess (только в потоке наблюдения)
+        self._ignored = set() # наши потомки, которые не относятся к игре
+        self._started = None  # starttime первой обертки сессии: более ранние потомки - не игра
+        self._returncode = 0
+        self._trace = None    # хронология последнего запуска, пока она не дописана
+        self._running = False
+        self._closed = False
+        self._thread = None
+        self._wake_r, self._wake_w = os.pipe() if IS_LINUX else (None, None)
+
+    @property
+    def running(self) -> bool:
+        """Идет ли запущенная из лаунчера игра"""
+        return self._running
+
+    def watch(self, popen, trace=None):
+        """Берет под наблюдение запущенный процесс и всех его будущих потомков
+
+        Args:
+            popen: Процесс обертки
+            trace: LaunchTrace запуска - для вех из /proc
+        """
+        if not IS_LINUX:
+            with self._lock:
+                self._roots[popen.pid] = popen
+                self._running = True
+            threading.Thread(target=self._wait, args=(popen, trace),
+                             name='ProcessSupervisor', daemon=True).start()
+            return
+
+        _become_subreaper()
+        stat = read_stat(popen.pid)
+        with self._lock:
+            if not self._running:
+                self._started = stat.starttime if stat else None
+            self._roots[popen.pid] = popen
+            self._pending.append(popen.pid)
+            if self._trace:
+                self._trace.finish()
+            self._trace = trace
+            self._running = True
+            self._closed = False
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='ProcessSupervisor', daemon=True)
+                self._thread.start()
+        self._wake()
+
+    def ignore(self, pid: int):
+        """Исключает собственный процесс лаунчера (например, wineserver) из дерева игры"""
+        with self._lock:
+            self._ignored.add(pid)
+
+    def stop(self):
+        """Прекращает наблюдение (игра продолжает работать)"""
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+            trace, self._trace = self._trace, None
+        if IS_LINUX:
+            self._wake()
+        if thread:
+            thread.join(timeout=1)
+        # Недописанная хронология тоже пригодится
+        if trace:
+            trace.finish()
+
+    def _wake(self):
+        os.write(self._wake_w, b'\0')
+
+    def _wait(self, popen, trace):
+        returncode = popen.wait()
+        if trace:
+            trace.mark('exit')
+            trace.finish()
+        with self._lock:
+            self._roots.pop(popen.pid, None)
+            finished = not self._roots and not self._closed
+            if finished:
+                self._running = False
+        if finished:
+            self.exited.emit(returncode)
+
+    def _run(self):
+        poller = select.poll()
+        poller.register(self._wake_r, select.POLLIN)
+        registered = {}  # pidfd -> pid
+        last_sample = 0.0
+        processes = {}
+        try:
+            while True:
+                with self._lock:
+                    if self._closed:
+                        processes = self._release()
+                        return
+                    pending, self._pending = self._pending, []
+                    trace = self._trace
+                for pid in pending:
+                    self._track(pid)
+                for proc in self._processes.values():
+                    if proc.pidfd is not None and proc.pidfd not in registered:
+                        poller.register(proc.pidfd, select.POLLIN)
+                        registered[proc.pidfd] = proc.pid
+
+                # Без pidfd о выходе узнаем только из /proc - тогда опрашиваем всегда
+                if self._running or any(proc.pidfd is None for proc in self._processes.values()):
+                    timeout = max(0.0, last_sample + self.interval - time.monotonic())
+                    if trace:
+                        timeout = min(timeout, TRACE_INTERVAL)
+                    timeout *= 1000
+                else:
+                    # Игры нет, остались службы wine - просто ждем их выхода
+                    timeout = None
+                for fd, _ in poller.poll(timeout):
+                    if fd == self._wake_r:
+                        os.read(self._wake_r, 4096)
+                        continue
+                    # pidfd стал читаемым - процесс завершился
+                    poller.unregister(fd)
+                    self._forget(registered.pop(fd))
+
+                self._discover()
+                if trace:
+                    self._trace_tick(trace)
+                now = time.monotonic()
+                if timeout is not None and now - last_sample >= self.interval:
+                    self._sample(now - last_sample if last_sample else None)
+                    last_sample = now
+
+                if self._check_finished():
+                    return
+        finally:
+            # Поток мог уже отдать наблюдение новому (выход после _check_finished
+            # или stop) - тогда чужое состояние не трогаем
+            with self._lock:
+                if self._thread is threading.current_thread():
+                    processes = self._release()
+            for proc in processes.values():
+                if proc.pidfd is not None:
+                    os.close(proc.pidfd)
+
+    def _release(self) -> dict:
+        """Освобождает поток наблюдения (под self._lock), возвращает его процессы.
+
+        После этого watch() запустит новый поток с чистым состоянием.
+        """
+        processes, self._processes = self._processes, {}
+        self._thread = None
+        return processes
+
+    def _track(self, pid: int):
+        stat = read_stat(pid)
+        proc = TrackedProcess(pid, stat.name if stat else '')
+        try:
+            proc.pidfd = os.pidfd_open(pid)
+        except (AttributeError, OSError):
+            # Старое ядро или процесс уже убран - о выходе узнаем из /proc
+            pass
+        self._processes[pid] = proc
+
+    def _forget(self, pid: int):
+        proc = self._processes.pop(pid, None)
+        if proc and proc.pidfd is not None:
+            os.close(proc.pidfd)
+        with self._lock:
+            popen = self._roots.pop(pid, None)
+        if popen is not None:
+            popen.poll()
+            if popen.returncode is not None:
+                self._returncode = popen.returncode
+            return
+        # Осиротевший потомок достался нам - убираем зомби
+        try:
+            os.waitpid(pid, os.WNOHANG)
+        except ChildProcessError:
+            pass
+
+    def _trace_tick(self, trace):
+        """Ищет вехи запуска: exec Wow.exe, первый открытый им MPQ и конец загрузки"""
+        now = time.perf_counter()
+        for proc in self._processes.values():
+            if proc.name != GAME_PROCESS:
+                stat = read_stat(proc.pid)
+                if stat is None or stat.name != GAME_PROCESS:
+                    continue
+                proc.name = stat.name
+            trace.mark('wow_exec', now)
+            if 'first_mpq' not in trace.milestones:
+                mpq = find_open_file(proc.pid, '.mpq')
+                if mpq:
+                    trace.mark('first_mpq', now, detail=mpq)
+            elif self._io_idle(proc, now):
+                trace.mark('io_idle', now)
+            break
+
+        if 'io_idle' in trace.milestones or trace.since_click(now) > TRACE_TIMEOUT * 1000:
+            self._finish_trace(trace)
+
+    def _io_idle(self, proc: TrackedProcess, now: float) -> bool:
+        """Чтение Wow.exe затихло на IO_IDLE_WINDOW"""
+        read = read_io_bytes(proc.pid)
+        if read is None:
+            return False
+        proc.reads.append((now, read))
+        # Самый старый замер - последний, сделанный не позже начала окна
+        while len(proc.reads) > 1 and now - proc.reads[1][0] >= IO_IDLE_WINDOW:
+            proc.reads.popleft()
+        since, read_before = proc.reads[0]
+        return now - since >= IO_IDLE_WINDOW and read - read_before < IO_IDLE_BYTES
+
+    def _finish_trace(self, trace):
+        trace.finish()
+        with self._lock:
+            if self._trace is trace:
+                self._trace = None
+
+    def _discover(self):
+        """Добавляет новых потомков игры и сирот, перешедших к лаунчеру"""
+        with self._lock:
+            # Завершившиеся pid забываем, иначе их повторное использование скроет игру
+            self._ignored = {pid for pid in self._ignored if os.path.exists(f"{PROC_DIR}/{pid}")}
+            ignored = set(self._ignored)
+            started = self._started
+        launcher = os.getpid()
+        for parent in [launcher, *self._processes]:
+            for pid in children(parent):
+                if pid in self._processes or pid in ignored:
+                    continue
+                if parent == launcher and started is not None:
+                    # Процессы, запущенные лаунчером раньше игры (прогрев wine), - не игра
+                    stat = read_stat(pid)
+                    if stat is None or stat.starttime < started:
+                        continue
+                self._track(pid)
+
+    def _sample(self, elapsed: Optional[float]):
+        ticks = rss = count = 0
+        for proc in list(self._processes.values()):
+            stat = read_stat(proc.pid)
+            if stat is None or stat.state in ('Z', 'X'):
+                # С pidfd выход придет событием, без него узнаем только так
+                if proc.pidfd is None:
+                    self._forget(proc.pid)
+                continue
+            proc.name = stat.name
+            ticks += max(0, stat.ticks - proc.ticks)
+            proc.ticks = stat.ticks
+            rss += stat.rss
+            count += 1
+
+        self.stats = {
+            'processes': count,
+            'cpu': ticks / CLOCK_TICKS / elapsed * 100 if elapsed else 0.0,
+            'rss': rss,
+        }
+        if self._running:
+            self.stats_updated.emit(dict(self.stats))
+
+    def _check_finished(self) -> bool:
+        """Сообщает о выходе игры; True, когда следить больше не за кем"""
+        game = [proc for proc in self._processes.values() if proc.name not in WINE_SERVICES]
+        with self._lock:
+            if self._pending:
+                return False
+            finished = self._running and not game
+            if finished:
+                self._running = False
+                trace, self._trace = self._trace, None
+            idle = not self._processes
+            if idle:
+                self._release()
+        if finished:
+            self.logger.info(f"Game exited with code {self._returncode}")
+            if trace:
+                trace.mark('exit')
+                trace.finish()
+            self.exited.emit(self._returncode)
+        return idle
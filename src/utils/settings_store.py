@@ -0,0 +1,143 @@
+import os
+import json
+import copy
+import logging
+import threading
+from pathlib import Path
+from PySide6.QtCore import QObject, Signal
+
+# Пауза после последнего изменения, после которой настройки пишутся на диск (с)
+SETTINGS_SAVE_DELAY = 0.5
+
+class SettingsStore(QObject):
+    """Хранилище settings.json с отложенной атомарной записью.
+
+    Изменения копятся и пишутся фоновым потоком через SETTINGS_SAVE_DELAY
+    после последнего из них - несколько изменений подряд дают одну запись
+    и один fsync. Файл пишется во временный и атомарно переименовывается,
+    предыдущая целая версия остается в settings.json.bak и используется,
+    если основной файл оказался испорчен.
+
+    Сигнал changed(категория, ключ, значение) приходит в потоке, который
+    изменил настройку.
+    """
+
+    changed = Signal(str, str, object)
+
+    def __init__(self, path, defaults: dict, delay: float = SETTINGS_SAVE_DELAY, parent=None):
+        super().__init__(parent)
+        self.path = Path(path)
+        self.backup_path = self.path.with_name(self.path.name + '.bak')
+        self.defaults = defaults
+        self.delay = delay
+        self.data = copy.deepcopy(defaults)
+        self.logger = logging.getLogger('SettingsStore')
+        self._snapshot = copy.deepcopy(self.data)
+        self._pending = None  # сериализованные настройки, ждущие записи
+        self._main_ok = False  # основной файл цел - его можно делать резервной копией
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def load(self) -> dict:
+        """Читает настройки: основной файл, затем резервная копия, затем умолчания"""
+        for path in (self.path, self.backup_path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if not isinstance(data, dict):
+                    raise ValueError("settings must be a JSON object")
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError) as e:
+                self.logger.error(f"Settings file {path} is corrupted: {e}")
+                continue
+            self._main_ok = path == self.path
+            if not self._main_ok:
+                self.logger.warning(f"Settings restored from {path.name}")
+            break
+        else:
+            data = copy.deepcopy(self.defaults)
+
+        self.data = data
+        self._snapshot = copy.deepcopy(data)
+        return data
+
+    def set(self, category: str, key: str, value):
+        """Меняет одну настройку и планирует запись"""
+        self.data.setdefault(category, {})[key] = value
+        self.save()
+
+    def save(self, data: dict = None):
+        """Планирует запись настроек (data заменяет текущий словарь, если задан)"""
+        if data is not None:
+            self.data = data
+        # Снимок берется сразу, в потоке вызывающего: словарь меняют без блокировок
+        serialized = json.dumps(self.data, indent=4, ensure_ascii=False)
+        self._notify_changes()
+
+        with self._cond:
+            self._pending = serialized
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='SettingsStore', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _notify_changes(self):
+        """Сообщает об измененных ключах относительно прошлого сохранения"""
+        previous, self._snapshot = self._snapshot, copy.deepcopy(self.data)
+        for category, values in self._snapshot.items():
+            if not isinstance(values, dict):
+                continue
+            old_values = previous.get(category)
+            old_values = old_values if isinstance(old_values, dict) else {}
+            for key, value in values.items():
+                if key not in old_values or old_values[key] != value:
+                    self.changed.emit(category, key, value)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._pending is None:
+                    return
+                # Ждем, пока изменения не перестанут поступать
+                while not self._closed:
+                    pending = self._pending
+                    self._cond.wait(self.delay)
+                    if self._pending is pending:
+                        break
+                serialized, self._pending = self._pending, None
+            self._write(serialized)
+
+    def _write(self, serialized: str):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(self.path.name + '.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(serialized)
+                f.flush()
+                os.fsync(f.fileno())
+            # Текущий целый файл становится резервной копией
+            if self._main_ok and self.path.exists():
+                os.replace(self.path, self.backup_path)
+            os.replace(tmp_path, self.path)
+            self._main_ok = True
+        except OSError as e:
+            self.logger.error(f"Error saving settings: {e}")
+
+    def flush(self):
+        """Немедленно записывает отложенные изменения (при выходе)"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+            thread = self._thread
+        if thread:
+            thread.join(timeout=5)
+        with self._cond:
+            serialized, self._pending = self._pending, None
+            self._closed = False
+            self._thread = None
+        if serialized is not None:
+            self._write(serialized)
@@ -0,0 +1,92 @@
+import sys
+import time
+import logging
+import builtins
+import threading
+
+# Сколько самых медленных модулей показывать в отчете
+REPORT_TOP_MODULES = 15
+
+class StartupProfiler:
+    """Отчет о холодном старте: время импорта модулей и вехи до первой отрисовки.
+
+    Включается флагом --startup-report или LAUNCHER_STARTUP_REPORT=1.
+    Перехватывает __import__ и засекает только первую загрузку модуля;
+    собственное время модуля - без времени вложенных импортов.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.imports = []     # (модуль, общее время, собственное время, поток)
+        self.milestones = []  # (название, время от старта)
+        self.logger = logging.getLogger('Startup')
+        self._original_import = None
+        self._local = threading.local()
+
+    def install(self):
+        if self._original_import is None:
+            self._original_import = builtins.__import__
+            builtins.__import__ = self._import
+
+    def uninstall(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original_import
+        if level or name in sys.modules:
+            return original(name, globals, locals, fromlist, level)
+
+        stack = self._local.__dict__.setdefault('stack', [])
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            self.imports.append((name, elapsed, elapsed - children,
+                                 threading.current_thread().name))
+
+    def mark(self, name: str):
+        """Отмечает веху старта"""
+        self.milestones.append((name, time.perf_counter() - self.started))
+
+    def watch_first_paint(self, widget):
+        """Отмечает первую отрисовку окна и печатает отчет"""
+        from PySide6.QtCore import QObject, QEvent
+
+        profiler = self
+
+        class FirstPaintFilter(QObject):
+            def eventFilter(self, obj, event):
+                if event.type() == QEvent.Paint:
+                    obj.removeEventFilter(self)
+                    profiler.mark('first paint')
+                    profiler.report()
+                return False
+
+        self._paint_filter = FirstPaintFilter(widget)
+        widget.installEventFilter(self._paint_filter)
+
+    def report(self):
+        """Пишет отчет в лог и перестает перехватывать импорты"""
+        self.uninstall()
+        self.logger.info("Startup milestones:")
+        for name, at in self.milestones:
+            self.logger.info(f"  {at * 1000:8.1f} ms  {name}")
+
+        total = sum(self_time for _, _, self_time, _ in self.imports)
+        self.logger.info(
+            f"Imported {len(self.imports)} modules, {total * 1000:.1f} ms in imports; slowest:"
+        )
+        slowest = sorted(self.imports, key=lambda item: item[2], reverse=True)
+        for name, elapsed, self_time, thread in slowest[:REPORT_TOP_MODULES]:
+            self.logger.info(
+                f"  {self_time * 1000:8.1f} ms self {elapsed * 1000:8.1f} ms total  {name} [{thread}]"
+            )
+
+profiler = StartupProfiler()
@@ -1,71 +1,409 @@
-import libtorrent as lt
 import time
 import logging
+import os
+import threading
 from pathlib import Path
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional, Callable
 
+from src.utils.file_verifier import MUTABLE_SUFFIXES
+
+# libtorrent грузится при создании первого TorrentManager, а не при импорте
+# модуля: это несколько десятков мс на старте, нужные только для загрузки
+lt = None
+
+def _load_libtorrent():
+    global lt
+    if lt is None:
+        import libtorrent
+        lt = libtorrent
+    return lt
+
+# Как часто просим у libtorrent пакет обновлений статуса (мс)
+STATUS_INTERVAL_MS = 500
+# Как часто сохраняем resume data во время загрузки (с)
+RESUME_SAVE_INTERVAL = 60
+
 @dataclass
 class TorrentStatus:
     updated_at: int
-    bytes_total: int 
+    bytes_total: int
     bytes_done: int
     progress: float
     state: str
     speed: float
 
+# Файлы, без которых validate_game_path не даст нажать «Играть»
+LAUNCH_CRITICAL_FILES = ('Wow.exe', 'Data/common.MPQ', 'Data/common-2.MPQ')
+
+# Приоритеты файлов libtorrent (0 - не качать, 7 - максимальный)
+PRIORITY_CRITICAL = 7
+PRIORITY_NORMAL = 4
+PRIORITY_DEFERRED = 1
+
+# Шаг дедлайнов для последовательной загрузки критичных частей (мс)
+PIECE_DEADLINE_STEP_MS = 50
+
+@dataclass
+class _TrackedTorrent:
+    handle: object
+    status_callback: Optional[Callable] = None
+    finished_callback: Optional[Callable] = None
+    error_callback: Optional[Callable] = None
+    playable_callback: Optional[Callable] = None
+    critical_files: list = field(default_factory=list)
+    finished: bool = False
+    playable: bool = False
+
+class DownloadPlanner:
+    """Порядок загрузки «сначала то, что нужно для запуска».
+
+    Исполняемые файлы и common*.MPQ качаются первыми и последовательно,
+    ролики и озвучка из манифеста wow_hashes.json - в самом конце.
+    """
+
+    def __init__(self, critical_files=LAUNCH_CRITICAL_FILES):
+        self.critical_files = {p.lower() for p in critical_files}
+
+    @staticmethod
+    def relative_path(info, index: int) -> str:
+        """Путь файла внутри клиента, без корневой папки торрента"""
+        path = info.files().file_path(index).replace('\\', '/')
+        prefix = info.name() + '/'
+        if info.files().num_files() > 1 and path.startswith(prefix):
+            path = path[len(prefix):]
+        return path
+
+    @staticmethod
+    def strip_root_folder(info):
+        """Убирает корневую папку торрента, чтобы файлы легли прямо в папку игры.
+
+        Лаунчер ищет <game_path>/Wow.exe, а не <game_path>/<имя торрента>/Wow.exe.
+        """
+        files = info.files()
+        for index in range(files.num_files()):
+            rel_path = DownloadPlanner.relative_path(info, index)
+            if rel_path != files.file_path(index).replace('\\', '/'):
+                info.rename_file(index, rel_path)
+
+    def classify(self, rel_path: str) -> int:
+        """Возвращает приоритет файла по его пути"""
+        lower = rel_path.lower()
+        if lower in self.critical_files:
+            return PRIORITY_CRITICAL
+        # Библиотеки рядом с Wow.exe нужны для запуска и весят немного
+        if '/' not in lower and lower.endswith(('.exe', '.dll', '.manifest')):
+            return PRIORITY_CRITICAL
+        if '/interface/cinematics/' in f"/{lower}" or 'speech' in lower.rsplit('/', 1)[-1]:
+            return PRIORITY_DEFERRED
+        return PRIORITY_NORMAL
+
+    def plan(self, info) -> tuple[list, list]:
+        """Возвращает (приоритеты файлов, индексы критичных файлов)"""
+        priorities = []
+        critical = []
+        for index in range(info.files().num_files()):
+            priority = self.classify(self.relative_path(info, index))
+            priorities.append(priority)
+            if priority == PRIORITY_CRITICAL:
+                critical.append(index)
+        return priorities, critical
+
+    def apply(self, handle, info) -> list:
+        """Выставляет приоритеты и дедлайны частей, возвращает критичные файлы"""
+        priorities, critical = self.plan(info)
+        handle.prioritize_files(priorities)
+
+        # Дедлайны по возрастанию - части критичных файлов идут по порядку
+        files = info.files()
+        piece_length = info.piece_length()
+        deadline = 0
+        seen = set()
+        for index in critical:
+            size = files.file_size(index)
+            if not size:
+                continue
+            offset = files.file_offset(index)
+            first = offset // piece_length
+            last = (offset + size - 1) // piece_length
+            for piece in range(first, last + 1):
+                if piece in seen:
+                    continue
+                seen.add(piece)
+                handle.set_piece_deadline(piece, deadline)
+                deadline += PIECE_DEADLINE_STEP_MS
+        return critical
+
 class TorrentManager:
-    def __init__(self):
-        self.session = lt.session()
-        self.session.listen_on(6881, 6891)
+    """Менеджер загрузок на очереди алертов libtorrent.
+
+    Одна сессия и один рабочий поток обслуживают любое количество торрентов:
+    поток ждет алерты, раз в STATUS_INTERVAL_MS запрашивает пакет
+    state_update_alert и раздает статусы колбэкам. Колбэки вызываются
+    из рабочего потока - для UI их нужно пробрасывать через сигналы Qt.
+    """
+
+    def __init__(self, resume_dir="config/resume"):
+        _load_libtorrent()
+        self.session = lt.session({
+            'listen_interfaces': '0.0.0.0:6881,[::]:6881',
+            'alert_mask': (
+                lt.alert.category_t.error_notification
+                | lt.alert.category_t.status_notification
+                | lt.alert.category_t.storage_notification
+                | lt.alert.category_t.file_progress_notification
+            ),
+        })
         self.handle = None
         self.logger = logging.getLogger('TorrentManager')
-        self._status_callback = None
-        
-    def start_download(self, torrent_path: str, save_path: str, 
+        self._torrents = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._worker = None
+        self.resume_dir = Path(resume_dir)
+        self._pending_resume = 0
+        self._resume_cond = threading.Condition()
+        self.planner = DownloadPlanner()
+
+    def _ensure_worker(self):
+        """Запускает рабочий поток при первом добавлении торрента"""
+        if self._worker and self._worker.is_alive():
+            return
+        self._stop_event.clear()
+        self._worker = threading.Thread(target=self._run, name='TorrentManager', daemon=True)
+        self._worker.start()
+
+    def _track(self, handle, status_callback=None, finished_callback=None, error_callback=None,
+               playable_callback=None, critical_files=None):
+        with self._lock:
+            self._torrents[str(handle.info_hash())] = _TrackedTorrent(
+                handle, status_callback, finished_callback, error_callback,
+                playable_callback, critical_files or []
+            )
+        self.handle = handle
+        self._ensure_worker()
+        return handle
+
+    def start_download(self, torrent_path: str, save_path: str,
                       trackers: list = None,
-                      status_callback=None):
+                      status_callback=None,
+                      finished_callback=None,
+                      error_callback=None,
+                      playable_callback=None):
+        """Добавляет торрент и сразу возвращает handle, не блокируя вызывающий поток
+
+        playable_callback вызывается, как только докачаны файлы,
+        необходимые для запуска игры, - раньше окончания всей загрузки.
+        """
         try:
             # Загружаем торрент файл
             info = lt.torrent_info(torrent_path)
-            
+
             # Добавляем трекеры если указаны
             if trackers:
                 for tracker in trackers:
                     info.add_tracker(tracker)
-                    
-            # Создаем handle
-            self.handle = self.session.add_torrent({
-                'ti': info,
-                'save_path': save_path
-            })
-            
-            # Запускаем мониторинг
-            self._monitor_download(status_callback)
-            
+
+            DownloadPlanner.strip_root_folder(info)
+
+            # Создаем handle, подхватывая resume data с прошлого запуска
+            handle = self.session.add_torrent(self._make_params(info, save_path))
+            critical = self.planner.apply(handle, info)
+            return self._track(handle, status_callback, finished_callback, error_callback,
+                               playable_callback, critical)
+
         except Exception as e:
             self.logger.error(f"Error starting download: {e}")
             raise
-            
-    def _monitor_download(self, status_callback):
-        """Отслеживает прогресс загрузки"""
-        while not self.handle.is_seed():
-            s = self.handle.status()
-            
-            status = TorrentStatus(
-                updated_at=int(time.time()),
-                bytes_total=s.total_wanted,
-                bytes_done=s.total_wanted_done, 
-                progress=s.progress * 100,
-                state=self._get_state(s.state),
-                speed=s.download_rate
-            )
-            
-            if status_callback:
-                status_callback(status)
-                
-            time.sleep(1)
-            
+
+    def repair(self, torrent_path: str, game_path: str, have_pieces: list,
+               trackers: list = None, status_callback=None,
+               finished_callback=None, error_callback=None):
+        """Докачивает только поврежденные части установленного клиента
+
+        Args:
+            torrent_path: Путь к .torrent файлу
+            game_path: Корень клиента (без корневой папки торрента)
+            have_pieces: Карта целых частей из PieceVerifier
+
+        Изменяемые файлы (*.wtf) не скачиваются: их части PieceVerifier уже
+        отметил целыми, а приоритет 0 не дает libtorrent трогать сами файлы.
+        """
+        try:
+            info = lt.torrent_info(torrent_path)
+
+            if trackers:
+                for tracker in trackers:
+                    info.add_tracker(tracker)
+
+            DownloadPlanner.strip_root_folder(info)
+
+            # Передаем карту частей как resume data: libtorrent не будет
+            # перепроверять весь клиент и скачает только недостающие части
+            params = lt.add_torrent_params()
+            params.ti = info
+            params.save_path = game_path
+            params.have_pieces = have_pieces
+            params.file_priorities = [
+                0 if DownloadPlanner.relative_path(info, index).lower().endswith(MUTABLE_SUFFIXES)
+                else PRIORITY_NORMAL
+                for index in range(info.files().num_files())
+            ]
+            handle = self.session.add_torrent(params)
+            return self._track(handle, status_callback, finished_callback, error_callback)
+
+        except Exception as e:
+            self.logger.error(f"Error repairing client: {e}")
+            raise
+
+    def _resume_path(self, info_hash) -> Path:
+        return self.resume_dir / f"{info_hash}.fastresume"
+
+    def _make_params(self, info, save_path: str):
+        """Собирает add_torrent_params, используя сохраненную resume data.
+
+        С resume data libtorrent проверяет только размеры и даты файлов
+        и не перехеширует уже скачанные части.
+        """
+        resume_path = self._resume_path(info.info_hash())
+        params = None
+        if resume_path.exists():
+            try:
+                params = lt.read_resume_data(resume_path.read_bytes())
+                self.logger.info(f"Loaded resume data from {resume_path}")
+            except Exception as e:
+                self.logger.warning(f"Ignoring broken resume data {resume_path}: {e}")
+                params = None
+        if params is None:
+            params = lt.add_torrent_params()
+        params.ti = info
+        params.save_path = save_path
+        return params
+
+    def save_resume_data(self, handle=None):
+        """Запрашивает resume data у одного или всех торрентов.
+
+        Результат придет алертом и будет записан рабочим потоком.
+        """
+        with self._lock:
+            handles = [handle] if handle else [t.handle for t in self._torrents.values()]
+        flags = lt.torrent_handle.flush_disk_cache | lt.torrent_handle.save_info_dict
+        for h in handles:
+            if not h.is_valid() or not h.status().has_metadata:
+                continue
+            with self._resume_cond:
+                self._pending_resume += 1
+            h.save_resume_data(flags)
+
+    def _write_resume_data(self, alert):
+        try:
+            self.resume_dir.mkdir(parents=True, exist_ok=True)
+            path = self._resume_path(alert.handle.info_hash())
+            tmp_path = path.with_suffix('.tmp')
+            tmp_path.write_bytes(lt.write_resume_data_buf(alert.params))
+            os.replace(tmp_path, path)
+        except Exception as e:
+            self.logger.error(f"Error writing resume data: {e}")
+
+    def _resume_done(self):
+        with self._resume_cond:
+            self._pending_resume = max(0, self._pending_resume - 1)
+            self._resume_cond.notify_all()
+
+    def _run(self):
+        """Рабочий цикл: алерты libtorrent вместо опроса каждого handle"""
+        next_update = 0.0
+        next_resume_save = time.monotonic() + RESUME_SAVE_INTERVAL
+        while not self._stop_event.is_set():
+            now = time.monotonic()
+            if now >= next_update:
+                self.session.post_torrent_updates()
+                next_update = now + STATUS_INTERVAL_MS / 1000
+            if now >= next_resume_save:
+                self._save_changed_resume_data()
+                next_resume_save = now + RESUME_SAVE_INTERVAL
+
+            timeout = max(0, int((next_update - time.monotonic()) * 1000))
+            if not self.session.wait_for_alert(timeout):
+                continue
+
+            for alert in self.session.pop_alerts():
+                try:
+                    self._handle_alert(alert)
+                except Exception as e:
+                    self.logger.error(f"Error handling alert {alert.what()}: {e}")
+
+    def _save_changed_resume_data(self):
+        """Сохраняет resume data только у торрентов, где что-то поменялось"""
+        with self._lock:
+            handles = [t.handle for t in self._torrents.values()]
+        for handle in handles:
+            if handle.is_valid() and handle.need_save_resume_data():
+                self.save_resume_data(handle)
+
+    def _handle_alert(self, alert):
+        if isinstance(alert, lt.save_resume_data_alert):
+            self._write_resume_data(alert)
+            self._resume_done()
+
+        elif isinstance(alert, lt.save_resume_data_failed_alert):
+            self.logger.warning(f"Resume data not saved: {alert.message()}")
+            self._resume_done()
+
+        elif isinstance(alert, lt.state_update_alert):
+            for s in alert.status:
+                tracked = self._get_tracked(s.handle)
+                if tracked and tracked.status_callback:
+                    tracked.status_callback(self._make_status(s))
+
+        elif isinstance(alert, (lt.file_completed_alert, lt.torrent_checked_alert)):
+            tracked = self._get_tracked(alert.handle)
+            if tracked:
+                self._check_playable(tracked)
+
+        elif isinstance(alert, lt.torrent_finished_alert):
+            tracked = self._get_tracked(alert.handle)
+            if tracked and not tracked.finished:
+                tracked.finished = True
+                if tracked.status_callback:
+                    tracked.status_callback(self._make_status(alert.handle.status()))
+                if tracked.finished_callback:
+                    tracked.finished_callback()
+                self.save_resume_data(alert.handle)
+
+        elif isinstance(alert, (lt.torrent_error_alert, lt.file_error_alert)):
+            self.logger.error(alert.message())
+            tracked = self._get_tracked(alert.handle)
+            if tracked and tracked.error_callback:
+                tracked.error_callback(alert.message())
+
+    def _check_playable(self, tracked: _TrackedTorrent):
+        """Сообщает о готовности к запуску, когда докачаны все критичные файлы"""
+        if tracked.playable or not tracked.critical_files:
+            return
+        handle = tracked.handle
+        progress = handle.file_progress(lt.torrent_handle.piece_granularity)
+        files = handle.torrent_file().files()
+        if all(progress[i] >= files.file_size(i) for i in tracked.critical_files):
+            tracked.playable = True
+            self.logger.info("Launch-critical files downloaded, client is playable")
+            if tracked.playable_callback:
+                tracked.playable_callback()
+
+    def _get_tracked(self, handle) -> Optional[_TrackedTorrent]:
+        with self._lock:
+            return self._torrents.get(str(handle.info_hash()))
+
+    def _make_status(self, s) -> TorrentStatus:
+        return TorrentStatus(
+            updated_at=int(time.time()),
+            bytes_total=s.total_wanted,
+            bytes_done=s.total_wanted_done,
+            progress=s.progress * 100,
+            state=self._get_state(s.state),
+            speed=s.download_rate
+        )
+
     def _get_state(self, state):
         """Возвращает текстовое состояние загрузки"""
         states = {
@@ -77,17 +415,53 @@ class TorrentManager:
             lt.torrent_status.allocating: "allocating",
             lt.torrent_status.checking_resume_data: "checking resume"
         }
-        return states.get(state, "progress") 
+        return states.get(state, "progress")
 
-    def add_torrent(self, torrent_path: str = None, magnet_uri: str = None):
+    def add_torrent(self, torrent_path: str = None, magnet_uri: str = None,
+                    save_path: str = '.', status_callback=None):
         """Добавляет торрент из файла или магнет-ссылки"""
         if torrent_path:
             info = lt.torrent_info(torrent_path)
-            return self.session.add_torrent({'ti': info})
+            handle = self.session.add_torrent({'ti': info, 'save_path': save_path})
         elif magnet_uri:
-            return self.session.add_torrent({'url': magnet_uri})
+            params = lt.parse_magnet_uri(magnet_uri)
+            params.save_path = save_path
+            handle = self.session.add_torrent(params)
         else:
             raise ValueError("Необходимо указать torrent_path или magnet_uri")
+        return self._track(handle, status_callback)
+
+    def pause(self):
+        """Приостанавливает все загрузки"""
+        self.session.pause()
+
+    def resume(self):
+        """Продолжает все загрузки"""
+        self.session.resume()
+
+    def remove(self, handle):
+        """Убирает торрент из сессии, не трогая файлы"""
+        with self._lock:
+            self._torrents.pop(str(handle.info_hash()), None)
+        self.session.remove_torrent(handle)
+        if self.handle == handle:
+            self.handle = None
+
+    def stop(self):
+        """Останавливает рабочий поток"""
+        self._stop_event.set()
+        if self._worker:
+            self._worker.join(timeout=5)
+            self._worker = None
+
+    def shutdown(self, timeout: float = 10):
+        """Ставит загрузки на паузу, сохраняет resume data и останавливает поток"""
+        self.session.pause()
+        if self._worker and self._worker.is_alive():
+            self.save_resume_data()
+            with self._resume_cond:
+                self._resume_cond.wait_for(lambda: self._pending_resume == 0, timeout)
+        self.stop()
 
     def check_files(self):
         """Запускает проверку файлов"""
@@ -98,14 +472,15 @@ class TorrentManager:
         """Возвращает список файлов в торренте"""
         if not self.handle or not self.handle.has_metadata():
             return []
-            
+
         files = []
         torrent_info = self.handle.get_torrent_info()
-        
-        for f in torrent_info.files():
+        file_progress = self.handle.file_progress()
+
+        for index, f in enumerate(torrent_info.files()):
             files.append({
                 'path': f.path,
                 'size': f.size,
-                'progress': 0  # Будет обновляться в _monitor_download
+                'progress': file_progress[index] / f.size * 100 if f.size else 100
             })
-        return files 
\ No newline at end of file
+        return files
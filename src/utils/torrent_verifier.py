@@ -0,0 +1,247 @@
+import os
+import bisect
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Optional, Callable
+from concurrent.futures import ThreadPoolExecutor
+
+from src.utils.file_verifier import MUTABLE_SUFFIXES
+
+def bdecode(data: bytes):
+    """Разбирает bencode-данные (формат .torrent файлов)"""
+    # Некоторые клиенты дописывают мусор в конец файла - его игнорируем
+    value, _ = _bdecode(data, 0)
+    return value
+
+def _bdecode(data: bytes, i: int):
+    c = data[i:i + 1]
+    if c == b'i':
+        end = data.index(b'e', i)
+        return int(data[i + 1:end]), end + 1
+    if c == b'l':
+        i += 1
+        items = []
+        while data[i:i + 1] != b'e':
+            value, i = _bdecode(data, i)
+            items.append(value)
+        return items, i + 1
+    if c == b'd':
+        i += 1
+        items = {}
+        while data[i:i + 1] != b'e':
+            key, i = _bdecode(data, i)
+            items[key], i = _bdecode(data, i)
+        return items, i + 1
+    if c.isdigit():
+        colon = data.index(b':', i)
+        length = int(data[i:colon])
+        start = colon + 1
+        return data[start:start + length], start + length
+    raise ValueError(f"Invalid bencode at offset {i}")
+
+@dataclass
+class TorrentFile:
+    index: int
+    path: str  # путь относительно корня клиента
+    length: int
+    offset: int  # смещение файла в общем потоке данных торрента
+    pad: bool = False  # padding-файлы v2 торрентов, на диске не существуют
+
+    @property
+    def mutable(self) -> bool:
+        """Файл перезаписывает сам лаунчер (Config.wtf, realmlist.wtf)"""
+        return self.path.lower().endswith(MUTABLE_SUFFIXES)
+
+@dataclass
+class TorrentMeta:
+    name: str
+    piece_length: int
+    piece_hashes: list
+    files: list
+    total_size: int
+    _offsets: Optional[list] = field(default=None, repr=False)
+
+    @property
+    def num_pieces(self) -> int:
+        return len(self.piece_hashes)
+
+    @classmethod
+    def load(cls, torrent_path) -> 'TorrentMeta':
+        with open(torrent_path, 'rb') as f:
+            info = bdecode(f.read())[b'info']
+
+        name = info[b'name'].decode('utf-8', 'replace')
+        pieces = info[b'pieces']
+        piece_hashes = [pieces[i:i + 20] for i in range(0, len(pieces), 20)]
+
+        files = []
+        offset = 0
+        if b'files' in info:
+            for index, entry in enumerate(info[b'files']):
+                path = '/'.join(p.decode('utf-8', 'replace') for p in entry[b'path'])
+                pad = b'p' in entry.get(b'attr', b'')
+                files.append(TorrentFile(index, path, entry[b'length'], offset, pad))
+                offset += entry[b'length']
+        else:
+            files.append(TorrentFile(0, name, info[b'length'], 0))
+            offset = info[b'length']
+
+        return cls(name, info[b'piece length'], piece_hashes, files, offset)
+
+    def mutable_pieces(self) -> set:
+        """Части, задевающие изменяемые файлы - их не проверяем и не докачиваем"""
+        pieces = set()
+        for f in self.files:
+            if f.mutable and f.length:
+                first = f.offset // self.piece_length
+                last = (f.offset + f.length - 1) // self.piece_length
+                pieces.update(range(first, last + 1))
+        return pieces
+
+    def files_in_piece(self, piece: int) -> list:
+        """Возвращает файлы, пересекающиеся с частью"""
+        start = piece * self.piece_length
+        end = min(start + self.piece_length, self.total_size)
+        if self._offsets is None:
+            self._offsets = [f.offset for f in self.files]
+        i = max(0, bisect.bisect_right(self._offsets, start) - 1)
+        result = []
+        while i < len(self.files) and self.files[i].offset < end:
+            f = self.files[i]
+            if f.length and f.offset + f.length > start:
+                result.append(f)
+            i += 1
+        return result
+
+@dataclass
+class PieceReport:
+    meta: TorrentMeta
+    bad: bytearray  # 1 - часть повреждена или отсутствует
+    affected_files: list = field(default_factory=list)  # файлы, задетые битыми частями
+
+    @property
+    def ok(self) -> bool:
+        return not any(self.bad)
+
+    def bad_pieces(self) -> list:
+        return [i for i, b in enumerate(self.bad) if b]
+
+    def have_pieces(self) -> list:
+        """Битовая карта в формате add_torrent_params.have_pieces"""
+        return [not b for b in self.bad]
+
+    @property
+    def bytes_to_repair(self) -> int:
+        last = self.meta.num_pieces - 1
+        total = 0
+        for piece in self.bad_pieces():
+            if piece == last:
+                total += self.meta.total_size - last * self.meta.piece_length
+            else:
+                total += self.meta.piece_length
+        return total
+
+class PieceVerifier:
+    """Проверка установленного клиента по SHA1 частей из .torrent"""
+
+    def __init__(self, torrent_path, max_workers: int = None):
+        self.meta = TorrentMeta.load(torrent_path)
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self.logger = logging.getLogger('PieceVerifier')
+
+    def _read_piece(self, game_path: Path, piece: int, handles: dict) -> Optional[bytes]:
+        meta = self.meta
+        start = piece * meta.piece_length
+        end = min(start + meta.piece_length, meta.total_size)
+        buf = bytearray()
+        for f in meta.files_in_piece(piece):
+            lo = max(start, f.offset) - f.offset
+            hi = min(end, f.offset + f.length) - f.offset
+            if f.pad:
+                buf += bytes(hi - lo)
+                continue
+            fh = handles.get(f.index)
+            if fh is None:
+                try:
+                    fh = open(game_path / f.path, 'rb')
+                except OSError:
+                    return None
+                handles[f.index] = fh
+            fh.seek(lo)
+            chunk = fh.read(hi - lo)
+            if len(chunk) != hi - lo:
+                return None
+            buf += chunk
+        return bytes(buf)
+
+    def _check_range(self, game_path: Path, pieces: range, bad: bytearray, on_piece,
+                     skip: set = frozenset()):
+        handles = {}
+        try:
+            for piece in pieces:
+                if piece in skip:
+                    if on_piece:
+                        on_piece()
+                    continue
+                data = self._read_piece(game_path, piece, handles)
+                if data is None or hashlib.sha1(data).digest() != self.meta.piece_hashes[piece]:
+                    bad[piece] = 1
+                if on_piece:
+                    on_piece()
+        finally:
+            for fh in handles.values():
+                fh.close()
+
+    def verify(self, game_path,
+               progress_callback: Callable[[int, int], None] = None) -> PieceReport:
+        """Проверяет все части и возвращает карту поврежденных.
+
+        Части с изменяемыми файлами (*.wtf) считаются целыми: лаунчер сам
+        переписывает Config.wtf, и докачка затерла бы настройки игрока.
+
+        Args:
+            game_path: Корень клиента (содержимое торрента без корневой папки)
+            progress_callback: (проверено частей, всего частей)
+        """
+        game_path = Path(game_path)
+        total = self.meta.num_pieces
+        bad = bytearray(total)
+        skip = self.meta.mutable_pieces()
+        done = 0
+        lock = threading.Lock()
+
+        def on_piece():
+            nonlocal done
+            with lock:
+                done += 1
+                current = done
+            if progress_callback:
+                progress_callback(current, total)
+
+        # Непрерывные диапазоны - каждый поток читает файлы последовательно
+        workers = max(1, min(self.max_workers, total))
+        step = (total + workers - 1) // workers
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pieces') as pool:
+            futures = [
+                pool.submit(self._check_range, game_path, range(i, min(i + step, total)), bad, on_piece, skip)
+                for i in range(0, total, step)
+            ]
+            for future in futures:
+                future.result()
+
+        affected_files = []
+        for piece in (i for i, b in enumerate(bad) if b):
+            for f in self.meta.files_in_piece(piece):
+                if not f.pad and not f.mutable and f.path not in affected_files:
+                    affected_files.append(f.path)
+
+        report = PieceReport(self.meta, bad, affected_files)
+        if not report.ok:
+            self.logger.warning(
+                f"{len(report.bad_pieces())} bad pieces in {len(affected_files)} files, "
+                f"{report.bytes_to_repair} bytes to repair"
+            )
+        return report
@@ -0,0 +1,103 @@
+import os
+import json
+import logging
+import threading
+from pathlib import Path
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+CACHE_VERSION = 1
+
+@dataclass
+class CacheEntry:
+    size: int
+    mtime_ns: int
+    inode: int
+    sha1: str
+
+    @classmethod
+    def from_stat(cls, st: os.stat_result, sha1: str) -> 'CacheEntry':
+        return cls(st.st_size, st.st_mtime_ns, st.st_ino, sha1)
+
+    def matches(self, st: os.stat_result) -> bool:
+        """Файл не менялся с момента последнего хеширования"""
+        return (self.size, self.mtime_ns, self.inode) == (st.st_size, st.st_mtime_ns, st.st_ino)
+
+class VerifyCache:
+    """Кэш результатов хеширования, ключ - (путь, размер, mtime_ns, inode)"""
+
+    def __init__(self, cache_path="config/verify_cache.json"):
+        self.cache_path = Path(cache_path)
+        self.logger = logging.getLogger('VerifyCache')
+        self._entries = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        self._entries = {}
+        if not self.cache_path.exists():
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == CACHE_VERSION:
+                self._entries = {
+                    path: CacheEntry(**entry) for path, entry in data.get('files', {}).items()
+                }
+        except Exception as e:
+            # Битый кэш не страшен - просто пересчитаем хеши
+            self.logger.warning(f"Error loading verify cache: {e}")
+
+    def lookup(self, path, st: os.stat_result = None) -> Optional[str]:
+        """Возвращает SHA1 из кэша, если файл не менялся"""
+        key = str(Path(path).resolve())
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if st is None:
+            try:
+                st = os.stat(key)
+            except OSError:
+                return None
+        return entry.sha1 if entry.matches(st) else None
+
+    def store(self, path, st: os.stat_result, sha1: str):
+        """Запоминает хеш файла вместе с его stat"""
+        key = str(Path(path).resolve())
+        with self._lock:
+            self._load()
+            self._entries[key] = CacheEntry.from_stat(st, sha1)
+            self._dirty = True
+
+    def invalidate(self, path=None):
+        """Сбрасывает запись о файле или весь кэш"""
+        with self._lock:
+            self._load()
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(str(Path(path).resolve()), None)
+            self._dirty = True
+
+    def save(self):
+        """Атомарно сохраняет кэш на диск"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {
+                'version': CACHE_VERSION,
+                'files': {path: asdict(entry) for path, entry in self._entries.items()}
+            }
+            self._dirty = False
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            self.logger.error(f"Error saving verify cache: {e}")
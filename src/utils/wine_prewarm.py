@@ -0,0 +1,184 @@
+import time
+import shutil
+import logging
+import threading
+from pathlib import Path
+from subprocess import Popen, DEVNULL, run, TimeoutExpired
+from typing import Optional, Callable
+
+# Сколько wineserver живет после выхода последнего процесса wine (с)
+PREWARM_LINGER = 3600
+# Эмуляторы, которые используют системный wine; для остальных путь
+# к их собственному wineserver задается в game.wineserver
+SYSTEM_WINE_RUNNERS = ('wine',)
+PREWARM_TIMEOUT = 60
+# Пауза после последнего изменения настроек перед перезапуском сессии (с):
+# диалог настроек сохраняет ключи по одному
+PREWARM_RESTART_DELAY = 0.5
+
+class WinePrefixSession:
+    """Заранее поднятый wineserver для префикса игры.
+
+    Холодный запуск wine - это старт wineserver, загрузка реестра
+    префикса и служб (services.exe, explorer.exe...), и только потом
+    Wow.exe. Сессия делает все это заранее, при открытии лаунчера или
+    входе, и держит wineserver PREWARM_LINGER секунд после выхода из
+    игры - следующие запуски подключаются к готовому серверу.
+
+    wineserver должен быть той же версии, что и wine, которым
+    запускается игра, иначе клиент не сможет к нему подключиться.
+    """
+
+    def __init__(self, settings: dict, linger: int = PREWARM_LINGER,
+                 on_process: Optional[Callable[[int], None]] = None):
+        self.settings = settings
+        self.linger = linger
+        self.on_process = on_process  # pid процессов прогрева (wineserver, клиент wine)
+        self.logger = logging.getLogger('WinePrefixSession')
+        self.server = None
+        self.wineserver = None
+        self.env = None
+        self.prewarm_ms = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        # Отложенный перезапуск после смены настроек
+        self._restart_cond = threading.Condition()
+        self._restart_request = None
+        self._restart_at = 0.0
+        self._restarter = None
+
+    def binaries(self) -> Optional[tuple[str, str]]:
+        """wineserver и wine для прогрева; None, если их версия неизвестна"""
+        game = self.settings.get('game', {})
+        wineserver = game.get('wineserver')
+        if not wineserver:
+            if game.get('runner', 'wine') not in SYSTEM_WINE_RUNNERS:
+                return None
+            wineserver = shutil.which('wineserver')
+            if not wineserver:
+                return None
+        wine = Path(wineserver).with_name('wine')
+        return wineserver, str(wine) if wine.exists() else shutil.which('wine') or 'wine'
+
+    @property
+    def ready(self) -> bool:
+        """Сервер поднят лаунчером и еще жив"""
+        server = self.server
+        return self._ready.is_set() and server is not None and server.poll() is None
+
+    def start(self, env: dict) -> bool:
+        """Прогревает префикс в фоне; False, если прогрев для этих настроек недоступен"""
+        binaries = self.binaries()
+        if binaries is None:
+            self.logger.info("Wine prefix prewarm skipped: set game.wineserver for this runner")
+            return False
+        with self._lock:
+            if self.ready or (self._thread and self._thread.is_alive()):
+                return True
+            self._ready.clear()
+            self._thread = threading.Thread(target=self._prewarm, args=(*binaries, env),
+                                            name='WinePrewarm', daemon=True)
+            self._thread.start()
+        return True
+
+    def _prewarm(self, wineserver: str, wine: str, env: dict):
+        started = time.perf_counter()
+        self.wineserver = wineserver
+        self.env = env
+        try:
+            # -f: сервер остается нашим потомком, его можно дождаться при выходе.
+            # Если сервер для префикса уже запущен, этот сразу завершится
+            self.server = Popen([wineserver, '-f', f'-p{self.linger}'], env=env,
+                                stdout=DEVNULL, stderr=DEVNULL)
+            if self.on_process:
+                self.on_process(self.server.pid)
+            # Первый клиент загружает префикс и поднимает службы wine
+            client = Popen([wine, 'cmd', '/c', 'exit'], env=env, stdout=DEVNULL, stderr=DEVNULL)
+            if self.on_process:
+                self.on_process(client.pid)
+            try:
+                client.wait(timeout=PREWARM_TIMEOUT)
+            except TimeoutExpired:
+                client.kill()
+                client.wait()
+                raise
+        except (OSError, TimeoutExpired) as e:
+            self.logger.warning(f"Wine prefix prewarm failed: {e}")
+            return
+
+        self.prewarm_ms = (time.perf_counter() - started) * 1000
+        self._ready.set()
+        self.logger.info(
+            f"Wine prefix {env.get('WINEPREFIX', '~/.wine')} is warm in {self.prewarm_ms:.0f} ms"
+        )
+
+    def shutdown(self, keep_running: bool = False):
+        """Останавливает сервер лаунчера.
+
+        Args:
+            keep_running: Игра еще идет - сервер не трогаем, он завершится
+                сам через linger после выхода из игры
+        """
+        with self._lock:
+            thread = self._thread
+        if thread:
+            thread.join(timeout=1)
+        server = self.server
+        self._ready.clear()
+        if server is None or server.poll() is not None or keep_running:
+            return
+        try:
+            # -k завершает и службы wine в префиксе
+            run([self.wineserver, '-k'], env=self.env, timeout=10)
+            server.wait(timeout=10)
+        except (OSError, TimeoutExpired) as e:
+            self.logger.warning(f"wineserver did not stop cleanly: {e}")
+            server.kill()
+        self.server = None
+
+    def restart(self, prewarm: Callable[[], object], keep_running: Callable[[], bool]):
+        """Перезапускает сессию в фоновом потоке после смены настроек.
+
+        Остановка сервера ждет wineserver -k, поэтому в UI-потоке ее делать
+        нельзя. Изменения, пришедшие в течение PREWARM_RESTART_DELAY,
+        дают один перезапуск.
+
+        Args:
+            prewarm: Запускает прогрев по новым настройкам
+            keep_running: True, если старый сервер нужен запущенной игре
+        """
+        with self._restart_cond:
+            self._restart_request = (prewarm, keep_running)
+            self._restart_at = time.monotonic() + PREWARM_RESTART_DELAY
+            if self._restarter is None:
+                self._restarter = threading.Thread(target=self._restart_loop,
+                                                   name='WinePrewarmRestart', daemon=True)
+                self._restarter.start()
+            self._restart_cond.notify()
+
+    def cancel_restart(self, timeout: float = 15):
+        """Отменяет отложенный перезапуск и дожидается идущего (при выходе)"""
+        with self._restart_cond:
+            self._restart_request = None
+            self._restart_cond.notify()
+            restarter = self._restarter
+        if restarter:
+            restarter.join(timeout)
+
+    def _restart_loop(self):
+        while True:
+            with self._restart_cond:
+                while self._restart_request is not None:
+                    delay = self._restart_at - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self._restart_cond.wait(delay)
+                request, self._restart_request = self._restart_request, None
+                if request is None:
+                    self._restarter = None
+                    return
+            prewarm, keep_running = request
+            # Сервер старого префикса больше не нужен
+            self.shutdown(keep_running=keep_running())
+            prewarm()
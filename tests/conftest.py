@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Модули лаунчера импортируются как src.*, поэтому корень репозитория - в sys.path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,34 @@
+import json
+
+from src.utils.file_verifier import FileVerifier
+
+def make_verifier(tmp_path, manifest: dict) -> FileVerifier:
+    manifest_path = tmp_path / 'wow_hashes.json'
+    manifest_path.write_text(json.dumps(manifest))
+    return FileVerifier(manifest_path, overlay_path=tmp_path / 'wow_hashes.local.json')
+
+def test_record_hashes_updates_known_and_new_files(tmp_path):
+    verifier = make_verifier(tmp_path, {'Data/patch.MPQ': 'a' * 40})
+
+    verifier.record_hashes({'Data/patch.MPQ': 'B' * 40, 'Data/patch-X.MPQ': 'c' * 40})
+
+    assert verifier.manifest == {'Data/patch.MPQ': 'b' * 40, 'Data/patch-X.MPQ': 'c' * 40}
+
+def test_overlay_entry_yields_to_newer_manifest(tmp_path):
+    verifier = make_verifier(tmp_path, {'Data/patch.MPQ': 'a' * 40})
+    verifier.record_hashes({'Data/patch.MPQ': 'b' * 40, 'Data/patch-X.MPQ': 'c' * 40})
+
+    # Лаунчер обновили: в манифесте появились свои версии обоих файлов
+    (tmp_path / 'wow_hashes.json').write_text(json.dumps(
+        {'Data/patch.MPQ': 'd' * 40, 'Data/patch-X.MPQ': 'e' * 40}
+    ))
+    verifier.invalidate()
+
+    assert verifier.manifest == {'Data/patch.MPQ': 'd' * 40, 'Data/patch-X.MPQ': 'e' * 40}
+
+def test_record_hashes_skips_mutable_files(tmp_path):
+    verifier = make_verifier(tmp_path, {})
+
+    verifier.record_hashes({'WTF/Config.wtf': 'a' * 40})
+
+    assert verifier.manifest == {}
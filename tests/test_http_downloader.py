@@ -0,0 +1,157 @@
+import os
+import json
+import asyncio
+import hashlib
+import threading
+
+import pytest
+
+web = pytest.importorskip('aiohttp.web')
+
+import src.utils.http_downloader as http_downloader
+from src.utils.file_verifier import FileVerifier
+from src.utils.verify_cache import VerifyCache
+from src.utils.http_downloader import HttpDownloader
+
+SEGMENT_SIZE = 256 * 1024
+
+class MirrorServer:
+    """Локальное зеркало: отдает файлы с Range, считает запросы и умеет сбоить"""
+
+    def __init__(self, root):
+        self.root = root
+        self.requests = []
+        self.fail_ranges = 0
+        self.port = None
+        self._loop = asyncio.new_event_loop()
+        self._runner = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    async def _middleware_app(self):
+        @web.middleware
+        async def record(request, handler):
+            self.requests.append((request.method, request.path, request.headers.get('Range')))
+            if request.method == 'GET' and 'Range' in request.headers and self.fail_ranges > 0:
+                self.fail_ranges -= 1
+                raise web.HTTPInternalServerError()
+            return await handler(request)
+
+        app = web.Application(middlewares=[record])
+        app.router.add_static('/', self.root)
+        return app
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._runner = web.AppRunner(self._loop.run_until_complete(self._middleware_app()))
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        self._loop.run_until_complete(site.start())
+        self.port = site._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    def start(self):
+        self._thread.start()
+        self._ready.wait(10)
+        return f"http://127.0.0.1:{self.port}"
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(10)
+
+@pytest.fixture
+def client_files():
+    return {
+        'Wow.exe': os.urandom(SEGMENT_SIZE * 3 + 123),
+        'Data/common.MPQ': os.urandom(SEGMENT_SIZE * 2),
+        'Data/ruRU/speech-ruRU.MPQ': os.urandom(1000),
+        'empty.dll': b'',
+    }
+
+@pytest.fixture
+def mirror(tmp_path, client_files, monkeypatch):
+    monkeypatch.setattr(http_downloader, 'SEGMENT_SIZE', SEGMENT_SIZE)
+    root = tmp_path / 'mirror'
+    for rel_path, data in client_files.items():
+        target = root / rel_path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+    server = MirrorServer(root)
+    server.url = server.start()
+    yield server
+    server.stop()
+
+def run_download(downloader, save_path, files):
+    events = []
+    downloader.start_download(
+        str(save_path), files=files,
+        finished_callback=lambda: events.append('finished'),
+        error_callback=lambda message: events.append(('error', message)),
+        playable_callback=lambda: events.append('playable'),
+    )
+    downloader._thread.join(30)
+    return events
+
+def manifest_for(files: dict) -> dict:
+    return {rel_path: hashlib.sha1(data).hexdigest() for rel_path, data in files.items()}
+
+def make_downloader(mirror, tmp_path):
+    cache = VerifyCache(tmp_path / 'verify_cache.json')
+    verifier = FileVerifier(tmp_path / 'wow_hashes.json', cache=cache)
+    return HttpDownloader(mirror.url, verifier=verifier, connections=4)
+
+def test_downloads_files_by_ranges(mirror, tmp_path, client_files):
+    save_path = tmp_path / 'client'
+    mirror.fail_ranges = 2  # сбойные сегменты докачиваются повторными попытками
+
+    events = run_download(make_downloader(mirror, tmp_path), save_path, manifest_for(client_files))
+
+    assert events == ['playable', 'finished']
+    for rel_path, data in client_files.items():
+        assert (save_path / rel_path).read_bytes() == data
+    assert not list(save_path.rglob('*.part*'))
+    ranges = [r for method, path, r in mirror.requests if path == '/Wow.exe' and method == 'GET']
+    assert len(set(ranges)) == 4 and all(r and r.startswith('bytes=') for r in ranges)
+
+def test_resumes_from_part_file(mirror, tmp_path, client_files):
+    save_path = tmp_path / 'client'
+    data = client_files['Wow.exe']
+    dest = save_path / 'Wow.exe'
+    dest.parent.mkdir(parents=True)
+    # Первые два сегмента уже скачаны прошлым запуском
+    part = bytearray(len(data))
+    part[:SEGMENT_SIZE * 2] = data[:SEGMENT_SIZE * 2]
+    dest.with_name('Wow.exe.part').write_bytes(bytes(part))
+    dest.with_name('Wow.exe.part.json').write_text(json.dumps(
+        {'size': len(data), 'segment_size': SEGMENT_SIZE, 'done': [0, 1]}
+    ))
+
+    events = run_download(make_downloader(mirror, tmp_path), save_path,
+                          manifest_for({'Wow.exe': data}))
+
+    assert events == ['playable', 'finished']
+    assert dest.read_bytes() == data
+    ranges = {r for method, path, r in mirror.requests if method == 'GET'}
+    assert ranges == {f'bytes={SEGMENT_SIZE * 2}-{SEGMENT_SIZE * 3 - 1}',
+                      f'bytes={SEGMENT_SIZE * 3}-{len(data) - 1}'}
+
+def test_skips_unchanged_files_through_cache(mirror, tmp_path, client_files):
+    save_path = tmp_path / 'client'
+    downloader = make_downloader(mirror, tmp_path)
+    manifest = manifest_for(client_files)
+    assert run_download(downloader, save_path, manifest) == ['playable', 'finished']
+    mirror.requests.clear()
+
+    assert run_download(downloader, save_path, manifest) == ['playable', 'finished']
+    assert mirror.requests == []
+
+def test_failed_file_reports_error(mirror, tmp_path, client_files):
+    manifest = manifest_for(client_files)
+    manifest['Data/common.MPQ'] = '0' * 40
+
+    events = run_download(make_downloader(mirror, tmp_path), tmp_path / 'client', manifest)
+
+    assert events[-1][0] == 'error'
+    assert 'Data/common.MPQ' in events[-1][1]
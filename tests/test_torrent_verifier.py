@@ -0,0 +1,74 @@
+import hashlib
+
+from src.utils.torrent_verifier import PieceVerifier
+
+PIECE_LENGTH = 16 * 1024
+
+def bencode(value) -> bytes:
+    if isinstance(value, int):
+        return b'i%de' % value
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    if isinstance(value, bytes):
+        return b'%d:%s' % (len(value), value)
+    if isinstance(value, list):
+        return b'l' + b''.join(bencode(v) for v in value) + b'e'
+    return b'd' + b''.join(bencode(k) + bencode(v) for k, v in sorted(value.items())) + b'e'
+
+def make_torrent(path, files: dict):
+    """Многофайловый торрент из {путь: данные} в порядке словаря"""
+    stream = b''.join(files.values())
+    pieces = b''.join(
+        hashlib.sha1(stream[i:i + PIECE_LENGTH]).digest()
+        for i in range(0, len(stream), PIECE_LENGTH)
+    )
+    info = {
+        'name': 'client',
+        'piece length': PIECE_LENGTH,
+        'pieces': pieces,
+        'files': [{'path': p.split('/'), 'length': len(d)} for p, d in files.items()],
+    }
+    path.write_bytes(bencode({'info': info}))
+
+def install(game_path, files: dict):
+    for rel_path, data in files.items():
+        target = game_path / rel_path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+
+def test_changed_config_wtf_is_not_reported(tmp_path):
+    # Как в wow-3.3.5.torrent: Config.wtf - файл 0 в общей части с Wow.exe
+    files = {
+        'WTF/Config.wtf': b'SET locale "ruRU"\n',
+        'Wow.exe': bytes(range(256)) * 200,
+    }
+    torrent = tmp_path / 'client.torrent'
+    make_torrent(torrent, files)
+    game_path = tmp_path / 'game'
+    install(game_path, files)
+    (game_path / 'WTF/Config.wtf').write_text('SET realmList "logon.example.com"\n')
+
+    report = PieceVerifier(torrent).verify(game_path)
+
+    assert report.ok
+    assert report.affected_files == []
+    assert all(report.have_pieces())
+
+def test_damage_outside_mutable_pieces_is_reported(tmp_path):
+    files = {
+        'WTF/Config.wtf': b'SET locale "ruRU"\n',
+        'Wow.exe': bytes(range(256)) * 200,
+    }
+    torrent = tmp_path / 'client.torrent'
+    make_torrent(torrent, files)
+    game_path = tmp_path / 'game'
+    install(game_path, files)
+    (game_path / 'WTF/Config.wtf').write_text('SET realmList "logon.example.com"\n')
+    with open(game_path / 'Wow.exe', 'r+b') as f:
+        f.seek(PIECE_LENGTH * 2)
+        f.write(b'\xff' * 16)
+
+    report = PieceVerifier(torrent).verify(game_path)
+
+    assert report.bad_pieces() == [2]
+    assert report.affected_files == ['Wow.exe']